@@ -288,7 +288,8 @@ exports.processRecording = async (req, res) => {
         metadata,
         transcriptionResult.deepgramResponse, // Full Deepgram JSON
         actualSessionId,
-        permanentAudioPath // Raw audio path
+        permanentAudioPath, // Raw audio path
+        req.headers.traceparent
       );
 
       // Store AI processing results if available
@@ -1,12 +1,64 @@
+const crypto = require('crypto');
 const http = require('http');
 const https = require('https');
 const path = require('path');
+const zlib = require('zlib');
 const { Logger } = require('../config');
 
+// Optional MessagePack support: install @msgpack/msgpack and set
+// PYTHON_SERVICE_FORMAT=msgpack to send binary bodies instead of JSON
+let msgpack = null;
+try {
+  msgpack = require('@msgpack/msgpack');
+} catch (error) {
+  msgpack = null;
+}
+
 class PythonService {
   constructor() {
     this.pythonBaseUrl = process.env.PYTHON_LAYER_URL || 'http://localhost:8000';
-    this.timeout = parseInt(process.env.PYTHON_SERVICE_TIMEOUT || '3000', 10);
+    // Time we wait for the Python layer; sent along as X-Deadline-Ms (minus a margin for the
+    // response to travel back) so the pipeline can take cheaper paths or give up in time
+    this.timeout = parseInt(process.env.PYTHON_SERVICE_TIMEOUT || '60000', 10);
+    this.deadlineMarginMs = parseInt(process.env.PYTHON_SERVICE_DEADLINE_MARGIN_MS || '250', 10);
+    // Request bodies at least this large are sent gzip-compressed (0 disables)
+    this.compressMinBytes = parseInt(process.env.PYTHON_SERVICE_COMPRESS_MIN_BYTES || '65536', 10);
+    // Unix domain socket of the Python layer (same host); overrides host/port of PYTHON_LAYER_URL
+    this.socketPath = process.env.PYTHON_LAYER_SOCKET || null;
+    this.useMsgpack = process.env.PYTHON_SERVICE_FORMAT === 'msgpack' && msgpack !== null;
+    if (process.env.PYTHON_SERVICE_FORMAT === 'msgpack' && msgpack === null) {
+      Logger.warn('[Python Service] PYTHON_SERVICE_FORMAT=msgpack but @msgpack/msgpack is not installed, using JSON');
+    }
+  }
+
+  // Serialize a payload (MessagePack or JSON), gzip-compressing it when it is large enough
+  encodeJsonBody(payload) {
+    const body = this.useMsgpack
+      ? Buffer.from(msgpack.encode(payload))
+      : Buffer.from(JSON.stringify(payload));
+    const headers = { 'Content-Type': this.useMsgpack ? 'application/msgpack' : 'application/json' };
+
+    if (this.compressMinBytes > 0 && body.length >= this.compressMinBytes) {
+      const compressed = zlib.gzipSync(body);
+      headers['Content-Encoding'] = 'gzip';
+      Logger.debug(`[Python Service] Compressed request body ${body.length} -> ${compressed.length} bytes`);
+      return { body: compressed, headers };
+    }
+    return { body, headers };
+  }
+
+  // W3C trace context for the Python hop; Python continues this trace and returns it
+  // as response_data.trace_id. A valid inbound traceparent is continued with a child
+  // span ID under its trace ID; a new trace is started only when none came in
+  static newTraceparent(parent = null) {
+    const spanId = crypto.randomBytes(8).toString('hex');
+    const match = /^([0-9a-f]{2})-([0-9a-f]{32})-[0-9a-f]{16}-([0-9a-f]{2})$/.exec(
+      typeof parent === 'string' ? parent.trim().toLowerCase() : ''
+    );
+    if (match && match[1] !== 'ff' && !/^0+$/.test(match[2])) {
+      return `00-${match[2]}-${spanId}-${match[3]}`;
+    }
+    return `00-${crypto.randomBytes(16).toString('hex')}-${spanId}-01`;
   }
 
   // Helper method to make HTTP requests without node-fetch
@@ -17,29 +69,47 @@ class PythonService {
       const httpModule = isHttps ? https : http;
       
       const requestOptions = {
-        hostname: urlObj.hostname,
-        port: urlObj.port || (isHttps ? 443 : 80),
         path: urlObj.pathname + urlObj.search,
         method: options.method || 'GET',
-        headers: options.headers || {},
+        headers: {
+          'Accept-Encoding': 'gzip',
+          Accept: this.useMsgpack ? 'application/msgpack, application/json' : 'application/json',
+          'X-Deadline-Ms': String(Math.max(1, this.timeout - this.deadlineMarginMs)),
+          traceparent: PythonService.newTraceparent(options.traceparent),
+          ...(options.headers || {})
+        },
         timeout: this.timeout
       };
 
+      if (this.socketPath) {
+        requestOptions.socketPath = this.socketPath;
+      } else {
+        requestOptions.hostname = urlObj.hostname;
+        requestOptions.port = urlObj.port || (isHttps ? 443 : 80);
+      }
+
       const req = httpModule.request(requestOptions, (res) => {
-        let data = '';
+        const chunks = [];
         
         res.on('data', (chunk) => {
-          data += chunk;
+          chunks.push(chunk);
         });
         
         res.on('end', () => {
           try {
+            let buffer = Buffer.concat(chunks);
+            if (res.headers['content-encoding'] === 'gzip') {
+              buffer = zlib.gunzipSync(buffer);
+            }
+            const isMsgpack = (res.headers['content-type'] || '').startsWith('application/msgpack');
             const result = {
               ok: res.statusCode >= 200 && res.statusCode < 300,
               status: res.statusCode,
               statusText: res.statusMessage,
-              json: () => Promise.resolve(JSON.parse(data)),
-              text: () => Promise.resolve(data)
+              json: () => Promise.resolve(
+                isMsgpack ? msgpack.decode(buffer) : JSON.parse(buffer.toString('utf8'))
+              ),
+              text: () => Promise.resolve(buffer.toString('utf8'))
             };
             resolve(result);
           } catch (error) {
@@ -68,9 +138,10 @@ class PythonService {
    * @param {Array} domEvents - Array of DOM events with timestamps
    * @param {object} metadata - Additional metadata (sessionId, url, viewport, etc.)
    * @param {object} deepgramResponse - Full Deepgram JSON response (text, timeline, metadata, raw)
+   * @param {string} traceparent - Inbound request's traceparent header, continued on the Python hop (optional)
    * @returns {Promise<object>} - Response from Python layer
    */
-  async sendTextWithDomEvents(text, domEvents = [], metadata = {}, deepgramResponse = null) {
+  async sendTextWithDomEvents(text, domEvents = [], metadata = {}, deepgramResponse = null, traceparent = null) {
     try {
       const payload = {
         text: text,
@@ -97,12 +168,12 @@ class PythonService {
         deepgramTimelineSegments: deepgramResponse?.timeline?.length || 0
       });
 
+      const { body, headers } = this.encodeJsonBody(payload);
       const response = await this.makeRequest(`${this.pythonBaseUrl}/audio-full-process`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload)
+        headers,
+        body,
+        traceparent
       });
 
       if (!response.ok) {
@@ -124,8 +195,8 @@ class PythonService {
       }
 
       // Handle network errors
-      if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND') {
-        throw new Error(`Cannot connect to Python layer at ${this.pythonBaseUrl}. Is the Python server running?`);
+      if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND' || error.code === 'ENOENT') {
+        throw new Error(`Cannot connect to Python layer at ${this.socketPath || this.pythonBaseUrl}. Is the Python server running?`);
       }
 
       throw error;
@@ -135,18 +206,19 @@ class PythonService {
   /**
    * Send raw text with DOM events (alternative endpoint)
    * @param {object} data - Complete data object with text and events
+   * @param {string} traceparent - Inbound request's traceparent header, continued on the Python hop (optional)
    * @returns {Promise<object>} - Response from Python layer
    */
-  async sendRawTextWithDomEvents(data) {
+  async sendRawTextWithDomEvents(data, traceparent = null) {
     try {
       Logger.info(`[Python Service] Sending raw text with DOM events to Python layer`);
 
+      const { body, headers } = this.encodeJsonBody(data);
       const response = await this.makeRequest(`${this.pythonBaseUrl}/api/process-raw`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(data)
+        headers,
+        body,
+        traceparent
       });
 
       if (!response.ok) {
@@ -166,8 +238,8 @@ class PythonService {
         throw new Error(`Request to Python layer timed out after ${this.timeout}ms`);
       }
 
-      if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND') {
-        throw new Error(`Cannot connect to Python layer at ${this.pythonBaseUrl}. Is the Python server running?`);
+      if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND' || error.code === 'ENOENT') {
+        throw new Error(`Cannot connect to Python layer at ${this.socketPath || this.pythonBaseUrl}. Is the Python server running?`);
       }
 
       throw error;
@@ -1,159 +1,354 @@
-import requests
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from typing import Optional, Dict, List, Any
-from fastapi.responses import JSONResponse
-from app.services.gemini_service import generate_product_text
-from app.services.elevenlabs_service import generate_voice_from_text
-from app.models.request_models import ProductTextRequest, SyncedNarrationRequest, AudioProcessRequest
+from dotenv import load_dotenv
+
+# Load .env once, before any service module reads its settings
+load_dotenv()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from typing import Optional, Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.services.elevenlabs_service import expected_tts_latency, synthesize_voice
+from app.models.request_models import AudioProcessRequest
 from app.models.dom_event_models import RecordingSession, ProcessRecordingResponse
 from app.services.dom_event_service import process_dom_events, extract_text_from_events, group_events_by_step
-from app.services.synced_narration_service import generate_synced_narration, generate_step_by_step_narration
 from app.routes.collaboration_routes import router as collaboration_router
+from app.routes.session_routes import router as session_router, load_stored_session
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.msgpack_transport import MsgPackRoute, NegotiatedResponse
+from app.middleware.scheduling import SchedulingMiddleware
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.correlation import CorrelationIdMiddleware
+from app.middleware.loop_watchdog import LoopWatchdogMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.services.deadline import (
+    DEGRADATIONS,
+    DeadlineExceededError,
+    check_deadline,
+    remaining_time,
+    run_within_deadline,
+)
+from app.services.rate_limiter import ProviderUnavailableError
+from app.services.metrics import render_prometheus
+from app.services.model_router import FAST_MODEL, QUALITY_MODEL
+from app.services.providers import warm_up
+from app.services.cache_backend import get_backend
+from app.services.preprocess_pool import get_preprocess_pool
+from app.services.staged_pipeline import (
+    STAGE_LATENCY,
+    StagedPipeline,
+    register_pipeline,
+    stage_from_env,
+    stop_pipelines,
+)
+from app.services.loop_watchdog import LOOP_WATCHDOG_ENABLED, get_loop_watchdog
+from app.services.tracing import current_trace_id, span
+from app.services.structured_logging import configure_logging, get_logger
 import os
 import time
 from pathlib import Path
 
 NODE_SERVER_URL = os.getenv("NODE_SERVER_URL")  
 
-app = FastAPI(title="ProductAI Backend", version="2.0.0")
+configure_logging()
+logger = get_logger("pipeline")
+
+# Provider warm-up on startup: "off" (lazy, default), "background" or "blocking"
+WARMUP_MODE = os.getenv("PRODUCTAI_WARMUP", "off").lower()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if LOOP_WATCHDOG_ENABLED:
+        get_loop_watchdog().start()
+    # Open the shared cache (SQLite connect, WAL, schema) before the first request needs it
+    await asyncio.to_thread(get_backend)
+    if WARMUP_MODE == "blocking":
+        logger.info("Warming up providers before accepting traffic")
+        await asyncio.to_thread(warm_up, (FAST_MODEL, QUALITY_MODEL))
+    elif WARMUP_MODE == "background":
+        logger.info("Warming up providers in the background")
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, (FAST_MODEL, QUALITY_MODEL)))
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if LOOP_WATCHDOG_ENABLED:
+        await get_loop_watchdog().stop()
+    await stop_pipelines()
+    if get_preprocess_pool():
+        get_preprocess_pool().shutdown()
+
+
+app = FastAPI(
+    title="ProductAI Backend",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=NegotiatedResponse,
+)
+# Accept application/msgpack bodies alongside JSON on every route
+app.router.route_class = MsgPackRoute
+
+# Which route each task serves, for stall reports from the loop watchdog
+if LOOP_WATCHDOG_ENABLED:
+    app.add_middleware(LoopWatchdogMiddleware)
+
+# gzip/zstd request bodies, compressed responses for the large JSON routes
+app.add_middleware(CompressionMiddleware)
+
+# Shed pipeline requests up front when over capacity (before bodies are inflated)
+app.add_middleware(AdmissionMiddleware)
+
+# Priority class and tenant for the provider call scheduler (admission reads it)
+app.add_middleware(SchedulingMiddleware)
+
+# Server span per request, continuing the caller's W3C traceparent
+app.add_middleware(TracingMiddleware)
+
+# On-demand request profiles (X-Profile-Request or PRODUCTAI_PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
+# X-Request-Id on every log line and response
+app.add_middleware(CorrelationIdMiddleware)
+
+# Caller's X-Deadline-Ms budget (outermost: the clock starts on arrival)
+app.add_middleware(DeadlineMiddleware)
 
 # Include collaboration routes
 app.include_router(collaboration_router)
+app.include_router(session_router)
+
+
+@app.exception_handler(ProviderUnavailableError)
+async def provider_unavailable_handler(request: Request, exc: ProviderUnavailableError):
+    """Tell the caller to back off instead of reporting a generic 500"""
+    retry_after = max(1, int(round(exc.retry_after or 1)))
+    logger.warning("%s unavailable (%s), asking client to retry in %ds", exc.provider, exc, retry_after)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "provider": exc.provider, "retry_after": retry_after},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError):
+    """The caller has stopped waiting; the remaining stages were cancelled"""
+    logger.warning("%s, abandoning request", exc)
+    return JSONResponse(status_code=504, content={"detail": str(exc), "stage": exc.stage})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (values are per worker process)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def _preprocess_stage(state: Dict[str, Any]) -> None:
+    """Resolve the transcript, word timings and session (or a stored session's script context)."""
+    payload: AudioProcessRequest = state["payload"]
+
+    # Stored sessions fill in whatever the request did not send inline
+    stored = await load_stored_session(payload.sessionRef) if payload.sessionRef else None
+    raw_text = payload.text or (stored.transcript if stored else "")
+    session = payload.get_session_or_create()
+
+    # Stored sessions are preprocessed off the event loop and memoized under
+    # their sessionRef; large ones go to the process pool
+    script_context = None
+    if stored and session is None and not payload.domEvents and not payload.words:
+        from app.services.script_generation_service import stored_script_context
+
+        pool = get_preprocess_pool()
+        with span("stage.preprocess", events=stored.event_count, words=stored.word_count), \
+                STAGE_LATENCY.time(stage="preprocess"):
+            if pool and pool.should_offload(stored):
+                script_context = await run_within_deadline("preprocess", pool.script_context(stored))
+            if script_context is None:
+                script_context = await run_within_deadline("preprocess", stored_script_context(stored))
+
+    words = payload.words
+    if not words and stored and script_context is None:
+        words = await asyncio.to_thread(lambda: stored.words)
+
+    has_new_format = payload.deepgramData is not None
+    has_old_format = payload.deepgramResponse is not None
+    logger.info(
+        "Full processing pipeline started: %d chars, %d words, format %s",
+        len(raw_text), len(words) if script_context is None else stored.word_count,
+        "NEW (deepgramData)" if has_new_format else "OLD (deepgramResponse)" if has_old_format
+        else "STORED (sessionRef)" if stored else "UNKNOWN",
+    )
+
+
+    # ----------------------------------------------------------------------
+    # 👇 RAG FIX — Safe legacy wrapper for raw domEvents
+    # ----------------------------------------------------------------------
+    if session is None and stored is not None and stored.has_session and script_context is None:
+        session = await asyncio.to_thread(lambda: stored.session)
+        logger.debug("Loaded stored session %s", stored.ref)
+
+    if session:
+        logger.debug("DOM events: %d events", len(session.events))
+
+    elif payload.domEvents:
+        logger.debug("DOM events (raw): %d events (no RecordingSession)", len(payload.domEvents))
 
+        try:
+            session_id = payload.metadata.get("sessionId", "legacy_session")
 
-@app.post("/audio-full-process")
-async def full_process(payload: AudioProcessRequest):
-
-    try:
-        print(f"[Python] ===== FULL PROCESSING PIPELINE STARTED =====")
-        print(f"[Python] Raw text length: {len(payload.text)}")
-
-        has_new_format = payload.deepgramData is not None
-        has_old_format = payload.deepgramResponse is not None
-        print(f"[Python] Format detected: {'NEW (deepgramData)' if has_new_format else 'OLD (deepgramResponse)' if has_old_format else 'UNKNOWN'}")
-
-        words = payload.words
-        print(f"[Python] Deepgram words: {len(words)} words")
-
-
-        # ----------------------------------------------------------------------
-        # 👇 RAG FIX — Safe legacy wrapper for raw domEvents
-        # ----------------------------------------------------------------------
-        session = payload.get_session_or_create()
-
-        if session:
-            print(f"[Python] DOM events: {len(session.events)} events")
+            session = RecordingSession(
+                sessionId=session_id,
+                events=payload.domEvents,
+                startTime=payload.metadata.get("startTime") or 0,
+                endTime=payload.metadata.get("endTime") or 0,
+                url=payload.metadata.get("url") or "unknown",
+                viewport=payload.metadata.get("viewport") or {"width": 0, "height": 0}
+            )
 
-        elif payload.domEvents:
-            print(f"[Python] DOM events (raw): {len(payload.domEvents)} events (no RecordingSession)")
+            logger.debug("Wrapped raw domEvents into RecordingSession (sessionId=%s, events=%d)",
+                         session.sessionId, len(session.events))
 
-            try:
-                session_id = payload.metadata.get("sessionId", "legacy_session")
+        except Exception as wrap_error:
+            logger.warning("Failed to wrap raw domEvents: %s", wrap_error)
+            session = None
 
-                session = RecordingSession(
-                    sessionId=session_id,
-                    events=payload.domEvents,
-                    startTime=payload.metadata.get("startTime") or 0,
-                    endTime=payload.metadata.get("endTime") or 0,
-                    url=payload.metadata.get("url") or "unknown",
-                    viewport=payload.metadata.get("viewport") or {"width": 0, "height": 0}
-                )
+    elif script_context:
+        logger.debug("DOM events: %d events (preprocessed from the stored session)", script_context["event_count"])
 
-                print(f"[Python] ✅ Wrapped raw domEvents into RecordingSession "
-                      f"(sessionId={session.sessionId}, events={len(session.events)})")
+    else:
+        logger.debug("No DOM events available")
 
-            except Exception as wrap_error:
-                print(f"[Python] ❌ Failed to wrap raw domEvents:", wrap_error)
-                session = None
+    # ----------------------------------------------------------------------
 
-        else:
-            print(f"[Python] No DOM events available")
+    state.update(raw_text=raw_text, words=words, session=session, script_context=script_context)
 
-        # ----------------------------------------------------------------------
 
+async def _script_stage(state: Dict[str, Any]) -> None:
+    payload: AudioProcessRequest = state["payload"]
 
-        print(f"[Python] Recordings path: {payload.recordingsPath}")
+    remaining = remaining_time()
+    if remaining is not None:
+        logger.debug("Deadline: %.1fs left after preprocessing", remaining)
+    check_deadline("preprocess")
 
-        print(f"[Python] Step 1: Generating production-ready script...")
-        from app.services.script_generation_service import generate_product_script
+    from app.services.script_generation_service import generate_product_script
 
-        script_result = generate_product_script(
-            raw_text=payload.text,
-            word_timings=words,
-            session=session
+    # Leave time for audio when the script can be made cheaply enough
+    with span("stage.script_generation"):
+        script_result = await generate_product_script(
+            raw_text=state["raw_text"],
+            word_timings=state["words"],
+            session=state["session"],
+            quality=payload.qualityTier,
+            latency_budget=payload.latencyBudgetMs / 1000 if payload.latencyBudgetMs else None,
+            reserve=expected_tts_latency(),
+            context=state["script_context"],
         )
 
-        if not script_result.get("success"):
-            error_msg = script_result.get('error', 'Unknown error')
-            print(f"[Python] ❌ Script generation failed: {error_msg}")
-            raise Exception(f"Script generation failed: {error_msg}")
+    if not script_result.get("success"):
+        error_msg = script_result.get('error', 'Unknown error')
+        logger.error("Script generation failed: %s", error_msg)
+        raise Exception(f"Script generation failed: {error_msg}")
 
-        production_script = script_result["script"]
-        print(f"\n[Python] ✅ STEP 1 COMPLETE - Script Generated")
-        print(f"[Python]   - Script length: {len(production_script)} characters")
-        print(f"[Python]   - Script preview: {production_script[:150]}...")
-        print(f"[Python]   - Timing analysis: {script_result.get('timing_analysis', {})}")
+    production_script = script_result["script"]
+    logger.info("Script generated: %d chars", len(production_script))
+    logger.debug("Script preview: %.150s", production_script)
+    state.update(script_result=script_result, script=production_script)
 
 
-        print(f"\n[Python] ===== STEP 2: AUDIO GENERATION =====")
-        print(f"[Python] Converting script to audio using ElevenLabs...")
-        print(f"[Python]   - Text length: {len(production_script)} characters")
+async def _tts_stage(state: Dict[str, Any]) -> None:
+    production_script = state["script"]
 
+    remaining = remaining_time()
+    audio_bytes = None
+    if remaining is not None and remaining < expected_tts_latency():
+        # Not enough time left for synthesis: return the script without audio
+        DEGRADATIONS.inc(stage="tts", outcome="skipped")
+        logger.warning("%.1fs left, skipping audio generation", remaining)
+    else:
         try:
-            audio_bytes = generate_voice_from_text(production_script)
-            print(f"[Python] ✅ Audio generated successfully")
-            print(f"[Python]   - Audio size: {len(audio_bytes)} bytes ({len(audio_bytes) / 1024:.2f} KB)")
+            with span("stage.tts", chars=len(production_script)), STAGE_LATENCY.time(stage="tts"):
+                audio_bytes = await run_within_deadline("tts", synthesize_voice(production_script))
+            logger.info("Audio generated: %d bytes", len(audio_bytes))
         except Exception as e:
-            print(f"[Python] ❌ Audio generation failed: {str(e)}")
+            logger.error("Audio generation failed: %s", e)
             raise
+    state["audio_bytes"] = audio_bytes
 
 
-        print(f"\n[Python] ===== STEP 3: SAVING AUDIO FILE =====")
-        timestamp = int(time.time() * 1000)
-        session_id = payload.metadata.get("sessionId", "unknown")
-        filename = f"processed_audio_{session_id}_{timestamp}.mp3"
+async def _persist_stage(state: Dict[str, Any]) -> None:
+    """Write the audio file and build the response body."""
+    payload: AudioProcessRequest = state["payload"]
+    script_result = state["script_result"]
+    audio_bytes = state["audio_bytes"]
 
-        print(f"[Python]   - Session ID: {session_id}")
-        print(f"[Python]   - Filename: {filename}")
-        print(f"[Python]   - Recordings path: {payload.recordingsPath}")
+    timestamp = int(time.time() * 1000)
+    session_id = payload.metadata.get("sessionId") or script_result.get("session_id") or "unknown"
+    filename = None
+
+    if audio_bytes is not None:
+        filename = f"processed_audio_{session_id}_{timestamp}.mp3"
 
         recordings_path = Path(payload.recordingsPath)
         recordings_path.mkdir(parents=True, exist_ok=True)
-        print(f"[Python]   - Directory created/verified: {recordings_path}")
 
         file_path = recordings_path / filename
 
-        with open(file_path, "wb") as f:
-            f.write(audio_bytes)
+        def write_audio():
+            with open(file_path, "wb") as f:
+                f.write(audio_bytes)
+
+        with span("stage.file_write"), STAGE_LATENCY.time(stage="file_write"):
+            await asyncio.to_thread(write_audio)
 
-        print(f"[Python] ✅ Audio file saved successfully")
-        print(f"[Python]   - Full path: {file_path}")
-        print(f"[Python]   - File size: {len(audio_bytes)} bytes")
+        logger.info("Audio saved to %s", file_path)
 
 
-        print(f"\n[Python] ===== STEP 4: PREPARING RESPONSE =====")
+    state["response"] = {
+        "success": True,
+        "script": state["script"],
+        "raw_text": state["raw_text"],
+        "processed_audio_filename": filename,
+        "audio_size_bytes": len(audio_bytes) if audio_bytes is not None else 0,
+        "audio_skipped": audio_bytes is None,
+        "timing_analysis": script_result.get("timing_analysis", {}),
+        "dom_context_used": script_result.get("dom_context_used", False),
+        "session_id": session_id,
+        "model_used": script_result.get("model_used"),
+        "degraded": script_result.get("degraded"),
+        "trace_id": current_trace_id(),
+    }
 
-        response_data = {
-            "success": True,
-            "script": production_script,
-            "raw_text": payload.text,
-            "processed_audio_filename": filename,
-            "audio_size_bytes": len(audio_bytes),
-            "timing_analysis": script_result.get("timing_analysis", {}),
-            "dom_context_used": script_result.get("dom_context_used", False),
-            "session_id": session_id,
-        }
+    logger.info("Full processing pipeline complete (session %s, DOM context used: %s)",
+                session_id, script_result.get("dom_context_used", False))
 
-        print(f"[Python]   - DOM context used: {response_data['dom_context_used']}")
-        print(f"\n[Python] ===== ✅ ALL PROCESSING COMPLETE ✅ =====")
 
-        return JSONResponse(response_data)
+# Each stage has its own workers and bounded queue (PIPELINE_<STAGE>_WORKERS/_QUEUE);
+# admission sheds /audio-full-process while the first queue is full
+full_process_pipeline = register_pipeline("/audio-full-process", StagedPipeline("full_process", [
+    stage_from_env("preprocess", _preprocess_stage),
+    stage_from_env("script", _script_stage),
+    stage_from_env("tts", _tts_stage),
+    stage_from_env("persist", _persist_stage),
+]))
+
+
+@app.post("/audio-full-process")
+async def full_process(payload: AudioProcessRequest):
+
+    try:
+        state = await full_process_pipeline.run({"payload": payload})
+        return NegotiatedResponse(state["response"])
+
+    except (ProviderUnavailableError, DeadlineExceededError, HTTPException):
+        raise
 
     except Exception as e:
         error_msg = f"Processing failed: {str(e)}"
-        print(f"[Python] ❌ ERROR: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
 
@@ -178,3 +373,47 @@ async def process_recording(
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process recording: {str(e)}")
+
+
+@app.post("/process-recording/{session_ref}", response_model=ProcessRecordingResponse)
+async def process_stored_recording(session_ref: str):
+    """Same as /process-recording, for a session uploaded earlier via POST /sessions"""
+    stored = await load_stored_session(session_ref)
+    if not stored.has_session:
+        raise HTTPException(status_code=404, detail=f"Session '{session_ref}' has no DOM events")
+
+    pool = get_preprocess_pool()
+    if pool and pool.should_offload(stored):
+        result = await pool.recording(stored)
+        if result is not None:
+            result["metadata"].update(hasVideo=False, hasAudio=False, sessionRef=session_ref)
+            return NegotiatedResponse(result)
+
+    try:
+        session = await asyncio.to_thread(lambda: stored.session)
+        response = process_dom_events(session)
+        response.metadata["extractedText"] = extract_text_from_events(session.events)
+        response.metadata["groupedSteps"] = group_events_by_step(session.events)
+        response.metadata["hasVideo"] = False
+        response.metadata["hasAudio"] = False
+        response.metadata["sessionRef"] = session_ref
+
+        return response
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process recording: {str(e)}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # PRODUCTAI_UDS=/path/to/socket listens on a Unix domain socket instead of TCP,
+    # for a Node layer on the same host
+    uds = os.getenv("PRODUCTAI_UDS")
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        uds=uds or None,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
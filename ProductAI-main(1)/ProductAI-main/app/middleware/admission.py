@@ -0,0 +1,185 @@
+"""
+Admission Middleware - load shedding for the provider-backed routes.
+
+Before a pipeline request does any work (body parsing, prompt building,
+provider calls) it is checked against:
+1. In-flight limit: admitted pipeline requests; bulk requests may only use
+   ADMISSION_BULK_SHARE of it so interactive work keeps headroom
+2. Queue depth: provider calls already waiting for a concurrency slot
+3. Pipeline backpressure: for routes served by a staged pipeline
+   (/audio-full-process), the queue in front of its first stage is full
+   because a later stage cannot keep up
+4. Deadline: if the client sent a deadline (`X-Deadline-Ms`, see
+   DeadlineMiddleware), the route's observed latency, stretched by the
+   current provider backlog, must fit in the time left
+
+A rejected request gets an immediate 503 with Retry-After instead of
+timing out after spending provider quota.
+
+Settings:
+    ADMISSION_PATHS            comma-separated path prefixes to guard
+    ADMISSION_MAX_IN_FLIGHT    admitted pipeline requests per worker (default 32)
+    ADMISSION_BULK_SHARE       share of the in-flight limit bulk may use (default 0.5)
+    ADMISSION_MAX_QUEUE_DEPTH  queued provider calls before shedding (default 64)
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.services.deadline import remaining_time
+from app.services.metrics import counter, gauge
+from app.services.rate_limiter import provider_backlog
+from app.services.scheduler import current_request_class
+from app.services.staged_pipeline import pipeline_backpressure
+from app.services.structured_logging import get_logger
+
+logger = get_logger("admission")
+
+ADMISSION_PATHS = tuple(
+    p.strip()
+    for p in os.getenv(
+        "ADMISSION_PATHS",
+        "/audio-full-process,/process-recording,/collaboration/ai-suggestions,/collaboration/ai-review,"
+        "/collaboration/translate-demo",
+    ).split(",")
+    if p.strip()
+)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_BULK_SHARE = float(os.getenv("ADMISSION_BULK_SHARE", "0.5"))
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "64"))
+
+LATENCY_EWMA_ALPHA = 0.2
+
+REJECTION_DETAILS = {
+    "rejected_in_flight": "Service is at capacity, retry later",
+    "rejected_queue": "Provider queue is full, retry later",
+    "rejected_pipeline": "Processing pipeline is saturated, retry later",
+    "rejected_deadline": "Request cannot finish within its deadline at current load",
+}
+
+ADMISSION_DECISIONS = counter(
+    "admission_decisions_total",
+    "Pipeline requests admitted or shed, by route, priority and reason",
+    ["route", "priority", "decision"],
+)
+ADMISSION_IN_FLIGHT = gauge(
+    "admission_in_flight",
+    "Admitted pipeline requests currently running",
+    ["priority"],
+)
+
+
+class AdmissionController:
+    """In-flight accounting and the admit/shed decision for one worker."""
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        bulk_share: float = ADMISSION_BULK_SHARE,
+        max_queue_depth: int = ADMISSION_MAX_QUEUE_DEPTH,
+    ):
+        self.max_in_flight = max_in_flight
+        self.bulk_share = bulk_share
+        self.max_queue_depth = max_queue_depth
+        self.in_flight = 0
+        self._latency: Dict[str, float] = {}
+
+    def expected_latency(self, route: str) -> Optional[float]:
+        """Observed route latency stretched by the provider backlog (None until observed)."""
+        latency = self._latency.get(route)
+        if latency is None:
+            return None
+        queued, slots = provider_backlog()
+        return latency * (1 + queued / max(1, slots))
+
+    def decide(self, route: str, priority: str, deadline: Optional[float]) -> Tuple[Optional[str], float]:
+        """(rejection reason or None, suggested Retry-After seconds)."""
+        limit = self.max_in_flight
+        if priority == "bulk":
+            limit = max(1, int(limit * self.bulk_share))
+        retry_after = self._latency.get(route, 1.0)
+
+        if self.in_flight >= limit:
+            return "rejected_in_flight", retry_after
+
+        queued, slots = provider_backlog()
+        if queued >= self.max_queue_depth:
+            return "rejected_queue", retry_after * queued / max(1, slots)
+
+        stage, drain = pipeline_backpressure(route)
+        if stage is not None:
+            logger.debug("Pipeline for %s backed up at its %s stage", route, stage)
+            return "rejected_pipeline", max(1.0, drain)
+
+        expected = self.expected_latency(route)
+        if deadline is not None and (deadline <= 0 or (expected is not None and expected > deadline)):
+            return "rejected_deadline", max(retry_after, (expected or 0.0) - deadline)
+        return None, 0.0
+
+    def record_latency(self, route: str, latency: float) -> None:
+        previous = self._latency.get(route, latency)
+        self._latency[route] = (1 - LATENCY_EWMA_ALPHA) * previous + LATENCY_EWMA_ALPHA * latency
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; must sit inside SchedulingMiddleware to see the priority class."""
+
+    def __init__(self, app, paths: Tuple[str, ...] = ADMISSION_PATHS):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        route = next((prefix for prefix in self.paths if path.startswith(prefix)), None)
+        if route is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        controller = get_admission_controller()
+        priority = current_request_class().priority
+        deadline = remaining_time()
+
+        reason, retry_after = controller.decide(route, priority, deadline)
+        if reason:
+            ADMISSION_DECISIONS.inc(route=route, priority=priority, decision=reason)
+            retry_after = max(1, int(round(retry_after)))
+            logger.warning("Shedding %s (%s, %d in flight), retry in %ds",
+                           path, reason, controller.in_flight, retry_after)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": REJECTION_DETAILS[reason], "reason": reason},
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_DECISIONS.inc(route=route, priority=priority, decision="admitted")
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        controller.in_flight += 1
+        ADMISSION_IN_FLIGHT.inc(priority=priority)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            controller.in_flight -= 1
+            ADMISSION_IN_FLIGHT.dec(priority=priority)
+            if status.get("code", 500) < 500:
+                controller.record_latency(route, time.monotonic() - started)
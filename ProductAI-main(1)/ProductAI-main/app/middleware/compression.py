@@ -0,0 +1,291 @@
+"""
+Compression Middleware - compressed request and response bodies.
+
+Requests:
+1. Bodies sent with `Content-Encoding: gzip` (or `zstd` when the optional
+   `zstandard` package is installed) are decompressed while they stream in,
+   so the route sees plain JSON and the compressed body is never buffered
+2. Decompressed size is capped (zip-bomb guard): decoding stops as soon as
+   the limit is passed (413), for every encoding; 400 for corrupt data,
+   415 for unsupported encodings
+
+Responses:
+3. Responses on the configured path prefixes are compressed when the client
+   accepts it (zstd preferred over gzip) and the body is at least
+   COMPRESS_MIN_BYTES long
+
+Raw and on-the-wire sizes and the resulting ratio are recorded in metrics
+for both directions.
+
+Settings:
+    PRODUCTAI_COMPRESS_PATHS       comma-separated response path prefixes
+                                   (default /process-recording,/collaboration)
+    PRODUCTAI_COMPRESS_MIN_BYTES   smallest response worth compressing (default 1024)
+    PRODUCTAI_MAX_BODY_MB          decompressed request size limit (default 256)
+"""
+import json
+import os
+import zlib
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.metrics import counter, histogram
+from app.services.structured_logging import get_logger
+
+logger = get_logger("compression")
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip only
+    zstandard = None
+
+COMPRESS_PATHS = tuple(
+    p.strip() for p in os.getenv("PRODUCTAI_COMPRESS_PATHS", "/process-recording,/collaboration").split(",") if p.strip()
+)
+COMPRESS_MIN_BYTES = int(os.getenv("PRODUCTAI_COMPRESS_MIN_BYTES", "1024"))
+MAX_BODY_BYTES = int(float(os.getenv("PRODUCTAI_MAX_BODY_MB", "256")) * 1024 * 1024)
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Output buffer for zstd request bodies, i.e. how far past the limit decoding can get before it stops
+ZSTD_WRITE_SIZE = 128 * 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/msgpack")
+
+COMPRESSION_BYTES = counter(
+    "http_compression_bytes_total",
+    "Body bytes before (raw) and after (wire) compression",
+    ["direction", "encoding", "stage"],
+)
+COMPRESSION_RATIO = histogram(
+    "http_compression_ratio",
+    "Raw size divided by compressed size, per body",
+    ["direction", "encoding"],
+    buckets=(1, 1.5, 2, 3, 5, 8, 12, 20, 35, 60, 100),
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def _record(direction: str, encoding: str, raw: int, wire: int) -> None:
+    COMPRESSION_BYTES.inc(raw, direction=direction, encoding=encoding, stage="raw")
+    COMPRESSION_BYTES.inc(wire, direction=direction, encoding=encoding, stage="wire")
+    if wire:
+        COMPRESSION_RATIO.observe(raw / wire, direction=direction, encoding=encoding)
+
+
+class _BodyTooLarge(Exception):
+    """A request body passed the size limit while being decompressed."""
+
+
+class _ZstdInflater:
+    """
+    Bounded zstd decoding. ZstdDecompressionObj.decompress has no output
+    limit (a few KB can inflate to gigabytes), so output is pushed through a
+    stream_writer into `write`, which aborts decoding as soon as the chunk's
+    output passes the limit.
+    """
+
+    def __init__(self):
+        self._writer = zstandard.ZstdDecompressor().stream_writer(self, write_size=ZSTD_WRITE_SIZE)
+        self._parts = []
+        self._size = 0
+        self._limit = 0
+
+    def write(self, data) -> int:
+        self._size += len(data)
+        if self._size > self._limit:
+            raise _BodyTooLarge()
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def decompress(self, chunk: bytes, limit: int) -> bytes:
+        self._parts, self._size, self._limit = [], 0, limit
+        self._writer.write(chunk)
+        body, self._parts = b"".join(self._parts), []
+        return body
+
+
+def _decompressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    if encoding == "zstd" and zstandard is not None:
+        return _ZstdInflater()
+    return None
+
+
+_DECODE_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def _inflate(decompressor, encoding: str, chunk: bytes, limit: int, final: bool) -> bytes:
+    """Decompress one chunk into at most `limit` bytes; _BodyTooLarge beyond that."""
+    if encoding == "zstd":
+        return decompressor.decompress(chunk, limit)
+    body = decompressor.decompress(chunk, limit + 1)
+    if final and not decompressor.unconsumed_tail:
+        body += decompressor.flush()
+    if decompressor.unconsumed_tail or len(body) > limit:
+        raise _BodyTooLarge()
+    return body
+
+
+def _compressor(encoding: str):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding we support from an Accept-Encoding header (q=0 excluded)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware, so request bodies stream through without buffering."""
+
+    def __init__(self, app, paths=COMPRESS_PATHS, minimum_size: int = COMPRESS_MIN_BYTES, max_body_bytes: int = MAX_BODY_BYTES):
+        self.app = app
+        self.paths = tuple(paths)
+        self.minimum_size = minimum_size
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding not in ("", "identity"):
+            decompressor = _decompressor(content_encoding)
+            if decompressor is None:
+                return await self._error(send, 415, f"Unsupported Content-Encoding '{content_encoding}'")
+            scope = dict(scope)
+            scope["headers"] = [
+                (k, v) for k, v in scope["headers"] if k.lower() not in (b"content-encoding", b"content-length")
+            ]
+            receive = self._decompressing_receive(receive, decompressor, content_encoding)
+
+        if self.paths and scope["path"].startswith(self.paths):
+            encoding = _accepted_encoding(headers.get("accept-encoding", ""))
+            if encoding:
+                send = self._compressing_send(send, encoding)
+
+        await self.app(scope, receive, send)
+
+    def _decompressing_receive(self, receive, decompressor, encoding: str):
+        """
+        Wrap receive() so the body is inflated chunk by chunk. Errors are raised
+        as HTTPException, which FastAPI passes through from body parsing.
+        """
+        wire_bytes = 0
+        raw_bytes = 0
+        max_body = self.max_body_bytes
+
+        async def wrapped():
+            nonlocal wire_bytes, raw_bytes
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            chunk = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            wire_bytes += len(chunk)
+            try:
+                body = _inflate(decompressor, encoding, chunk, max_body - raw_bytes, final=not more_body)
+            except _DECODE_ERRORS as e:
+                logger.warning("Rejected corrupt %s request body: %s", encoding, e)
+                raise HTTPException(status_code=400, detail=f"Corrupt {encoding} request body")
+            except _BodyTooLarge:
+                logger.warning("Rejected request body: over %d bytes once decompressed", max_body)
+                raise HTTPException(status_code=413, detail=f"Decompressed request body exceeds {max_body} bytes")
+
+            raw_bytes += len(body)
+
+            if not more_body:
+                _record("request", encoding, raw_bytes, wire_bytes)
+            return {"type": "http.request", "body": body, "more_body": more_body}
+
+        return wrapped
+
+    def _compressing_send(self, send, encoding: str):
+        start_message = None
+        compressor = None
+        raw_bytes = 0
+        wire_bytes = 0
+
+        async def wrapped(message):
+            nonlocal start_message, compressor, raw_bytes, wire_bytes
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                response_headers = {k.lower(): v for k, v in start_message["headers"]}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                eligible = (
+                    b"content-encoding" not in response_headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if not eligible:
+                    await send(start_message)
+                    start_message = None
+                    return await send(message)
+
+                compressor = _compressor(encoding)
+                headers = [
+                    (k, v) for k, v in start_message["headers"] if k.lower() not in (b"content-length", b"vary")
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    compressed = compressor.compress(body) + compressor.flush()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": headers})
+                    _record("response", encoding, len(body), len(compressed))
+                    return await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                await send({**start_message, "headers": headers})
+
+            # Streaming response
+            raw_bytes += len(body)
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.flush()
+                wire_bytes += len(chunk)
+                _record("response", encoding, raw_bytes, wire_bytes)
+            else:
+                wire_bytes += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        return wrapped
+
+    @staticmethod
+    async def _error(send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
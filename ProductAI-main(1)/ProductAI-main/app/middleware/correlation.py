@@ -0,0 +1,37 @@
+"""
+Correlation Middleware - one ID per request across all of its log lines.
+
+`X-Request-Id` from the caller is reused when it looks sane, otherwise a new
+ID is generated. It is attached to every log record made while handling the
+request and returned in the response's `X-Request-Id` header.
+"""
+import re
+import uuid
+
+from app.services.structured_logging import correlation_scope
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._:-]{1,64}$")
+
+
+class CorrelationIdMiddleware:
+    """Pure ASGI middleware; keep it outside every middleware that logs so each log line is tagged."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER, b"")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16].encode()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id)]
+            await send(message)
+
+        with correlation_scope(request_id.decode()):
+            await self.app(scope, receive, send_with_id)
@@ -0,0 +1,24 @@
+"""
+Deadline Middleware - starts the caller's clock as soon as a request arrives.
+
+`X-Deadline-Ms` is converted to an absolute deadline for the rest of the
+request (see app.services.deadline). Requests without the header run
+without a deadline.
+"""
+from app.services.deadline import DEADLINE_HEADER, deadline_after, parse_deadline_ms
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware; keep it outermost so queueing time counts against the deadline."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = parse_deadline_ms(dict(scope.get("headers") or []).get(DEADLINE_HEADER))
+        with deadline_after(budget):
+            await self.app(scope, receive, send)
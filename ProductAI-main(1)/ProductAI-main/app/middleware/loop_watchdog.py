@@ -0,0 +1,29 @@
+"""
+Loop Watchdog Middleware - tells the loop watchdog which route each task serves.
+
+While a request is in flight its task is mapped to "METHOD /path", so a
+stall detected by the watchdog thread can name the route that was running.
+Only installed when LOOP_WATCHDOG_ENABLED=1.
+"""
+import asyncio
+
+from app.services.loop_watchdog import track_route, untrack_route
+
+
+class LoopWatchdogMiddleware:
+    """Pure ASGI middleware; the mapping is dropped when the response completes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        track_route(task, f"{scope.get('method', '')} {scope.get('path', '')}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            untrack_route(task)
@@ -0,0 +1,97 @@
+"""
+MessagePack Transport - application/msgpack accepted alongside JSON.
+
+Node and Python share a host, so the JSON encode/parse on both sides is a
+large part of the cost of the word-timing and bbox-heavy payloads.
+1. Request bodies sent as `Content-Type: application/msgpack` are decoded
+   with msgpack and validated by the same Pydantic models as JSON bodies
+2. Responses are encoded as msgpack when the request's Accept header asks
+   for it; everything else stays JSON
+
+Routes opt in through MsgPackRoute (route_class) and NegotiatedResponse
+(default_response_class). The `msgpack` package is optional: without it,
+msgpack requests get 415 and responses stay JSON.
+"""
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
+from starlette.requests import Request
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+_response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+
+def is_msgpack(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def accepts_msgpack(accept: str) -> bool:
+    """True when the Accept header lists a msgpack type (without q=0)."""
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        if is_msgpack(media_type) and params.strip().replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+
+class MsgPackRequest(Request):
+    """
+    Request whose body is msgpack. FastAPI only parses bodies it sees as JSON,
+    so the content type is presented as application/json and json() decodes
+    msgpack instead.
+    """
+
+    def __init__(self, scope, receive):
+        super().__init__(scope, receive)
+        raw = [(k, v) for k, v in scope["headers"] if k.lower() != b"content-type"]
+        raw.append((b"content-type", b"application/json"))
+        self._headers = Headers(raw=raw)
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class MsgPackRoute(APIRoute):
+    """APIRoute that accepts msgpack bodies and negotiates the response format."""
+
+    def get_route_handler(self):
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request):
+            if is_msgpack(request.headers.get("content-type", "")):
+                if msgpack is None:
+                    return JSONResponse(
+                        status_code=415,
+                        content={"detail": "application/msgpack is not supported (msgpack is not installed)"},
+                    )
+                request = MsgPackRequest(request.scope, request.receive)
+
+            wants_msgpack = msgpack is not None and accepts_msgpack(request.headers.get("accept", ""))
+            token = _response_format.set("msgpack" if wants_msgpack else "json")
+            try:
+                return await original_handler(request)
+            finally:
+                _response_format.reset(token)
+
+        return handler
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSONResponse that renders msgpack when the current request asked for it."""
+
+    def render(self, content) -> bytes:
+        if _response_format.get() == "msgpack":
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
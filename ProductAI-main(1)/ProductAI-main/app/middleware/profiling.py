@@ -0,0 +1,61 @@
+"""
+Profiling Middleware - runs selected requests under the request profiler.
+
+See app/services/request_profiler.py for how requests are selected and
+what is written. A profiled response carries `X-Profile-Id`, the base name
+of its files in PRODUCTAI_PROFILE_DIR.
+"""
+import asyncio
+import re
+import time
+
+from app.services.request_profiler import finish_profile, profile_trigger, try_start_profile
+from app.services.structured_logging import get_correlation_id, get_logger
+
+PROFILE_HEADER = b"x-profile-request"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+logger = get_logger("request_profiler")
+
+
+def _profile_id(path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")[:48] or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}_{slug}_{get_correlation_id()}"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; place it inside CorrelationIdMiddleware so profile IDs carry the request ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        token = dict(scope.get("headers") or []).get(PROFILE_HEADER, b"").decode("latin-1").strip()
+        trigger = profile_trigger(path, token)
+        profiler = try_start_profile(path, trigger, _profile_id(path)) if trigger else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = profiler.profile.profile_id.encode("latin-1")
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # Snapshotting tracemalloc and writing files stay off the event loop
+            profile = await asyncio.to_thread(finish_profile, profiler)
+            base = await asyncio.to_thread(profile.write)
+            logger.info(
+                "Profiled %s (%s): %.2fs, %d samples, tracemalloc peak %.1f MB -> %s",
+                path, profile.trigger, profile.duration, profile.samples, profile.peak_bytes / 1e6, base,
+            )
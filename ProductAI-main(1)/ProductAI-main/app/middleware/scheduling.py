@@ -0,0 +1,35 @@
+"""
+Scheduling Middleware - tags each request with its scheduler RequestClass.
+
+1. The priority class comes from the route (SCHEDULER_ROUTE_PRIORITIES)
+2. `X-Request-Priority` may lower it (e.g. a batch job calling an
+   interactive route) but never raise it
+3. The tenant is `X-Workspace-Id`; routes that know the demo owner can
+   fall back to it with `set_default_tenant`
+"""
+from app.services.scheduler import PRIORITY_WEIGHTS, priority_for_path, request_class
+
+TENANT_HEADER = b"x-workspace-id"
+PRIORITY_HEADER = b"x-request-priority"
+
+
+class SchedulingMiddleware:
+    """Pure ASGI middleware; the RequestClass lives in a context variable for the request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        priority = priority_for_path(scope.get("path", ""))
+        requested = headers.get(PRIORITY_HEADER, b"").decode("latin-1").strip().lower()
+        if requested in PRIORITY_WEIGHTS and PRIORITY_WEIGHTS[requested] <= PRIORITY_WEIGHTS[priority]:
+            priority = requested
+        tenant = headers.get(TENANT_HEADER, b"").decode("latin-1").strip()[:128] or None
+
+        with request_class(priority=priority, tenant=tenant):
+            await self.app(scope, receive, send)
@@ -0,0 +1,39 @@
+"""
+Tracing Middleware - one server span per request, continuing the caller's trace.
+
+An incoming W3C `traceparent` (sent by the Node layer) makes this request's
+span a child of the caller's; otherwise a new trace starts here. The
+response carries a `traceparent` for the server span so the caller can
+link it.
+"""
+from app.services.tracing import KIND_SERVER, span
+
+TRACEPARENT_HEADER = b"traceparent"
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware; place it outside the middleware whose work should be in the span."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(TRACEPARENT_HEADER, b"").decode("latin-1")
+        path = scope.get("path", "")
+        with span(f"{scope.get('method', '')} {path}", kind=KIND_SERVER, traceparent=incoming,
+                  **{"http.method": scope.get("method", ""), "http.target": path}) as server_span:
+
+            async def send_with_traceparent(message):
+                if message["type"] == "http.response.start":
+                    server_span.set(**{"http.status_code": message["status"]})
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (TRACEPARENT_HEADER, server_span.traceparent.encode("latin-1")),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_traceparent)
@@ -0,0 +1,93 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal, Union
+
+
+# Request models
+class DemoSuggestionsRequest(BaseModel):
+    demoId: str
+    transcript: str = ""
+    sessionRef: Optional[str] = None  # Use the stored transcript instead of sending it
+    pauseDurations: List[float] = []  # One value per bin of binSeconds
+    replayFrequency: Union[List[float], float] = []  # Per bin, or a single total replay count
+    binSeconds: float = Field(1.0, gt=0)
+
+class TranslateDemoRequest(BaseModel):
+    demoId: str
+    targetLanguage: str
+    originalTranscript: str = ""
+    sessionRef: Optional[str] = None  # Use the stored transcript instead of sending it
+
+class AIReviewRequest(BaseModel):
+    demoId: str
+    comments: List[Dict[str, Any]]
+    languages: List[Dict[str, Any]]
+    reviewType: str = "on_demand"
+
+
+# Gemini output schemas (sent as response_schema, replies validated against them)
+class AISuggestion(BaseModel):
+    """One suggestion as generated by Gemini"""
+    timestamp: float = Field(description="Position in the demo, in seconds")
+    type: Literal["trim", "clarify", "cta", "pace", "general"]
+    suggestion: str = Field(description="Specific, actionable advice")
+    confidence: float = Field(ge=0.0, le=1.0)
+    reasoning: str
+
+class AISuggestionList(BaseModel):
+    suggestions: List[AISuggestion]
+
+class CTAText(BaseModel):
+    watch_demo: str
+    learn_more: str
+    get_started: str
+    contact_us: str
+
+class Subtitle(BaseModel):
+    start: float
+    end: float
+    text: str
+
+class AITranslation(BaseModel):
+    """Translation as generated by Gemini"""
+    translatedTranscript: str
+    translatedTitle: str
+    translatedSummary: str
+    ctaText: CTAText
+    subtitles: List[Subtitle]
+    translationQuality: float = Field(ge=0.0, le=1.0)
+
+class AIReview(BaseModel):
+    """Review as generated by Gemini"""
+    overallScore: float = Field(ge=0.0, le=10.0)
+    insights: List[str]
+    commonIssues: List[str]
+    translationWarnings: List[str]
+    recommendations: List[str]
+    publishReadiness: Literal["ready", "needs_work", "major_issues"]
+
+
+# Response models
+class SuggestionResponse(BaseModel):
+    timestamp: float
+    type: str
+    suggestion: str
+    confidence: float
+    reasoning: str
+    metadata: Dict[str, Any]
+
+class TranslationResponse(BaseModel):
+    translatedTranscript: str
+    translatedTitle: str
+    translatedSummary: str
+    ctaText: Dict[str, str]
+    subtitles: List[Dict[str, Any]]
+    translationQuality: float
+
+class ReviewResponse(BaseModel):
+    overallScore: float
+    insights: List[str]
+    commonIssues: List[str]
+    translationWarnings: List[str]
+    recommendations: List[str]
+    publishReadiness: str
+    metadata: Dict[str, Any]
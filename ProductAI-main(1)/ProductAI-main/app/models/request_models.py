@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from app.models.dom_event_models import RecordingSession
 
 
@@ -27,8 +27,13 @@ class AudioProcessRequest(BaseModel):
     New format:
     - deepgramData (with words, sentences, paragraphs)
     - session (RecordingSession object)
+
+    Stored format:
+    - sessionRef (ID returned by POST /sessions); transcript, words and
+      session are loaded server-side unless also sent inline
     """
-    text: str  # Raw transcript from Deepgram
+    text: str = ""  # Raw transcript from Deepgram
+    sessionRef: Optional[str] = None  # Content-addressed ID from POST /sessions
     
     # Accept BOTH field names for backward compatibility
     deepgramResponse: Optional[Dict[str, Any]] = None  # From Node.js (old format)
@@ -40,6 +45,10 @@ class AudioProcessRequest(BaseModel):
     
     recordingsPath: str  # Path where Node.js stores recordings
     metadata: Dict[str, Any] = {}  # Additional metadata (sessionId, etc.)
+
+    # Model routing hints: drafts and tight budgets go to the fast Gemini tier
+    qualityTier: Literal["draft", "final"] = "final"
+    latencyBudgetMs: Optional[int] = None
     
     @property
     def words(self) -> List[Dict[str, Any]]:
@@ -144,3 +153,10 @@ class AudioProcessRequest(BaseModel):
             return None
         
         return None
+
+
+class SessionUploadRequest(BaseModel):
+    """Session uploaded once to POST /sessions and referenced later by sessionRef"""
+    transcript: str = ""
+    words: List[Dict[str, Any]] = []
+    session: Optional[RecordingSession] = None
@@ -1,66 +1,47 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
-from pydantic import BaseModel
+from typing import Optional
+from app.models.collaboration_models import DemoSuggestionsRequest, TranslateDemoRequest, AIReviewRequest
 from app.services.collaboration_ai_service import collaboration_ai_service
+from app.middleware.msgpack_transport import MsgPackRoute, NegotiatedResponse
+from app.services.rate_limiter import ProviderUnavailableError
+from app.routes.session_routes import load_stored_session
+from app.services.scheduler import set_default_tenant
+from app.services.structured_logging import get_logger
 
-router = APIRouter(prefix="/collaboration", tags=["collaboration"])
+logger = get_logger("collaboration_api")
 
-# Request models
-class DemoSuggestionsRequest(BaseModel):
-    demoId: str
-    transcript: str
-    pauseDurations: List[float] = []
-    replayFrequency: List[int] = []
+router = APIRouter(
+    prefix="/collaboration",
+    tags=["collaboration"],
+    route_class=MsgPackRoute,
+    default_response_class=NegotiatedResponse,
+)
 
-class TranslateDemoRequest(BaseModel):
-    demoId: str
-    targetLanguage: str
-    originalTranscript: str
-
-class AIReviewRequest(BaseModel):
-    demoId: str
-    comments: List[Dict[str, Any]]
-    languages: List[Dict[str, Any]]
-    reviewType: str = "on_demand"
-
-# Response models
-class SuggestionResponse(BaseModel):
-    timestamp: float
-    type: str
-    suggestion: str
-    confidence: float
-    reasoning: str
-    metadata: Dict[str, Any]
-
-class TranslationResponse(BaseModel):
-    translatedTranscript: str
-    translatedTitle: str
-    translatedSummary: str
-    ctaText: Dict[str, str]
-    subtitles: List[Dict[str, Any]]
-    translationQuality: float
-
-class ReviewResponse(BaseModel):
-    overallScore: float
-    insights: List[str]
-    commonIssues: List[str]
-    translationWarnings: List[str]
-    recommendations: List[str]
-    publishReadiness: str
-    metadata: Dict[str, Any]
+async def resolve_transcript(transcript: str, session_ref: Optional[str]) -> str:
+    """Inline transcript if sent, otherwise the one stored under sessionRef"""
+    if transcript or not session_ref:
+        return transcript
+    return (await load_stored_session(session_ref)).transcript
 
 @router.post("/ai-suggestions")
 async def generate_ai_suggestions(request: DemoSuggestionsRequest):
     """Generate AI suggestions for demo improvement"""
     try:
-        print(f"[Collaboration API] Generating suggestions for demo {request.demoId}")
+        logger.info("Generating suggestions for demo %s", request.demoId)
+        set_default_tenant(request.demoId)  # fair share per demo without X-Workspace-Id
         
         demo_data = {
             "demoId": request.demoId,
-            "transcript": request.transcript,
+            "transcript": await resolve_transcript(request.transcript, request.sessionRef),
             "pauseDurations": request.pauseDurations,
-            "replayFrequency": request.replayFrequency
+            "replayFrequency": request.replayFrequency,
+            "binSeconds": request.binSeconds
         }
+        if request.sessionRef:
+            # Word timings let hotspot windows be cut exactly
+            stored = await load_stored_session(request.sessionRef)
+            demo_data["words"] = await asyncio.to_thread(lambda: stored.words)
         
         suggestions = await collaboration_ai_service.generate_demo_suggestions(demo_data)
         
@@ -71,20 +52,23 @@ async def generate_ai_suggestions(request: DemoSuggestionsRequest):
             "demoId": request.demoId
         }
         
+    except (ProviderUnavailableError, HTTPException):
+        raise
     except Exception as e:
-        print(f"[Collaboration API] Error generating suggestions: {e}")
+        logger.exception("Error generating suggestions: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate suggestions: {str(e)}")
 
 @router.post("/translate-demo")
 async def translate_demo(request: TranslateDemoRequest):
     """Translate demo content to target language"""
     try:
-        print(f"[Collaboration API] Translating demo {request.demoId} to {request.targetLanguage}")
+        logger.info("Translating demo %s to %s", request.demoId, request.targetLanguage)
+        set_default_tenant(request.demoId)
         
         demo_data = {
             "demoId": request.demoId,
             "targetLanguage": request.targetLanguage,
-            "originalTranscript": request.originalTranscript
+            "originalTranscript": await resolve_transcript(request.originalTranscript, request.sessionRef)
         }
         
         translation_result = await collaboration_ai_service.translate_demo_content(demo_data)
@@ -96,15 +80,18 @@ async def translate_demo(request: TranslateDemoRequest):
             **translation_result
         }
         
+    except (ProviderUnavailableError, HTTPException):
+        raise
     except Exception as e:
-        print(f"[Collaboration API] Error translating demo: {e}")
+        logger.exception("Error translating demo: %s", e)
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 @router.post("/ai-review")
 async def generate_ai_review(request: AIReviewRequest):
     """Generate comprehensive AI review of demo"""
     try:
-        print(f"[Collaboration API] Generating {request.reviewType} review for demo {request.demoId}")
+        logger.info("Generating %s review for demo %s", request.reviewType, request.demoId)
+        set_default_tenant(request.demoId)
         
         review_data = {
             "demoId": request.demoId,
@@ -122,8 +109,10 @@ async def generate_ai_review(request: AIReviewRequest):
             **review_result
         }
         
+    except (ProviderUnavailableError, HTTPException):
+        raise
     except Exception as e:
-        print(f"[Collaboration API] Error generating review: {e}")
+        logger.exception("Error generating review: %s", e)
         raise HTTPException(status_code=500, detail=f"Review generation failed: {str(e)}")
 
 @router.get("/health")
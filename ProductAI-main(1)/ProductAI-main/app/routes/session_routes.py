@@ -0,0 +1,56 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from app.middleware.msgpack_transport import MsgPackRoute, NegotiatedResponse
+from app.models.request_models import SessionUploadRequest
+from app.services.session_store import SessionNotFoundError, StoredSession, get_session_store
+from app.services.structured_logging import get_logger
+
+logger = get_logger("sessions_api")
+
+router = APIRouter(
+    prefix="/sessions",
+    tags=["sessions"],
+    route_class=MsgPackRoute,
+    default_response_class=NegotiatedResponse,
+)
+
+
+async def load_stored_session(session_ref: str) -> StoredSession:
+    """Resolve a sessionRef for a route, answering 404 when it is unknown (file I/O in a thread)"""
+    try:
+        return await asyncio.to_thread(lambda: get_session_store().load(session_ref))
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown sessionRef '{session_ref}'")
+
+
+@router.post("")
+async def upload_session(request: SessionUploadRequest):
+    """Store a session once; later calls reference it by the returned sessionRef"""
+    try:
+        summary = await asyncio.to_thread(
+            lambda: get_session_store().save(request.transcript, request.words, request.session)
+        )
+        logger.info("%s session %s", "Reused" if summary["deduplicated"] else "Stored", summary["sessionRef"])
+        return {"success": True, **summary}
+
+    except Exception as e:
+        logger.exception("Error storing session: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to store session: {str(e)}")
+
+
+@router.get("/{session_ref}")
+async def get_session(session_ref: str):
+    """Summary of a stored session (counts and sizes, not the payload)"""
+    return {"success": True, **(await load_stored_session(session_ref)).summary()}
+
+
+@router.delete("/{session_ref}")
+async def delete_session(session_ref: str):
+    """Remove a stored session"""
+    try:
+        deleted = await asyncio.to_thread(lambda: get_session_store().delete(session_ref))
+    except SessionNotFoundError:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Unknown sessionRef '{session_ref}'")
+    return {"success": True, "sessionRef": session_ref}
@@ -0,0 +1,166 @@
+"""
+Artifact Cache - memoized local preprocessing of stored sessions.
+
+Timing analysis and the RAG contexts built from DOM events only depend on
+the words and events they are computed from, so they are cached under:
+
+    (artifact name, algorithm version, content hash of the inputs)
+
+Only inputs that already carry a content address are memoized: stored
+sessions, whose sessionRef is a hash of their content. Hashing an inline
+session (serializing every event) costs more than preprocessing it.
+
+Lookups go through two levels:
+1. A small in-process LRU of decoded results
+2. The shared "artifacts" cache from cache_backend (zlib-compressed JSON,
+   shared by all workers, size-bounded LRU)
+
+Each artifact declares an algorithm version next to the function that
+computes it. Bumping the version makes old entries unreachable; the first
+lookup that finds an entry from an older version deletes it and records
+the invalidation.
+
+Cached results are shared between callers and must be treated as read-only.
+Shared-cache reads and writes, including the JSON and zlib coding, run in
+a worker thread; results can hold every word of a session. Results
+computed in a preprocess worker process are written to the shared cache
+by that process (store_shared), so the event loop never encodes them.
+
+Settings:
+    ARTIFACT_CACHE_TTL_S     lifetime in the shared cache (default 7 days)
+    ARTIFACT_CACHE_LRU_SIZE  in-process entries (default 256)
+"""
+import asyncio
+import collections
+import json
+import os
+import threading
+import zlib
+from typing import Any, Awaitable, Callable, Optional
+
+from app.services.cache_backend import cache_key, get_cache
+from app.services.metrics import counter
+from app.services.structured_logging import get_logger
+
+logger = get_logger("artifact_cache")
+
+ARTIFACT_CACHE_TTL_S = float(os.getenv("ARTIFACT_CACHE_TTL_S", str(7 * 24 * 3600)))
+ARTIFACT_CACHE_LRU_SIZE = int(os.getenv("ARTIFACT_CACHE_LRU_SIZE", "256"))
+
+ARTIFACT_REQUESTS = counter(
+    "artifact_cache_requests_total",
+    "Derived-artifact lookups by artifact and result (memory, shared or miss)",
+    ["artifact", "result"],
+)
+ARTIFACT_INVALIDATIONS = counter(
+    "artifact_cache_invalidations_total",
+    "Derived artifacts dropped because their algorithm version changed",
+    ["artifact", "reason"],
+)
+
+_MISSING = object()
+
+
+class ArtifactCache:
+    def __init__(self, lru_size: int = ARTIFACT_CACHE_LRU_SIZE, ttl: float = ARTIFACT_CACHE_TTL_S):
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self._lru: "collections.OrderedDict[str, Any]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def _shared(self):
+        return get_cache("artifacts", self.ttl)
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _check_version(self, artifact: str, version: int, content_hash: str) -> None:
+        """Drop the entry left by an older algorithm version, if any, and record it."""
+        index_key = cache_key("version", artifact, content_hash)
+        stored = self._shared.get_json(index_key)
+        if stored is not None and stored != version:
+            self._shared.delete(cache_key(artifact, stored, content_hash))
+            ARTIFACT_INVALIDATIONS.inc(artifact=artifact, reason="version")
+            logger.info("Invalidated %s v%s for %s (now v%s)", artifact, stored, content_hash[:12], version)
+        if stored != version:
+            self._shared.set_json(index_key, version)
+
+    def _lookup_memory(self, artifact: str, key: str) -> Any:
+        """The in-process value for `key`, or _MISSING."""
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                ARTIFACT_REQUESTS.inc(artifact=artifact, result="memory")
+                return self._lru[key]
+        return _MISSING
+
+    def _lookup_shared(self, artifact: str, key: str) -> Any:
+        """The shared-cache value for `key`, or _MISSING (blocking)."""
+        blob = self._shared.get_bytes(key)
+        if blob is not None:
+            value = json.loads(zlib.decompress(blob))
+            self._remember(key, value)
+            ARTIFACT_REQUESTS.inc(artifact=artifact, result="shared")
+            logger.debug("%s: reused cached result", artifact)
+            return value
+
+        ARTIFACT_REQUESTS.inc(artifact=artifact, result="miss")
+        return _MISSING
+
+    def _store(self, key: str, value: Any) -> None:
+        self._shared.set_bytes(key, zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8")))
+        self._remember(key, value)
+
+    def store_shared(self, artifact: str, version: int, content_hash: str, value: Any) -> None:
+        """Write a computed artifact to the shared cache only (blocking; for preprocess workers)."""
+        key = cache_key(artifact, version, content_hash)
+        self._shared.set_bytes(key, zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8")))
+
+    async def get_or_compute_async(
+        self,
+        artifact: str,
+        version: int,
+        content_hash: str,
+        compute: Callable[[], Awaitable[Any]],
+        stored_by_compute: bool = False,
+    ) -> Any:
+        """
+        Return the cached artifact for these inputs, computing and storing it on a miss.
+
+        Args:
+            artifact: Artifact name, e.g. "script_context"
+            version: Algorithm version of the function that computes it
+            content_hash: Content address of the inputs (a sessionRef)
+            compute: Zero-argument callable returning an awaitable of a
+                JSON-serializable result; it should keep the work off the
+                event loop (worker thread or process)
+            stored_by_compute: compute writes the shared-cache entry itself
+                (store_shared); only the in-process LRU is updated here
+        """
+        key = cache_key(artifact, version, content_hash)
+        value = self._lookup_memory(artifact, key)
+        if value is _MISSING:
+            value = await asyncio.to_thread(self._lookup_shared, artifact, key)
+        if value is _MISSING:
+            await asyncio.to_thread(self._check_version, artifact, version, content_hash)
+            value = await compute()
+            if stored_by_compute:
+                self._remember(key, value)
+            else:
+                await asyncio.to_thread(self._store, key, value)
+        return value
+
+
+_artifact_cache: Optional[ArtifactCache] = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = ArtifactCache()
+    return _artifact_cache
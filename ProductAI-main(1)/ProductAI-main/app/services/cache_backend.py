@@ -0,0 +1,379 @@
+"""
+Cache Backend - host-local cache shared by all uvicorn workers.
+
+The default backend is a SQLite database in WAL mode, so every worker
+process on the host reads and writes the same store:
+1. Writes are atomic (single INSERT OR REPLACE per entry)
+2. Entries expire after their TTL
+3. When the store grows past its size limit, the least recently used
+   entries are evicted
+
+Services use namespaced views from `get_cache()`, e.g. the LLM response
+cache ("llm") and the TTS audio cache ("tts"). SQLite calls block (up to
+the 5 s busy timeout while another worker writes), so coroutines use the
+`*_async` methods, which run them in a worker thread. Size eviction runs
+in a background thread. Opening the database (WAL setup, schema) also
+blocks: the backend is created on the first cache call, in the calling
+worker thread for the `*_async` methods, and at startup by the app.
+
+Settings:
+    PRODUCTAI_CACHE_BACKEND   sqlite (default), memory or off
+    PRODUCTAI_CACHE_PATH      SQLite file (default: <tmp>/productai_cache.sqlite3)
+    PRODUCTAI_CACHE_MAX_MB    size limit before LRU eviction (default 512)
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.services.metrics import counter, gauge, register_collector
+from app.services.structured_logging import get_logger
+
+logger = get_logger("cache")
+
+T = TypeVar("T")
+
+CACHE_BACKEND = os.getenv("PRODUCTAI_CACHE_BACKEND", "sqlite").lower()
+CACHE_PATH = os.getenv(
+    "PRODUCTAI_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "productai_cache.sqlite3"),
+)
+CACHE_MAX_BYTES = int(float(os.getenv("PRODUCTAI_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+CACHE_REQUESTS = counter(
+    "cache_requests_total",
+    "Cache lookups by cache namespace and result",
+    ["cache", "result"],
+)
+CACHE_HIT_RATIO = gauge(
+    "cache_hit_ratio",
+    "Share of lookups that hit, per cache namespace, since start (refreshed on scrape)",
+    ["cache"],
+)
+CACHE_EVICTIONS = counter(
+    "cache_evictions_total",
+    "Entries removed by TTL expiry or size eviction",
+    ["reason"],
+)
+
+
+def _update_hit_ratios() -> None:
+    totals: Dict[str, list] = {}
+    for labels, count in CACHE_REQUESTS.samples():
+        hits_and_total = totals.setdefault(labels["cache"], [0.0, 0.0])
+        hits_and_total[1] += count
+        if labels["result"] == "hit":
+            hits_and_total[0] += count
+    for namespace, (hits, total) in totals.items():
+        CACHE_HIT_RATIO.set(hits / total if total else 0.0, cache=namespace)
+
+
+register_collector(_update_hit_ratios)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable content hash for cache keys."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = json.dumps(part, sort_keys=True, default=str)
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class MemoryCacheBackend:
+    """Per-process LRU cache with TTL. Used when SQLite is disabled."""
+
+    # Calls never wait on I/O or other processes; async callers run them inline
+    blocking = False
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                self._remove(key)
+                CACHE_EVICTIONS.inc(reason="expired")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else 0.0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self._size += len(value)
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                CACHE_EVICTIONS.inc(reason="size")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+
+class SQLiteCacheBackend:
+    """
+    SQLite (WAL) cache shared across processes on the same host.
+
+    Access times are only rewritten when they are older than
+    `touch_interval` seconds, which keeps reads from turning into writes
+    while still giving approximate LRU order for eviction.
+
+    Every `evict_every` writes, eviction is handed to a background thread
+    rather than run by the writer.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_bytes: int, touch_interval: float = 60.0, evict_every: int = 100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.evict_every = evict_every
+        self._writes = 0
+        self._local = threading.local()
+        self._evict_requested = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+        self._evictor_lock = threading.Lock()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at and expires_at < now:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at = ?", (key, expires_at))
+            CACHE_EVICTIONS.inc(reason="expired")
+            return None
+        if now - accessed_at > self.touch_interval:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl else 0.0
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), len(value), expires_at, now),
+        )
+        # set() runs concurrently in several worker threads
+        with self._evictor_lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self._request_eviction()
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _request_eviction(self) -> None:
+        with self._evictor_lock:
+            if self._evictor is None:
+                self._evictor = threading.Thread(target=self._evict_loop, name="cache-evictor", daemon=True)
+                self._evictor.start()
+        self._evict_requested.set()
+
+    def _evict_loop(self) -> None:
+        while True:
+            self._evict_requested.wait()
+            self._evict_requested.clear()
+            try:
+                self.evict()
+            except sqlite3.Error as e:
+                logger.warning("Cache eviction failed: %s", e)
+
+    def evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under 90% of the limit."""
+        conn = self._conn()
+        expired = conn.execute(
+            "DELETE FROM cache WHERE expires_at > 0 AND expires_at < ?", (time.time(),)
+        ).rowcount
+        if expired:
+            CACHE_EVICTIONS.inc(expired, reason="expired")
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC").fetchall()
+            for key, size in rows:
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        CACHE_EVICTIONS.inc(evicted, reason="size")
+        logger.info("Evicted %d least recently used entries", evicted)
+
+
+class Cache:
+    """Namespaced view over the shared backend, with JSON helpers and hit/miss metrics."""
+
+    def __init__(self, namespace: str, backend=None, default_ttl: Optional[float] = None):
+        self.namespace = namespace
+        self._backend = backend
+        self.default_ttl = default_ttl
+
+    @property
+    def backend(self):
+        """The given backend, else the shared one (created on first use; blocking)."""
+        return self._backend if self._backend is not None else get_backend()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _call(self, method: Callable[..., T], *args: Any) -> T:
+        """Run a cache method off the event loop when the backend can block or is not open yet."""
+        backend = self._backend if self._backend is not None else _backend
+        if (backend is None and not _backend_disabled()) or getattr(backend, "blocking", False):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(self._key(key))
+        except sqlite3.Error as e:
+            logger.warning("%s read failed: %s", self.namespace, e)
+            value = None
+        CACHE_REQUESTS.inc(cache=self.namespace, result="hit" if value is not None else "miss")
+        return value
+
+    def set_bytes(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(self._key(key), value, ttl if ttl is not None else self.default_ttl)
+        except sqlite3.Error as e:
+            logger.warning("%s write failed: %s", self.namespace, e)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self.get_bytes(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_bytes(key, json.dumps(value, separators=(",", ":")).encode("utf-8"), ttl)
+
+    def delete(self, key: str) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.delete(self._key(key))
+        except sqlite3.Error as e:
+            logger.warning("%s delete failed: %s", self.namespace, e)
+
+    async def get_bytes_async(self, key: str) -> Optional[bytes]:
+        return await self._call(self.get_bytes, key)
+
+    async def set_bytes_async(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self._call(self.set_bytes, key, value, ttl)
+
+    async def get_json_async(self, key: str) -> Optional[Any]:
+        return await self._call(self.get_json, key)
+
+    async def set_json_async(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._call(self.set_json, key, value, ttl)
+
+    async def delete_async(self, key: str) -> None:
+        await self._call(self.delete, key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_caches: Dict[str, Cache] = {}
+
+
+def _backend_disabled() -> bool:
+    return CACHE_BACKEND == "off"
+
+
+def get_backend():
+    """The process-wide backend, created on first use (None when caching is off)."""
+    global _backend
+    if _backend is None and not _backend_disabled():
+        with _backend_lock:
+            if _backend is None:
+                if CACHE_BACKEND == "memory":
+                    _backend = MemoryCacheBackend(CACHE_MAX_BYTES)
+                else:
+                    try:
+                        _backend = SQLiteCacheBackend(CACHE_PATH, CACHE_MAX_BYTES)
+                    except sqlite3.Error as e:
+                        logger.warning("SQLite cache unavailable (%s), using in-process memory cache", e)
+                        _backend = MemoryCacheBackend(CACHE_MAX_BYTES)
+                logger.info("Using %s", type(_backend).__name__)
+    return _backend
+
+
+def get_cache(namespace: str, default_ttl: Optional[float] = None) -> Cache:
+    """Shared cache view for a namespace; the backend is opened on its first call."""
+    cache = _caches.get(namespace)
+    if cache is None:
+        cache = _caches[namespace] = Cache(namespace, default_ttl=default_ttl)
+    return cache
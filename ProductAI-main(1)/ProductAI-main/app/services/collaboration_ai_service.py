@@ -1,37 +1,80 @@
 import asyncio
-from typing import List, Dict, Any, Optional
-from app.services.gemini_service import generate_product_text
-import google.generativeai as genai
-import os
+from typing import List, Dict, Any
+from app.models.collaboration_models import AIReview, AISuggestionList, AITranslation
+from app.services.structured_output import generate_structured
+from app.services.micro_batcher import get_micro_batcher
+from app.services.comment_clustering import CommentCluster, summarize_comments
+from app.services.engagement_analysis import detect_hotspots, transcript_windows
+from app.services.rate_limiter import ProviderRateLimitError, ProviderUnavailableError
+from app.services.structured_logging import get_logger
 from datetime import datetime
 import json
 
+logger = get_logger("collaboration_ai")
+
+# Clusters of near-duplicate comments included in the review prompt
+MAX_HUMAN_CLUSTERS = 15
+MAX_AI_CLUSTERS = 10
+MAX_COMMENT_CHARS = 280
+# Transcript sent for suggestions when there is no engagement data to anchor windows
+MAX_TRANSCRIPT_EXCERPT_CHARS = 4000
+
 class CollaborationAIService:
     """AI service for collaboration features like suggestions, translations, and reviews"""
-    
-    def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
     async def generate_demo_suggestions(self, demo_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate AI suggestions for demo improvement"""
         try:
-            print(f"[Collaboration AI] Generating suggestions for demo {demo_data.get('demoId')}")
+            logger.debug("Generating suggestions for demo %s", demo_data.get("demoId"))
             
             transcript = demo_data.get('transcript', '')
             pause_durations = demo_data.get('pauseDurations', [])
             replay_frequency = demo_data.get('replayFrequency', [])
-            
+            bin_seconds = demo_data.get('binSeconds', 1.0)
+            words = demo_data.get('words')
+
+            # Total replays only (no per-bin series) can't be localized
+            replay_total = None
+            if isinstance(replay_frequency, (int, float)):
+                replay_total, replay_frequency = replay_frequency, []
+
+            hotspots = await asyncio.to_thread(detect_hotspots, pause_durations, replay_frequency, bin_seconds)
+            duration = max(len(pause_durations), len(replay_frequency)) * bin_seconds
+            if words:
+                duration = max(duration, float(words[-1].get('end', 0)))
+            windows = transcript_windows(hotspots, transcript, duration, words)
+            logger.debug("%d engagement hotspots -> %d transcript windows", len(hotspots), len(windows))
+
+            if windows:
+                engagement = f"""ENGAGEMENT HOTSPOTS (smoothed; score = standard deviations from normal):
+            {json.dumps([{"kind": h.kind, "start": round(h.start, 1), "end": round(h.end, 1), "peak": round(h.peak_time, 1), "score": h.score} for h in hotspots], indent=2)}
+
+            TRANSCRIPT AROUND HOTSPOTS (times in seconds):
+            {json.dumps([{"start": round(w.start, 1), "end": round(w.end, 1), "hotspots": w.kinds, "text": w.text} for w in windows], indent=2)}
+
+            Replay hotspots suggest confusing parts, pause hotspots suggest viewers
+            needing time, drop-offs suggest viewers losing interest. Anchor each
+            suggestion to a hotspot's timestamp."""
+            else:
+                excerpt = transcript[:MAX_TRANSCRIPT_EXCERPT_CHARS]
+                if len(transcript) > len(excerpt):
+                    excerpt += f" ... [{len(transcript) - len(excerpt)} more characters]"
+                engagement = f"""TRANSCRIPT:
+            {excerpt}
+
+            No engagement hotspots were found. Estimate each suggestion's
+            timestamp (in seconds) from the content."""
+            if replay_total is not None:
+                engagement += f"\n\n            Total replays: {replay_total}"
+
+            if duration > 0:
+                engagement = f"Demo length: about {round(duration)} seconds\n\n            {engagement}"
+
             # Build analysis prompt
             prompt = f"""
             Analyze this demo recording and provide specific, actionable suggestions for improvement:
 
-            TRANSCRIPT:
-            {transcript}
-
-            PAUSE ANALYSIS:
-            - Pause durations: {pause_durations}
-            - Replay frequency data: {replay_frequency}
+            {engagement}
 
             Please provide suggestions in the following categories:
             1. TRIM - sections that should be shortened or removed
@@ -40,53 +83,34 @@ class CollaborationAIService:
             4. PACE - pacing and flow improvements
             5. GENERAL - other improvements
 
-            For each suggestion, provide:
-            - timestamp (in seconds, estimate based on content)
-            - type (trim/clarify/cta/pace/general)
-            - suggestion (specific actionable advice)
-            - confidence (0.0-1.0)
-            - reasoning (why this suggestion matters)
-
-            Return as JSON array of suggestions.
+            Return at most 10 suggestions.
             """
 
-            response = await self.model.generate_content_async(prompt)
-            suggestions_text = response.text
-
-            # Parse AI response
-            try:
-                # Extract JSON from response
-                import re
-                json_match = re.search(r'\[.*\]', suggestions_text, re.DOTALL)
-                if json_match:
-                    suggestions_json = json.loads(json_match.group())
-                else:
-                    # Fallback parsing
-                    suggestions_json = self._parse_suggestions_fallback(suggestions_text, transcript)
-            except:
-                suggestions_json = self._parse_suggestions_fallback(suggestions_text, transcript)
-
-            # Validate and format suggestions
+            result, model_choice = await get_micro_batcher().submit(
+                prompt, task="demo_suggestions", output_model=AISuggestionList
+            )
+
+            # Format suggestions
             formatted_suggestions = []
-            for i, suggestion in enumerate(suggestions_json[:10]):  # Limit to 10 suggestions
+            for suggestion in result.suggestions[:10]:  # Limit to 10 suggestions
                 formatted_suggestion = {
-                    "timestamp": float(suggestion.get("timestamp", i * 10)),
-                    "type": suggestion.get("type", "general"),
-                    "suggestion": suggestion.get("suggestion", "Consider improving this section"),
-                    "confidence": float(suggestion.get("confidence", 0.7)),
-                    "reasoning": suggestion.get("reasoning", "AI analysis"),
+                    **suggestion.model_dump(),
                     "metadata": {
                         "generated_at": datetime.now().isoformat(),
-                        "ai_model": "gemini-2.0-flash"
+                        "ai_model": model_choice.model_name
                     }
                 }
                 formatted_suggestions.append(formatted_suggestion)
 
-            print(f"[Collaboration AI] Generated {len(formatted_suggestions)} suggestions")
+            logger.info("Generated %d suggestions", len(formatted_suggestions))
             return formatted_suggestions
 
+        except ProviderRateLimitError:
+            # Quota exhaustion goes back to the caller as 503; an open circuit
+            # (CircuitOpenError) falls through to the local fallback below
+            raise
         except Exception as e:
-            print(f"[Collaboration AI] Error generating suggestions: {e}")
+            logger.error("Error generating suggestions: %s", e)
             return self._generate_fallback_suggestions(demo_data)
 
     async def translate_demo_content(self, demo_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -96,7 +120,7 @@ class CollaborationAIService:
             target_language = demo_data.get('targetLanguage')
             original_transcript = demo_data.get('originalTranscript', '')
             
-            print(f"[Collaboration AI] Translating demo {demo_id} to {target_language}")
+            logger.debug("Translating demo %s to %s", demo_id, target_language)
 
             # Language mapping
             language_names = {
@@ -122,58 +146,28 @@ class CollaborationAIService:
 
             Please provide:
             1. Full translated transcript
-            2. Translated title (create an engaging title based on content)
+            2. Translated title (create an engaging title based on content) and a one-sentence summary
             3. Key CTA phrases translated
             4. Subtitle timing (estimate based on original length)
-
-            Return as JSON with:
-            - translatedTranscript
-            - translatedTitle
-            - ctaText (object with common CTA phrases)
-            - subtitles (array with start, end, text)
-            - translationQuality (0.0-1.0 confidence score)
+            5. Your confidence in the translation quality (0.0-1.0)
             """
 
-            response = await self.model.generate_content_async(prompt)
-            translation_text = response.text
-
-            # Parse translation response
-            try:
-                import re
-                json_match = re.search(r'\{.*\}', translation_text, re.DOTALL)
-                if json_match:
-                    translation_data = json.loads(json_match.group())
-                else:
-                    translation_data = self._parse_translation_fallback(translation_text, target_language)
-            except:
-                translation_data = self._parse_translation_fallback(translation_text, target_language)
+            translation, model_choice = await get_micro_batcher().submit(
+                prompt, task="demo_translation", output_model=AITranslation
+            )
+            result = translation.model_dump()
 
             # Generate subtitles if not provided
-            if 'subtitles' not in translation_data or not translation_data['subtitles']:
-                translation_data['subtitles'] = self._generate_subtitles(
-                    translation_data.get('translatedTranscript', original_transcript)
-                )
-
-            # Ensure required fields
-            result = {
-                "translatedTranscript": translation_data.get('translatedTranscript', original_transcript),
-                "translatedTitle": translation_data.get('translatedTitle', f"Demo in {target_lang_name}"),
-                "translatedSummary": translation_data.get('translatedSummary', ''),
-                "ctaText": translation_data.get('ctaText', {
-                    "watch_demo": "Watch Demo",
-                    "learn_more": "Learn More",
-                    "get_started": "Get Started",
-                    "contact_us": "Contact Us"
-                }),
-                "subtitles": translation_data.get('subtitles', []),
-                "translationQuality": float(translation_data.get('translationQuality', 0.8))
-            }
+            if not result['subtitles']:
+                result['subtitles'] = self._generate_subtitles(result['translatedTranscript'] or original_transcript)
 
-            print(f"[Collaboration AI] Translation completed for {target_language}")
+            logger.info("Translation completed for %s", target_language)
             return result
 
+        except ProviderUnavailableError:
+            raise
         except Exception as e:
-            print(f"[Collaboration AI] Error translating to {target_language}: {e}")
+            logger.error("Error translating to %s: %s", target_language, e)
             raise Exception(f"Translation failed: {str(e)}")
 
     async def generate_demo_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -184,31 +178,33 @@ class CollaborationAIService:
             languages = review_data.get('languages', [])
             review_type = review_data.get('reviewType', 'on_demand')
             
-            print(f"[Collaboration AI] Generating {review_type} review for demo {demo_id}")
+            logger.debug("Generating %s review for demo %s", review_type, demo_id)
 
-            # Analyze comments
-            human_comments = [c for c in comments if not c.get('aiGenerated', False)]
-            ai_comments = [c for c in comments if c.get('aiGenerated', False)]
-            open_comments = [c for c in comments if c.get('status') == 'open']
-            resolved_comments = [c for c in comments if c.get('status') == 'resolved']
+            # Cluster near-duplicate comments so the prompt stays a fixed size
+            summary = await asyncio.to_thread(summarize_comments, comments)
+            logger.debug("%d comments -> %d human and %d AI clusters",
+                         summary.total, len(summary.human_clusters), len(summary.ai_clusters))
 
             # Build review prompt
             prompt = f"""
             Analyze this demo and provide a comprehensive review:
 
             DEMO STATISTICS:
-            - Total comments: {len(comments)}
-            - Human comments: {len(human_comments)}
-            - AI suggestions: {len(ai_comments)}
-            - Open issues: {len(open_comments)}
-            - Resolved issues: {len(resolved_comments)}
+            - Total comments: {summary.total}
+            - Human comments: {summary.human}
+            - AI suggestions: {summary.ai}
+            - Open issues: {summary.open}
+            - Resolved issues: {summary.resolved}
             - Supported languages: {len(languages)}
 
-            HUMAN COMMENTS:
-            {json.dumps([{"timestamp": c.get("timestamp"), "comment": c.get("comment"), "status": c.get("status")} for c in human_comments[:10]], indent=2)}
+            Comments are grouped into clusters of near-duplicates, most frequent
+            and most open first. "count" is how many comments the cluster holds.
 
-            AI SUGGESTIONS:
-            {json.dumps([{"type": c.get("suggestionType"), "comment": c.get("comment"), "status": c.get("status")} for c in ai_comments[:10]], indent=2)}
+            HUMAN COMMENT CLUSTERS:
+            {json.dumps(self._format_clusters(summary.human_clusters, MAX_HUMAN_CLUSTERS), indent=2)}
+
+            AI SUGGESTION CLUSTERS:
+            {json.dumps(self._format_clusters(summary.ai_clusters, MAX_AI_CLUSTERS), indent=2)}
 
             LANGUAGES:
             {json.dumps([{"language": l.get("language"), "quality": l.get("translationQuality")} for l in languages], indent=2)}
@@ -220,56 +216,55 @@ class CollaborationAIService:
             4. Translation quality warnings
             5. Specific recommendations for improvement
             6. Readiness assessment for publishing
-
-            Return as JSON with:
-            - overallScore
-            - insights (array of key insights)
-            - commonIssues (array of recurring problems)
-            - translationWarnings (array of language-specific issues)
-            - recommendations (array of actionable improvements)
-            - publishReadiness (ready/needs_work/major_issues)
             """
 
-            response = await self.model.generate_content_async(prompt)
-            review_text = response.text
-
-            # Parse review response
-            try:
-                import re
-                json_match = re.search(r'\{.*\}', review_text, re.DOTALL)
-                if json_match:
-                    review_data = json.loads(json_match.group())
-                else:
-                    review_data = self._parse_review_fallback(review_text, comments, languages)
-            except:
-                review_data = self._parse_review_fallback(review_text, comments, languages)
+            review, model_choice = await generate_structured(prompt, AIReview, task="demo_review")
 
             # Format final review
             result = {
-                "overallScore": float(review_data.get('overallScore', 7.0)),
-                "insights": review_data.get('insights', [
-                    f"Demo has {len(comments)} total comments",
-                    f"Supports {len(languages)} languages",
-                    f"{len(open_comments)} issues remain open"
-                ]),
-                "commonIssues": review_data.get('commonIssues', []),
-                "translationWarnings": review_data.get('translationWarnings', []),
-                "recommendations": review_data.get('recommendations', []),
-                "publishReadiness": review_data.get('publishReadiness', 'ready'),
+                **review.model_dump(),
                 "metadata": {
                     "generated_at": datetime.now().isoformat(),
                     "review_type": review_type,
-                    "ai_model": "gemini-2.0-flash"
+                    "ai_model": model_choice.model_name
                 }
             }
 
-            print(f"[Collaboration AI] Review completed with score {result['overallScore']}")
+            logger.info("Review completed with score %s", result["overallScore"])
             return result
 
+        except ProviderRateLimitError:
+            # Quota exhaustion goes back to the caller as 503; an open circuit
+            # (CircuitOpenError) falls through to the local fallback below
+            raise
         except Exception as e:
-            print(f"[Collaboration AI] Error generating review: {e}")
+            logger.error("Error generating review: %s", e)
             return self._generate_fallback_review(review_data)
 
+    def _format_clusters(self, clusters: List[CommentCluster], limit: int) -> Dict[str, Any]:
+        """Top clusters as prompt-ready dicts, plus what was left out"""
+        formatted = []
+        for cluster in clusters[:limit]:
+            representative = cluster.representative
+            entry = {
+                "comment": str(representative.get("comment") or "")[:MAX_COMMENT_CHARS],
+                "count": cluster.count,
+                "open": cluster.open_count,
+                "resolved": cluster.resolved_count,
+            }
+            if representative.get("suggestionType"):
+                entry["type"] = representative.get("suggestionType")
+            if cluster.timestamp_buckets:
+                entry["timestamps"] = cluster.describe_buckets()
+            formatted.append(entry)
+
+        omitted = clusters[limit:]
+        return {
+            "clusters": formatted,
+            "omitted_clusters": len(omitted),
+            "omitted_comments": sum(cluster.count for cluster in omitted),
+        }
+
     def _generate_fallback_suggestions(self, demo_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Fallback suggestions when AI fails"""
         transcript = demo_data.get('transcript', '')
@@ -297,16 +292,6 @@ class CollaborationAIService:
 
         return suggestions
 
-    def _parse_translation_fallback(self, text: str, target_language: str) -> Dict[str, Any]:
-        """Fallback translation parsing"""
-        return {
-            "translatedTranscript": f"[Translation to {target_language} failed - original content]",
-            "translatedTitle": f"Demo in {target_language.upper()}",
-            "ctaText": {"watch_demo": "Watch Demo"},
-            "subtitles": [],
-            "translationQuality": 0.5
-        }
-
     def _generate_subtitles(self, text: str) -> List[Dict[str, Any]]:
         """Generate basic subtitle timing"""
         words = text.split()
@@ -349,43 +334,5 @@ class CollaborationAIService:
             "metadata": {"fallback": True}
         }
 
-    def _parse_suggestions_fallback(self, text: str, transcript: str) -> List[Dict[str, Any]]:
-        """Parse suggestions from text when JSON parsing fails"""
-        suggestions = []
-        lines = text.split('\n')
-        
-        current_suggestion = {}
-        for line in lines:
-            line = line.strip()
-            if 'timestamp' in line.lower():
-                if current_suggestion:
-                    suggestions.append(current_suggestion)
-                current_suggestion = {"timestamp": 0}
-            elif 'type' in line.lower():
-                current_suggestion["type"] = "general"
-            elif 'suggestion' in line.lower():
-                current_suggestion["suggestion"] = line
-            elif line and len(line) > 10:
-                current_suggestion["suggestion"] = line
-
-        if current_suggestion:
-            suggestions.append(current_suggestion)
-
-        return suggestions[:5]  # Limit fallback suggestions
-
-    def _parse_review_fallback(self, text: str, comments: List, languages: List) -> Dict[str, Any]:
-        """Parse review from text when JSON parsing fails"""
-        score_match = re.search(r'(\d+(?:\.\d+)?)', text)
-        score = float(score_match.group(1)) if score_match else 7.0
-        
-        return {
-            "overallScore": min(10, max(0, score)),
-            "insights": [f"Analysis of {len(comments)} comments completed"],
-            "commonIssues": [],
-            "translationWarnings": [],
-            "recommendations": ["Review feedback and improve accordingly"],
-            "publishReadiness": "ready"
-        }
-
 # Export singleton instance
 collaboration_ai_service = CollaborationAIService()
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Comment Clustering - local near-duplicate grouping of review comments.
+
+Demos with large discussion threads repeat the same feedback many times.
+Before an AI review, comments are summarized locally:
+1. Each comment is reduced to word 1- and 2-gram shingles and a MinHash
+   signature
+2. Comments with identical shingles (and empty ones) merge outright; for
+   the rest, LSH banding finds candidate pairs (every pair sharing a band
+   bucket), and pairs whose estimated Jaccard similarity reaches
+   SIMILARITY_THRESHOLD are merged (union-find), so a comment joins a
+   cluster when it is similar to any of its members
+3. Clusters are ranked by size, with open comments weighted higher
+4. Each cluster keeps a representative comment, its counts and the
+   timestamp buckets it covers
+
+Human comments and AI suggestions are clustered separately, so the review
+prompt carries a fixed number of representatives with counts instead of an
+arbitrary slice of the thread.
+"""
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs at ~0.5 Jaccard collide with high probability
+SIMILARITY_THRESHOLD = 0.5
+OPEN_WEIGHT = 1.0  # an open comment counts (1 + OPEN_WEIGHT) times when ranking
+TIMESTAMP_BUCKET_S = 30
+REPRESENTATIVE_SAMPLE = 50  # members compared when picking a cluster's representative
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERMUTATIONS)
+]
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+@dataclass
+class CommentCluster:
+    """Near-duplicate comments represented by one of them."""
+    representative: Dict[str, Any]
+    count: int
+    open_count: int
+    resolved_count: int
+    timestamp_buckets: Dict[int, int] = field(default_factory=dict)  # bucket start (s) -> comments
+
+    @property
+    def rank_score(self) -> float:
+        return self.count + OPEN_WEIGHT * self.open_count
+
+    def describe_buckets(self, limit: int = 5) -> str:
+        busiest = sorted(self.timestamp_buckets.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return ", ".join(
+            f"{_format_time(start)}-{_format_time(start + TIMESTAMP_BUCKET_S)} ({count})"
+            for start, count in sorted(busiest)
+        )
+
+
+@dataclass
+class CommentSummary:
+    """Counts over all comments plus ranked clusters per origin."""
+    total: int = 0
+    human: int = 0
+    ai: int = 0
+    open: int = 0
+    resolved: int = 0
+    human_clusters: List[CommentCluster] = field(default_factory=list)
+    ai_clusters: List[CommentCluster] = field(default_factory=list)
+
+
+def _format_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _shingles(text: str) -> set:
+    words = _WORD_PATTERN.findall(text.lower())
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def minhash_signature(text: str) -> Optional[List[int]]:
+    """MinHash signature of a comment's shingles (None for empty comments)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimated_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def _find(parents: List[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def cluster_comments(comments: List[Dict[str, Any]]) -> List[CommentCluster]:
+    """Group near-duplicate comments and rank the clusters, largest and most open first."""
+    if not comments:
+        return []
+
+    signatures = [minhash_signature(str(c.get("comment") or "")) for c in comments]
+    parents = list(range(len(comments)))
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+
+    # Identical signatures (repeated and empty texts) join the first one without comparing
+    first_with: Dict[tuple, int] = {}
+    for i, signature in enumerate(signatures):
+        j = first_with.setdefault(tuple(signature) if signature else (), i)
+        if j != i:
+            parents[i] = j
+    distinct = [i for key, i in first_with.items() if key]
+
+    for band in range(LSH_BANDS):
+        buckets: Dict[tuple, List[int]] = {}
+        for i in distinct:
+            signature = signatures[i]
+            bucket = buckets.setdefault(tuple(signature[band * rows:(band + 1) * rows]), [])
+            for j in bucket:
+                root_i, root_j = _find(parents, i), _find(parents, j)
+                if root_i != root_j and estimated_similarity(signature, signatures[j]) >= SIMILARITY_THRESHOLD:
+                    parents[root_i] = root_j
+            bucket.append(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(comments)):
+        groups.setdefault(_find(parents, i), []).append(i)
+
+    clusters = []
+    for members in groups.values():
+        statuses = Counter(comments[i].get("status") for i in members)
+        buckets: Dict[int, int] = {}
+        for i in members:
+            timestamp = comments[i].get("timestamp")
+            if isinstance(timestamp, (int, float)):
+                start = int(timestamp // TIMESTAMP_BUCKET_S) * TIMESTAMP_BUCKET_S
+                buckets[start] = buckets.get(start, 0) + 1
+
+        clusters.append(CommentCluster(
+            representative=comments[_representative(members, signatures, comments)],
+            count=len(members),
+            open_count=statuses.get("open", 0),
+            resolved_count=statuses.get("resolved", 0),
+            timestamp_buckets=buckets,
+        ))
+
+    clusters.sort(key=lambda cluster: cluster.rank_score, reverse=True)
+    return clusters
+
+
+def _representative(members: List[int], signatures: List[Optional[List[int]]], comments: List[Dict[str, Any]]) -> int:
+    """Member most similar to the rest of its cluster (open comments win ties)."""
+    if len(members) <= 2:
+        return max(members, key=lambda i: comments[i].get("status") == "open")
+    sample = members[:REPRESENTATIVE_SAMPLE]
+
+    def centrality(i: int) -> tuple:
+        signature = signatures[i]
+        similarity = 0.0
+        if signature is not None:
+            similarity = sum(
+                estimated_similarity(signature, signatures[j]) for j in sample if j != i and signatures[j] is not None
+            )
+        return similarity, comments[i].get("status") == "open"
+
+    return max(sample, key=centrality)
+
+
+def summarize_comments(comments: List[Dict[str, Any]]) -> CommentSummary:
+    """Counts in one pass, then separate clusters for human comments and AI suggestions."""
+    summary = CommentSummary(total=len(comments))
+    human_comments: List[Dict[str, Any]] = []
+    ai_comments_by_type: Dict[str, List[Dict[str, Any]]] = {}
+
+    for comment in comments:
+        status = comment.get("status")
+        if status == "open":
+            summary.open += 1
+        elif status == "resolved":
+            summary.resolved += 1
+        if comment.get("aiGenerated", False):
+            summary.ai += 1
+            ai_comments_by_type.setdefault(comment.get("suggestionType") or "general", []).append(comment)
+        else:
+            summary.human += 1
+            human_comments.append(comment)
+
+    summary.human_clusters = cluster_comments(human_comments)
+    for suggestions in ai_comments_by_type.values():
+        summary.ai_clusters.extend(cluster_comments(suggestions))
+    summary.ai_clusters.sort(key=lambda cluster: cluster.rank_score, reverse=True)
+    return summary
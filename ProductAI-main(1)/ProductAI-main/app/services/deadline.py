@@ -0,0 +1,121 @@
+"""
+Deadline Service - the caller's time budget, visible to every pipeline stage.
+
+The Node layer sends `X-Deadline-Ms` (how long it will wait for the
+response). DeadlineMiddleware turns that into an absolute deadline in a
+context variable, so any stage can ask how much time is left:
+
+    remaining = remaining_time()      # None when the caller gave no deadline
+    check_deadline("tts")             # raises DeadlineExceededError when past it
+    audio = await run_within_deadline("tts", synthesize_voice(script))
+
+`run_within_deadline` cancels the stage (and the provider call under it)
+when the deadline passes, so abandoned requests stop spending quota.
+Stages pick cheaper paths when time is short; see choose_script_tier.
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from app.services.metrics import counter
+from app.services.structured_logging import get_logger
+
+logger = get_logger("deadline")
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = b"x-deadline-ms"
+
+# Script tiers, most to least expensive
+SCRIPT_TIERS = ("full", "cached", "fast", "local")
+
+DEGRADATIONS = counter(
+    "deadline_degradations_total",
+    "Pipeline stages that took a cheaper path or were cut short by the caller's deadline",
+    ["stage", "outcome"],
+)
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """The caller's deadline passed before `stage` could finish."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def parse_deadline_ms(value: Optional[bytes]) -> Optional[float]:
+    """Seconds the client will wait, from an X-Deadline-Ms header value."""
+    if not value:
+        return None
+    try:
+        budget = float(value) / 1000
+    except ValueError:
+        return None
+    return budget if budget > 0 else None
+
+
+@contextmanager
+def deadline_after(seconds: Optional[float]) -> Iterator[None]:
+    """Run the enclosed code with a deadline `seconds` from now (None: no deadline)."""
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(stage: str) -> None:
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        DEGRADATIONS.inc(stage=stage, outcome="expired")
+        raise DeadlineExceededError(stage)
+
+
+async def run_within_deadline(stage: str, awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it if the deadline passes first."""
+    remaining = remaining_time()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        DEGRADATIONS.inc(stage=stage, outcome="expired")
+        raise DeadlineExceededError(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        DEGRADATIONS.inc(stage=stage, outcome="cancelled")
+        logger.warning("%s cancelled at the caller's deadline", stage)
+        raise DeadlineExceededError(stage) from None
+
+
+def choose_script_tier(
+    budget: Optional[float],
+    quality_latency: float,
+    fast_latency: float,
+    has_cached_script: bool,
+) -> str:
+    """
+    Cheapest acceptable script path for the time left (`budget`, seconds):
+    "full" (routed Gemini call), "cached" (an earlier script for the same
+    inputs), "fast" (flash-lite) or "local" (no Gemini call).
+    """
+    if budget is None or budget >= quality_latency:
+        return "full"
+    if has_cached_script:
+        return "cached"
+    if budget >= fast_latency:
+        return "fast"
+    return "local"
@@ -1,20 +1,33 @@
 # elevenlabs_service.py — Deepgram + background music, NO ffmpeg REQUIRED
 
+import asyncio
 import os
 import re
-import tempfile
-from pathlib import Path
 from typing import List
 
-import requests
-from dotenv import load_dotenv
-from pydub import AudioSegment
+from app.services.cache_backend import cache_key, get_cache
+from app.services.metrics import counter
+from app.services.rate_limiter import (
+    OVERLOAD_STATUS_CODES,
+    ProviderRateLimitError,
+    parse_retry_after,
+)
+from app.services.resilience import call_provider, observed_latency
+from app.services.structured_logging import get_logger
 
-load_dotenv()
+logger = get_logger("tts")
 
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 DEFAULT_VOICE_MODEL = "aura-2-thalia-en"
-DEEPGRAM_SPEAK_URL = "https://api.deepgram.com/v1/speak"
+DEEPGRAM_SPEAK_URL = os.getenv("DEEPGRAM_SPEAK_URL", "https://api.deepgram.com/v1/speak")
+TTS_CACHE_TTL_S = float(os.getenv("TTS_CACHE_TTL_S", str(7 * 24 * 3600)))
+TTS_LATENCY_PRIOR_S = 3.0  # until real synthesis calls have been observed
+
+TTS_CHARACTERS = counter(
+    "tts_characters_total",
+    "Characters synthesized by Deepgram (TTS cache hits excluded)",
+    ["voice"],
+)
 
 
 def chunk_by_sentence(text: str) -> List[str]:
@@ -29,7 +42,20 @@ def ensure_sentence_endings(text: str) -> str:
     return txt
 
 
+def raise_for_deepgram_status(resp) -> None:
+    if resp.status_code in OVERLOAD_STATUS_CODES:
+        raise ProviderRateLimitError(
+            "deepgram",
+            f"Deepgram error {resp.status_code}: {resp.text}",
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+        )
+    if not resp.ok:
+        raise RuntimeError(f"Deepgram error {resp.status_code}: {resp.text}")
+
+
 def call_deepgram(text: str, model: str) -> bytes:
+    import requests
+
     headers = {
         "Authorization": f"Token {DEEPGRAM_API_KEY}",
         "Content-Type": "application/json",
@@ -40,8 +66,7 @@ def call_deepgram(text: str, model: str) -> bytes:
         "bit_rate": "32000",
     }
     resp = requests.post(DEEPGRAM_SPEAK_URL, headers=headers, params=params, json={"text": text})
-    if not resp.ok:
-        raise RuntimeError(f"Deepgram error {resp.status_code}: {resp.text}")
+    raise_for_deepgram_status(resp)
     return resp.content
 
 
@@ -51,6 +76,9 @@ def generate_voice_from_text(text: str, voice_id: str = DEFAULT_VOICE_MODEL) ->
 
     text = ensure_sentence_endings(text)
 
+    # Imported here to keep it off the import path of app.main (cold start)
+    import requests
+
     # CALL DEEPGRAM ONCE — fastest
     resp = requests.post(
         DEEPGRAM_SPEAK_URL,
@@ -68,7 +96,36 @@ def generate_voice_from_text(text: str, voice_id: str = DEFAULT_VOICE_MODEL) ->
         timeout=30,
     )
 
-    if not resp.ok:
-        raise RuntimeError(f"Deepgram error {resp.status_code}: {resp.text}")
+    raise_for_deepgram_status(resp)
 
     return resp.content
+
+
+def expected_tts_latency() -> float:
+    """p90 of recent synthesis calls, for deciding whether audio fits in a deadline."""
+    return observed_latency("deepgram", "speak", 0.9) or TTS_LATENCY_PRIOR_S
+
+
+async def synthesize_voice(text: str, voice_id: str = DEFAULT_VOICE_MODEL) -> bytes:
+    """
+    Rate-limited TTS for async callers. The blocking HTTP call runs in a
+    worker thread so the event loop stays free while we wait on Deepgram.
+    Audio is shared across workers through the "tts" cache.
+    """
+    cache = get_cache("tts", TTS_CACHE_TTL_S)
+    key = cache_key(voice_id, text)
+    audio = await cache.get_bytes_async(key)
+    if audio is not None:
+        logger.debug("Served %d bytes from TTS cache", len(audio))
+        return audio
+
+    TTS_CHARACTERS.inc(len(text), voice=voice_id)
+    audio = await call_provider(
+        "deepgram",
+        "speak",
+        lambda: asyncio.to_thread(generate_voice_from_text, text, voice_id),
+        units=len(text),
+    )
+    if audio:
+        await cache.set_bytes_async(key, audio)
+    return audio
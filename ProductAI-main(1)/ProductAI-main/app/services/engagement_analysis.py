@@ -0,0 +1,171 @@
+"""
+Engagement Analysis - vectorized hotspot detection for demo suggestions.
+
+`pauseDurations` and `replayFrequency` are time series with one value per
+bin of `bin_seconds`. Instead of pasting them into the prompt:
+1. Both series are smoothed with a centered moving average
+2. Replay and pause hotspots are runs of bins above mean + HOTSPOT_Z * std
+3. Drop-off points are the steepest falls in the smoothed replay series
+4. Only the transcript windows around those peaks go to Gemini, so the
+   prompt is bounded by the number of hotspots, not the demo length
+
+Windows are cut from word timings when they are available (stored
+sessions), otherwise from the transcript assuming an even speaking rate.
+NumPy is imported on first use to keep worker start-up fast.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+SMOOTHING_WINDOW_S = 5.0
+HOTSPOT_Z = 1.0
+DROP_OFF_Z = 1.5
+MAX_HOTSPOTS_PER_KIND = 5
+WINDOW_PADDING_S = 10.0
+MAX_WINDOW_CHARS = 600
+
+
+@dataclass
+class Hotspot:
+    """A stretch of the demo where engagement stands out."""
+    kind: str  # "replay", "pause" or "drop_off"
+    start: float  # seconds
+    end: float
+    peak_time: float
+    score: float  # standard deviations above (or, for drop-offs, below) normal
+
+
+@dataclass
+class TranscriptWindow:
+    """Transcript text around one or more overlapping hotspots."""
+    start: float
+    end: float
+    text: str
+    kinds: List[str] = field(default_factory=list)
+
+
+def _smooth(np, values, window_bins: int):
+    if window_bins <= 1 or len(values) < 3:
+        return values
+    window_bins = min(window_bins, len(values))
+    kernel = np.ones(window_bins) / window_bins
+    # Normalize by the kernel mass actually inside the series, so edges aren't damped
+    return np.convolve(values, kernel, mode="same") / np.convolve(np.ones(len(values)), kernel, mode="same")
+
+
+def _runs_above(np, smoothed, threshold):
+    """(start, end) bin index pairs of contiguous runs where smoothed > threshold."""
+    above = np.concatenate(([False], smoothed > threshold, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _series_hotspots(np, kind: str, series: Sequence[float], bin_seconds: float) -> List[Hotspot]:
+    values = np.asarray(series, dtype=float)
+    if values.size < 3:
+        return []
+    smoothed = _smooth(np, values, int(round(SMOOTHING_WINDOW_S / bin_seconds)))
+    mean, std = smoothed.mean(), smoothed.std()
+    if std == 0:
+        return []
+
+    hotspots = []
+    for start, end in _runs_above(np, smoothed, mean + HOTSPOT_Z * std):
+        peak = start + int(np.argmax(smoothed[start:end]))
+        hotspots.append(Hotspot(
+            kind=kind,
+            start=start * bin_seconds,
+            end=end * bin_seconds,
+            peak_time=peak * bin_seconds,
+            score=round(float((smoothed[peak] - mean) / std), 2),
+        ))
+    hotspots.sort(key=lambda h: h.score, reverse=True)
+    return hotspots[:MAX_HOTSPOTS_PER_KIND]
+
+
+def _drop_offs(np, series: Sequence[float], bin_seconds: float) -> List[Hotspot]:
+    values = np.asarray(series, dtype=float)
+    if values.size < 4:
+        return []
+    smoothed = _smooth(np, values, int(round(SMOOTHING_WINDOW_S / bin_seconds)))
+    falls = np.diff(smoothed)
+    std = falls.std()
+    if std == 0:
+        return []
+
+    # Steepest falls first; skip bins adjacent to one already taken
+    candidates = np.flatnonzero(falls < falls.mean() - DROP_OFF_Z * std)
+    drop_offs: List[Hotspot] = []
+    taken: List[int] = []
+    for index in candidates[np.argsort(falls[candidates])]:
+        if any(abs(int(index) - t) * bin_seconds < SMOOTHING_WINDOW_S for t in taken):
+            continue
+        taken.append(int(index))
+        drop_offs.append(Hotspot(
+            kind="drop_off",
+            start=index * bin_seconds,
+            end=(index + 1) * bin_seconds,
+            peak_time=(index + 1) * bin_seconds,
+            score=round(float((falls.mean() - falls[index]) / std), 2),
+        ))
+        if len(drop_offs) >= MAX_HOTSPOTS_PER_KIND:
+            break
+    return drop_offs
+
+
+def detect_hotspots(
+    pause_durations: Sequence[float],
+    replay_frequency: Sequence[float],
+    bin_seconds: float = 1.0,
+) -> List[Hotspot]:
+    """Replay, pause and drop-off hotspots, ordered by time."""
+    if len(pause_durations) < 3 and len(replay_frequency) < 3:
+        return []
+    import numpy as np
+
+    hotspots = (
+        _series_hotspots(np, "replay", replay_frequency, bin_seconds)
+        + _series_hotspots(np, "pause", pause_durations, bin_seconds)
+        + _drop_offs(np, replay_frequency, bin_seconds)
+    )
+    hotspots.sort(key=lambda h: h.start)
+    return hotspots
+
+
+def transcript_windows(
+    hotspots: List[Hotspot],
+    transcript: str,
+    duration: float,
+    words: Optional[List[Dict[str, Any]]] = None,
+) -> List[TranscriptWindow]:
+    """Transcript around each hotspot's peak; hotspots peaking inside an earlier window share it."""
+    windows: List[TranscriptWindow] = []
+    for hotspot in sorted(hotspots, key=lambda h: h.peak_time):
+        if windows and hotspot.peak_time < windows[-1].end:
+            if hotspot.kind not in windows[-1].kinds:
+                windows[-1].kinds.append(hotspot.kind)
+            continue
+        start = max(0.0, hotspot.peak_time - WINDOW_PADDING_S)
+        if windows:
+            start = max(start, windows[-1].end)
+        windows.append(TranscriptWindow(
+            start=start, end=hotspot.peak_time + WINDOW_PADDING_S, text="", kinds=[hotspot.kind]
+        ))
+
+    for window in windows:
+        if words:
+            text = " ".join(
+                str(w.get("punctuated_word") or w.get("word", ""))
+                for w in words
+                if window.start <= float(w.get("start", 0)) < window.end
+            )
+        elif transcript and duration > 0:
+            # No word timings: assume an even speaking rate over the demo
+            first = int(len(transcript) * min(window.start / duration, 1.0))
+            last = int(len(transcript) * min(window.end / duration, 1.0))
+            text = transcript[first:last]
+        else:
+            text = ""
+        if len(text) > MAX_WINDOW_CHARS:
+            text = text[:MAX_WINDOW_CHARS].rsplit(" ", 1)[0] + " ..."
+        window.text = text.strip()
+    return windows
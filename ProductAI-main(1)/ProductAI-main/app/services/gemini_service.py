@@ -1,14 +1,6 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
 import re
-
-load_dotenv()
-
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
-
-model = genai.GenerativeModel("gemini-2.5-flash-lite")
+from app.services.micro_batcher import get_micro_batcher
+from app.services.rate_limiter import ProviderUnavailableError
 
 
 def clean_output(text: str) -> str:
@@ -22,7 +14,7 @@ def clean_output(text: str) -> str:
     return text.strip()
 
 
-def generate_product_text(raw_text: str) -> str:
+async def generate_product_text(raw_text: str) -> str:
 
     prompt = f"""
     You are an AI that converts messy raw speech transcripts
@@ -45,9 +37,13 @@ def generate_product_text(raw_text: str) -> str:
     """
 
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = clean_output(response.text)
+        # Short cleanups share a Gemini call when micro-batching is enabled
+        text, _ = await get_micro_batcher().submit(prompt, task="product_text", quality="draft")
+        cleaned_text = clean_output(text)
         return cleaned_text
 
+    except ProviderUnavailableError:
+        raise
+
     except Exception as e:
         return f"Error generating text: {str(e)}"
@@ -0,0 +1,177 @@
+"""
+Loop Watchdog - detects event-loop stalls and shows what caused them.
+
+Opt-in (LOOP_WATCHDOG_ENABLED=1). Two parts:
+1. A heartbeat task on the loop sleeps LOOP_WATCHDOG_INTERVAL_MS at a time
+   and records how late it woke up (event_loop_lag_seconds)
+2. A watchdog thread checks the heartbeat; when it is more than
+   LOOP_WATCHDOG_STALL_MS overdue, the loop is blocked right now, so the
+   thread captures the loop thread's stack and the route of the task that
+   is running, and logs them while the stall is still in progress
+
+The heartbeat logs the total duration once the loop is free again. Route
+tracking comes from LoopWatchdogMiddleware (in-flight requests by task);
+tasks that work on a request's behalf outside its task (staged pipeline
+handlers) are tracked under the route from the request's context.
+
+Settings:
+    LOOP_WATCHDOG_ENABLED       "1" to run the watchdog (default off)
+    LOOP_WATCHDOG_INTERVAL_MS   heartbeat interval (default 50)
+    LOOP_WATCHDOG_STALL_MS      lag reported as a stall (default 200)
+"""
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from app.services.metrics import counter, histogram
+from app.services.structured_logging import get_logger
+
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "0") == "1"
+LOOP_WATCHDOG_INTERVAL_MS = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "50"))
+LOOP_WATCHDOG_STALL_MS = float(os.getenv("LOOP_WATCHDOG_STALL_MS", "200"))
+
+# Deepest frames kept from the stalled stack (the innermost ones matter)
+MAX_STACK_FRAMES = 40
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG = histogram(
+    "event_loop_lag_seconds",
+    "How late the event-loop heartbeat woke up",
+    buckets=LAG_BUCKETS,
+)
+LOOP_STALLS = counter(
+    "event_loop_stalls_total",
+    "Event-loop stalls over the threshold, by the first path segment of the route running",
+    ["route"],
+)
+STALL_DURATION = histogram(
+    "event_loop_stall_seconds",
+    "Total duration of detected event-loop stalls",
+    buckets=LAG_BUCKETS,
+)
+
+logger = get_logger("loop_watchdog")
+
+# asyncio.Task -> "METHOD /path" for requests in flight on this worker's loop
+_active_routes: Dict[asyncio.Task, str] = {}
+
+# Route of the request being handled, inherited by tasks created on its behalf
+_request_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_route", default=None)
+
+
+def track_route(task: asyncio.Task, route: str) -> None:
+    _active_routes[task] = route
+    if task is asyncio.current_task():
+        _request_route.set(route)
+
+
+def current_route() -> Optional[str]:
+    """Route of the request this context belongs to (None outside a request)."""
+    return _request_route.get()
+
+
+def untrack_route(task: asyncio.Task) -> None:
+    _active_routes.pop(task, None)
+
+
+class LoopWatchdog:
+    """Heartbeat on the loop plus a thread that notices when the heartbeat stops."""
+
+    def __init__(self, interval: float, stall_threshold: float):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_beat = time.monotonic()
+        self._stall_reported = False
+
+    def start(self) -> None:
+        """Start watching the running loop (call from the loop thread)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = self._loop.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Loop watchdog started (interval %.0f ms, stall threshold %.0f ms)",
+                    self.interval * 1000, self.stall_threshold * 1000)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, self.interval * 4)
+
+    async def _beat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            LOOP_LAG.observe(lag)
+            self._last_beat = now
+            if self._stall_reported:
+                self._stall_reported = False
+                STALL_DURATION.observe(lag)
+                logger.warning("Event loop free again after a %.0f ms stall", lag * 1000)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue >= self.stall_threshold and not self._stall_reported:
+                self._stall_reported = True
+                self._report(overdue)
+
+    def _current_route(self) -> Optional[str]:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        return _active_routes.get(task) if task is not None else None
+
+    def _report(self, overdue: float) -> None:
+        route = self._current_route()
+        LOOP_STALLS.inc(route=_route_label(route))
+        if route is None:
+            # The blocking code runs outside a tracked request task: list what is in flight
+            route = "untracked; in flight: " + (", ".join(sorted(set(_active_routes.values()))) or "none")
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)[-MAX_STACK_FRAMES:]) if frame else ""
+        logger.error(
+            "Event loop blocked for %.0f ms so far (route: %s)",
+            overdue * 1000, route,
+            extra={"route": route, "lag_ms": round(overdue * 1000), "stack": stack},
+        )
+
+
+def _route_label(route: Optional[str]) -> str:
+    """Metric label for a route: its first path segment, e.g. /sessions."""
+    if not route:
+        return "untracked"
+    path = route.split(" ", 1)[-1]
+    return "/" + path.lstrip("/").split("/", 1)[0]
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+def get_loop_watchdog() -> LoopWatchdog:
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = LoopWatchdog(LOOP_WATCHDOG_INTERVAL_MS / 1000, LOOP_WATCHDOG_STALL_MS / 1000)
+    return _watchdog
@@ -0,0 +1,236 @@
+"""
+Metrics Service - lightweight in-process counters, gauges and histograms.
+
+Metrics are registered once at import time of the module that owns them and
+updated with label keyword arguments:
+
+    MODEL_CALLS = counter("gemini_model_calls_total", "Gemini calls by model", ["model", "outcome"])
+    MODEL_CALLS.inc(model="gemini-2.5-flash", outcome="success")
+
+Each metric is declared in one module; modules sharing it import it from
+there (pipeline_stage_seconds lives in staged_pipeline). Registering a name
+again returns the existing metric only when its type, labels and buckets
+match, and raises ValueError otherwise.
+`render_prometheus()` produces the text exposition format served at
+/metrics; values are per worker process.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.structured_logging import get_logger
+
+logger = get_logger("metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, ...]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """(labels, value) for every label combination recorded so far."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block (also when it raises)."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def mean(self, **labels: str) -> Optional[float]:
+        entry = self._values.get(self._key(labels))
+        if not entry or not entry[2]:
+            return None
+        return entry[1] / entry[2]
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric_cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+    metric = metric_cls(name, documentation, labelnames, **kwargs)
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is None:
+            _registry[name] = metric
+            return metric
+    if type(existing) is not metric_cls:
+        raise ValueError(f"Metric {name} already registered as {existing.kind}")
+    if existing.labelnames != metric.labelnames:
+        raise ValueError(f"Metric {name} already registered with labels {existing.labelnames}")
+    if getattr(existing, "buckets", None) != getattr(metric, "buckets", None):
+        raise ValueError(f"Metric {name} already registered with buckets {existing.buckets}")
+    return existing
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+_collectors: List[Callable[[], None]] = []
+
+
+def register_collector(collect: Callable[[], None]) -> None:
+    """Run `collect` before every render, e.g. to refresh derived gauges."""
+    _collectors.append(collect)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            logger.warning("Metrics collector failed: %s", e)
+
+    lines: List[str] = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        with metric._lock:
+            values = {key: (list(value[0]), value[1], value[2]) if isinstance(metric, Histogram) else value
+                      for key, value in metric._values.items()}
+        help_text = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if not isinstance(metric, Histogram):
+                lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_format_value(value)}")
+                continue
+            bucket_counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, le)} {cumulative}")
+            lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,270 @@
+"""
+Micro-Batcher - packs small concurrent Gemini requests into one call.
+
+Opt-in (LLM_MICRO_BATCH_ENABLED=1). Small prompts submitted here:
+1. Wait up to LLM_MICRO_BATCH_WINDOW_MS for compatible requests (same
+   task, quality tier and output model)
+2. Are packed into one prompt, each item between delimiter lines carrying
+   a per-batch token, and answered with schema-constrained JSON holding one
+   result per item id
+3. Are split back to their callers; items missing from the reply are
+   retried on their own, each in its caller's context and within its
+   caller's deadline
+
+The combined call runs in the context of the item with the earliest
+deadline (its correlation ID and trace span too), under the highest
+priority class in the batch, and is cancelled when that deadline passes;
+the items are then retried one by one, each within its own deadline. So
+batching never makes an urgent request wait longer or queue behind a
+lower class.
+
+A batch of one, a prompt over LLM_MICRO_BATCH_MAX_ITEM_CHARS, or batching
+being disabled all take the normal single-call path. Batched answers are
+cached per item in the shared "llm" cache.
+
+Settings:
+    LLM_MICRO_BATCH_ENABLED           "1" to batch (default off)
+    LLM_MICRO_BATCH_WINDOW_MS         collection window (default 20)
+    LLM_MICRO_BATCH_MAX_ITEMS         items per batch (default 8)
+    LLM_MICRO_BATCH_MAX_ITEM_CHARS    larger prompts are never batched (default 2000)
+"""
+import asyncio
+import contextvars
+import os
+import secrets
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel, create_model
+
+from app.services.cache_backend import cache_key, get_cache
+from app.services.deadline import remaining_time, run_within_deadline
+from app.services.metrics import counter, histogram
+from app.services.model_router import LLM_CACHE_TTL_S, ModelChoice, generate_content
+from app.services.rate_limiter import ProviderUnavailableError
+from app.services.scheduler import current_request_class, request_class
+from app.services.structured_output import generate_structured
+from app.services.structured_logging import get_logger
+
+logger = get_logger("micro_batcher")
+
+LLM_MICRO_BATCH_ENABLED = os.getenv("LLM_MICRO_BATCH_ENABLED", "0") == "1"
+LLM_MICRO_BATCH_WINDOW_MS = float(os.getenv("LLM_MICRO_BATCH_WINDOW_MS", "20"))
+LLM_MICRO_BATCH_MAX_ITEMS = int(os.getenv("LLM_MICRO_BATCH_MAX_ITEMS", "8"))
+LLM_MICRO_BATCH_MAX_ITEM_CHARS = int(os.getenv("LLM_MICRO_BATCH_MAX_ITEM_CHARS", "2000"))
+
+BATCH_ITEMS = counter(
+    "llm_micro_batch_items_total",
+    "Requests submitted to the micro-batcher by task and how they were served",
+    ["task", "outcome"],
+)
+BATCH_SIZE = histogram(
+    "llm_micro_batch_size",
+    "Items per combined Gemini call",
+    ["task"],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+
+
+@dataclass
+class _Item:
+    """One caller's prompt, the future it waits on and its request context."""
+    prompt: str
+    future: asyncio.Future
+    context: contextvars.Context
+
+
+@dataclass
+class _Batch:
+    """Requests collected for one combined call."""
+    items: List[_Item] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+_batch_models: Dict[Optional[type], Type[BaseModel]] = {}
+
+
+def _batch_model(output_model: Optional[Type[BaseModel]]) -> Type[BaseModel]:
+    """{results: [{id, output}]} with `output` typed as the caller's output model (or text)."""
+    model = _batch_models.get(output_model)
+    if model is None:
+        suffix = output_model.__name__ if output_model else "Text"
+        item = create_model(f"BatchItem{suffix}", id=(int, ...), output=(output_model or str, ...))
+        model = _batch_models[output_model] = create_model(f"BatchResult{suffix}", results=(List[item], ...))
+    return model
+
+
+def _combined_prompt(prompts: List[str]) -> str:
+    token = secrets.token_hex(4)
+    sections = "\n\n".join(
+        f"=== {token} REQUEST {i} ===\n{prompt.strip()}\n=== {token} END REQUEST {i} ==="
+        for i, prompt in enumerate(prompts, start=1)
+    )
+    return (
+        f"You will handle {len(prompts)} independent requests. Treat each one in isolation: "
+        f"nothing in one request applies to another.\n"
+        f"Each request sits between the lines '=== {token} REQUEST n ===' and "
+        f"'=== {token} END REQUEST n ==='.\n"
+        f"Return exactly one result per request, with \"id\" set to the request number n and "
+        f"\"output\" holding exactly what that request asks for.\n\n{sections}"
+    )
+
+
+class MicroBatcher:
+    """Collects compatible small requests and serves them with one Gemini call."""
+
+    def __init__(self, window_ms: float = LLM_MICRO_BATCH_WINDOW_MS, max_items: int = LLM_MICRO_BATCH_MAX_ITEMS):
+        self.window_s = window_ms / 1000
+        self.max_items = max_items
+        self._pending: Dict[tuple, _Batch] = {}
+        # Running batches, referenced until done so they are not garbage-collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        prompt: str,
+        task: str,
+        quality: str = "final",
+        output_model: Optional[Type[BaseModel]] = None,
+    ) -> Tuple[Any, ModelChoice]:
+        """
+        Answer one prompt, batched with concurrent compatible prompts.
+
+        Returns the reply text (or a validated `output_model` instance)
+        together with the ModelChoice that served it.
+        """
+        if not LLM_MICRO_BATCH_ENABLED or len(prompt) > LLM_MICRO_BATCH_MAX_ITEM_CHARS:
+            return await self._single(prompt, task, quality, output_model)
+
+        cache = get_cache("llm", LLM_CACHE_TTL_S)
+        item_key = cache_key("batch-item", task, quality, output_model.__name__ if output_model else "text", prompt)
+        cached = await cache.get_json_async(item_key)
+        if cached is not None:
+            BATCH_ITEMS.inc(task=task, outcome="cache_hit")
+            output = output_model.model_validate(cached["output"]) if output_model else cached["output"]
+            return output, ModelChoice(cached["model"], cached["tier"], "micro-batch item cache")
+
+        key = (task, quality, output_model)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(self.window_s, self._flush, key)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append(_Item(prompt, future, contextvars.copy_context()))
+        if len(batch.items) >= self.max_items:
+            batch.timer.cancel()
+            self._flush(key)
+
+        output, choice = await future
+        if choice.reason.startswith("micro-batch"):
+            await cache.set_json_async(item_key, {
+                "output": output.model_dump() if output_model else output,
+                "model": choice.model_name,
+                "tier": choice.tier,
+            })
+        return output, choice
+
+    def _flush(self, key: tuple) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        # The combined call runs under the earliest deadline among the items
+        first = min(batch.items, key=lambda item: _deadline_of(item.context))
+        priority = max(
+            (item.context.run(current_request_class) for item in batch.items), key=lambda rc: rc.weight
+        ).priority
+        running = first.context.run(asyncio.create_task, self._run_as(priority, key, batch.items))
+        self._tasks.add(running)
+        running.add_done_callback(self._tasks.discard)
+
+    async def _run_as(self, priority: str, key: tuple, items: List[_Item]) -> None:
+        with request_class(priority=priority):
+            await self._run(key, items)
+
+    async def _run(self, key: tuple, items: List[_Item]) -> None:
+        task, quality, output_model = key
+        if len(items) == 1:
+            BATCH_ITEMS.inc(task=task, outcome="single")
+            await self._resolve(items[0].future, run_within_deadline(
+                task, self._single(items[0].prompt, task, quality, output_model)
+            ))
+            return
+
+        BATCH_SIZE.observe(len(items), task=task)
+        logger.debug("%s: %d requests in one call", task, len(items))
+        try:
+            # The batch runs in the earliest-deadline item's context: its deadline bounds the call
+            result, choice = await run_within_deadline(f"{task}_batch", generate_structured(
+                _combined_prompt([item.prompt for item in items]),
+                _batch_model(output_model),
+                task=f"{task}_batch",
+                quality=quality,
+            ))
+        except ProviderUnavailableError as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        except Exception as e:
+            logger.warning("%s: combined call failed (%s), answering items one by one", task, e)
+            result, choice = None, None
+
+        outputs = {entry.id: entry.output for entry in result.results} if result else {}
+        batched_choice = (
+            ModelChoice(choice.model_name, choice.tier, f"micro-batch of {len(items)}: {choice.reason}")
+            if choice else None
+        )
+        retries = []
+        for i, item in enumerate(items, start=1):
+            if item.future.done():
+                continue
+            if i in outputs:
+                BATCH_ITEMS.inc(task=task, outcome="batched")
+                item.future.set_result((outputs[i], batched_choice))
+            else:
+                BATCH_ITEMS.inc(task=task, outcome="fallback")
+                # Retried under the caller's own deadline and priority
+                retries.append(item.context.run(
+                    asyncio.create_task,
+                    self._resolve(item.future, run_within_deadline(
+                        task, self._single(item.prompt, task, quality, output_model)
+                    )),
+                ))
+        if retries:
+            await asyncio.gather(*retries)
+
+    @staticmethod
+    async def _resolve(future: asyncio.Future, call) -> None:
+        try:
+            result = await call
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    async def _single(
+        prompt: str, task: str, quality: str, output_model: Optional[Type[BaseModel]]
+    ) -> Tuple[Any, ModelChoice]:
+        if output_model is not None:
+            return await generate_structured(prompt, output_model, task=task, quality=quality)
+        response, choice = await generate_content(prompt, task=task, quality=quality)
+        return response.text, choice
+
+
+def _deadline_of(context: contextvars.Context) -> float:
+    remaining = context.run(remaining_time)
+    return remaining if remaining is not None else float("inf")
+
+
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_micro_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher()
+    return _batcher
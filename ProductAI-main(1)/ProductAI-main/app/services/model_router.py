@@ -0,0 +1,188 @@
+"""
+Model Router - size-aware tiering between the fast and the quality Gemini model.
+
+Every Gemini call picks its model here instead of hard-coding one:
+1. Draft-quality work goes to the fast tier
+2. Short prompts go to the fast tier (the heavier model adds little there)
+3. If the quality model's observed latency would blow the request's
+   latency budget, fall back to the fast tier
+4. Otherwise use the quality tier
+
+Latency and outcome of every routed call are recorded in metrics, and the
+recorded latency feeds back into rule 3. Responses are stored in the shared
+"llm" cache keyed by model, prompt and generation settings, so identical
+prompts are answered once per host rather than once per worker.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.services.cache_backend import cache_key, get_cache
+from app.services.metrics import counter, histogram
+from app.services.providers import get_gemini_model_async
+from app.services.rate_limiter import estimate_tokens
+from app.services.resilience import call_provider
+from app.services.structured_logging import get_logger
+
+logger = get_logger("model_router")
+
+FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+QUALITY_MODEL = os.getenv("GEMINI_QUALITY_MODEL", "gemini-2.5-flash")
+
+# Prompts below this size go to the fast tier even for final-quality work
+SMALL_PROMPT_CHARS = int(os.getenv("MODEL_ROUTER_SMALL_PROMPT_CHARS", "4000"))
+
+# Starting latency estimates (seconds) until real calls have been observed
+LATENCY_PRIORS = {FAST_MODEL: 3.0, QUALITY_MODEL: 8.0}
+LATENCY_EWMA_ALPHA = 0.2
+
+QUALITY_TIERS = ("draft", "final")
+
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(24 * 3600)))
+
+MODEL_CALLS = counter(
+    "gemini_routed_calls_total",
+    "Gemini calls by routed model, tier, task and outcome",
+    ["model", "tier", "task", "outcome"],
+)
+PROMPT_CHARS = counter(
+    "gemini_prompt_chars_total",
+    "Prompt characters sent to Gemini (cache hits excluded)",
+    ["model", "task"],
+)
+MODEL_TOKENS = counter(
+    "gemini_tokens_total",
+    "Tokens reported by Gemini usage metadata",
+    ["model", "kind"],
+)
+MODEL_LATENCY = histogram(
+    "gemini_routed_call_latency_seconds",
+    "Latency of routed Gemini calls",
+    ["model", "tier", "task"],
+)
+
+
+class CachedResponse:
+    """Stand-in for a Gemini response served from the LLM cache (callers only read .text)."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+@dataclass
+class ModelChoice:
+    """The model picked for one call and why."""
+    model_name: str
+    tier: str
+    reason: str
+
+
+_latency_ewma: Dict[str, float] = dict(LATENCY_PRIORS)
+
+
+def expected_latency(model_name: str) -> float:
+    return _latency_ewma.get(model_name, LATENCY_PRIORS[QUALITY_MODEL])
+
+
+def _record_latency(model_name: str, latency: float) -> None:
+    previous = _latency_ewma.get(model_name, latency)
+    _latency_ewma[model_name] = (1 - LATENCY_EWMA_ALPHA) * previous + LATENCY_EWMA_ALPHA * latency
+
+
+def choose_model(
+    prompt_chars: int,
+    quality: str = "final",
+    latency_budget: Optional[float] = None,
+) -> ModelChoice:
+    """
+    Pick a model for a prompt.
+
+    Args:
+        prompt_chars: Size of the prompt in characters
+        quality: "draft" or "final"
+        latency_budget: Seconds the caller can wait for this call, if known
+    """
+    if quality not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier '{quality}', expected one of {QUALITY_TIERS}")
+
+    if quality == "draft":
+        return ModelChoice(FAST_MODEL, "fast", "draft quality")
+
+    if prompt_chars < SMALL_PROMPT_CHARS:
+        return ModelChoice(FAST_MODEL, "fast", f"small prompt ({prompt_chars} chars)")
+
+    if latency_budget is not None and expected_latency(QUALITY_MODEL) > latency_budget:
+        return ModelChoice(
+            FAST_MODEL,
+            "fast",
+            f"latency budget {latency_budget:.1f}s below expected {expected_latency(QUALITY_MODEL):.1f}s",
+        )
+
+    return ModelChoice(QUALITY_MODEL, "quality", "final quality, large prompt")
+
+
+async def generate_content(
+    prompt: str,
+    task: str,
+    quality: str = "final",
+    latency_budget: Optional[float] = None,
+    use_cache: bool = True,
+    validate: Optional[Callable[[str], Any]] = None,
+    **generate_kwargs: Any,
+) -> Tuple[Any, ModelChoice]:
+    """
+    Route a prompt to a Gemini model and call it through the provider layer.
+
+    `validate`, if given, is called with the response text before it is
+    cached; if it raises, the response is not cached and the error propagates.
+
+    Returns the Gemini response (or a CachedResponse) together with the
+    ModelChoice that served it.
+    """
+    choice = choose_model(len(prompt), quality=quality, latency_budget=latency_budget)
+
+    cache = get_cache("llm", LLM_CACHE_TTL_S)
+    key = cache_key(choice.model_name, prompt, generate_kwargs) if use_cache else None
+    if key:
+        cached = await cache.get_json_async(key)
+        if cached is not None:
+            logger.debug("%s: served from LLM cache (%s)", task, choice.model_name)
+            MODEL_CALLS.inc(model=choice.model_name, tier=choice.tier, task=task, outcome="cache_hit")
+            return CachedResponse(cached["text"]), choice
+
+    model = await get_gemini_model_async(choice.model_name)
+    logger.info("%s: %s (%s)", task, choice.model_name, choice.reason)
+    PROMPT_CHARS.inc(len(prompt), model=choice.model_name, task=task)
+
+    started = time.monotonic()
+    try:
+        response = await call_provider(
+            "gemini",
+            choice.model_name,
+            lambda: model.generate_content_async(prompt, **generate_kwargs),
+            units=estimate_tokens(prompt),
+        )
+    except Exception:
+        MODEL_CALLS.inc(model=choice.model_name, tier=choice.tier, task=task, outcome="error")
+        raise
+
+    latency = time.monotonic() - started
+    _record_latency(choice.model_name, latency)
+    MODEL_LATENCY.observe(latency, model=choice.model_name, tier=choice.tier, task=task)
+    MODEL_CALLS.inc(model=choice.model_name, tier=choice.tier, task=task, outcome="success")
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+            MODEL_TOKENS.inc(getattr(usage, field, 0) or 0, model=choice.model_name, kind=kind)
+
+    if key or validate:
+        try:
+            text = response.text
+        except ValueError:
+            text = None  # blocked or empty candidates are never cached
+        if validate:
+            validate(text or "")
+        if key and text:
+            await cache.set_json_async(key, {"text": text})
+    return response, choice
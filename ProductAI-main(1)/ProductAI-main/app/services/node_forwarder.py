@@ -1,6 +1,10 @@
 import requests
 import os
 
+from app.services.structured_logging import get_logger
+
+logger = get_logger("node_forwarder")
+
 NODE_SERVER_URL = os.getenv("NODE_SERVER_URL") or "http://localhost:3000/api/test-audio"
 
 
@@ -9,7 +13,7 @@ def send_audio_to_node(audio_bytes: bytes, text: str):
     Sends audio + cleaned text to Node.
     """
     try:
-        print("[Python] Sending audio to Node.js server...")
+        logger.info("Sending audio to Node.js server")
         files = {
             "audio": ("output.mp3", audio_bytes, "audio/mpeg")
         }
@@ -0,0 +1,219 @@
+"""
+Preprocess Pool - CPU-heavy preprocessing of large stored sessions in worker processes.
+
+Event validation, timing analysis, context building and instruction
+generation are pure Python and hold the GIL: a 100k-event session blocks
+the event loop for seconds, stalling every concurrent request in the
+worker. With PRODUCTAI_PREPROCESS_WORKERS > 0, stored sessions (POST
+/sessions) with more than PRODUCTAI_PREPROCESS_MIN_ITEMS events or words
+are preprocessed in a process pool instead:
+1. "script_context": words and events are decoded and validated, and the
+   timing analysis and DOM contexts for the script prompt are built
+   (build_script_context), for /audio-full-process with a sessionRef
+2. "recording": instructions, extracted text and steps for
+   /process-recording/{session_ref}
+
+The only input sent to a worker is the 32-character sessionRef - workers
+read the session file themselves, and write script contexts to the shared
+artifact cache themselves. Results come back as msgpack (JSON when
+msgpack is not installed), as plain dicts and strings rather than Pydantic
+models, and are decoded in a thread rather than on the event loop.
+Sessions sent inline stay in-process: re-serializing an already validated
+session for a worker costs more than preprocessing it.
+
+Workers are started with "spawn" (forking a process that runs threads is
+not safe) and created on first use. A crashed pool is replaced. When a job
+fails for any reason (crashed pool, an error in the worker, a result that
+cannot be transferred) the request falls back to in-process preprocessing,
+where errors are handled as for sessions below the threshold.
+
+Settings:
+    PRODUCTAI_PREPROCESS_WORKERS     processes in the pool (default 0: off)
+    PRODUCTAI_PREPROCESS_MIN_ITEMS   events or words above which a stored session is offloaded (default 20000)
+"""
+import asyncio
+import importlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.services.artifact_cache import get_artifact_cache
+from app.services.metrics import counter, gauge, histogram
+from app.services.session_store import StoredSession, get_session_store
+from app.services.structured_logging import get_logger
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON between processes
+    msgpack = None
+
+PREPROCESS_WORKERS = int(os.getenv("PRODUCTAI_PREPROCESS_WORKERS", "0"))
+PREPROCESS_MIN_ITEMS = int(os.getenv("PRODUCTAI_PREPROCESS_MIN_ITEMS", "20000"))
+
+PREPROCESS_JOBS = counter(
+    "preprocess_jobs_total",
+    "Stored-session preprocessing jobs by job and outcome (pool, or fallback to in-process)",
+    ["job", "outcome"],
+)
+PREPROCESS_INFLIGHT = gauge(
+    "preprocess_pool_inflight",
+    "Jobs submitted to the preprocess pool and not yet finished",
+)
+PREPROCESS_SECONDS = histogram(
+    "preprocess_pool_seconds",
+    "Preprocess pool job duration, including queueing and transfer",
+    ["job"],
+)
+
+logger = get_logger("preprocess_pool")
+
+
+def _pack(value: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _unpack(data: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+def _init_worker() -> None:
+    from app.services.structured_logging import configure_logging
+
+    configure_logging()
+    # Import the preprocessing code once per worker, not on the first job
+    importlib.import_module("app.services.dom_event_service")
+    importlib.import_module("app.services.script_generation_service")
+
+
+def _script_context_job(ref: str) -> bytes:
+    from app.services.script_generation_service import SCRIPT_CONTEXT_VERSION, build_script_context
+
+    stored = get_session_store().load(ref)
+    context = build_script_context(stored.words, stored.session)
+    get_artifact_cache().store_shared("script_context", SCRIPT_CONTEXT_VERSION, stored.content_hash, context)
+    return _pack(context)
+
+
+def _recording_job(ref: str) -> bytes:
+    from app.services.dom_event_service import (
+        extract_text_from_events,
+        group_events_by_step,
+        process_dom_events,
+    )
+
+    session = get_session_store().load(ref).session
+    response = process_dom_events(session)
+    response.metadata["extractedText"] = extract_text_from_events(session.events)
+    response.metadata["groupedSteps"] = group_events_by_step(session.events)
+    return _pack(response.model_dump(mode="json"))
+
+
+# ----------------------------------------------------------------------
+# Event-loop side
+# ----------------------------------------------------------------------
+class _JobFailed(Exception):
+    """The pool could not produce the artifact; the caller computes it in-process."""
+
+
+class PreprocessPool:
+    """Process pool for stored-session preprocessing, created on first use."""
+
+    def __init__(self, workers: int, min_items: int = PREPROCESS_MIN_ITEMS):
+        self.workers = workers
+        self.min_items = min_items
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def should_offload(self, stored: StoredSession) -> bool:
+        return max(stored.event_count, stored.word_count) > self.min_items
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                logger.info("Preprocess pool started with %d workers", self.workers)
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, job: str, fn: Callable[[str], bytes], ref: str) -> Optional[Any]:
+        """Run `fn(ref)` in the pool; None when the job failed and the caller should work in-process."""
+        executor = self._get_executor()
+        PREPROCESS_INFLIGHT.inc()
+        try:
+            with PREPROCESS_SECONDS.time(job=job):
+                packed = await asyncio.get_running_loop().run_in_executor(executor, fn, ref)
+                result = await asyncio.to_thread(_unpack, packed)
+        except BrokenProcessPool as e:
+            PREPROCESS_JOBS.inc(job=job, outcome="fallback")
+            logger.error("Preprocess pool broke during %s for %s (%s), replacing it", job, ref, e)
+            self._discard(executor)
+            return None
+        except Exception as e:
+            PREPROCESS_JOBS.inc(job=job, outcome="fallback")
+            logger.warning("Preprocess job %s failed for %s (%s: %s), running it in-process",
+                           job, ref, type(e).__name__, e)
+            return None
+        finally:
+            PREPROCESS_INFLIGHT.dec()
+        PREPROCESS_JOBS.inc(job=job, outcome="pool")
+        return result
+
+    async def script_context(self, stored: StoredSession) -> Optional[Dict[str, Any]]:
+        """build_script_context for a stored session plus its "content_hash", via the artifact cache."""
+        from app.services.script_generation_service import SCRIPT_CONTEXT_VERSION
+
+        async def compute():
+            context = await self._run("script_context", _script_context_job, stored.ref)
+            if context is None:
+                raise _JobFailed()
+            return context
+
+        try:
+            context = await get_artifact_cache().get_or_compute_async(
+                "script_context", SCRIPT_CONTEXT_VERSION, stored.content_hash, compute,
+                stored_by_compute=True,
+            )
+        except _JobFailed:
+            return None
+        return {**context, "content_hash": stored.content_hash}
+
+    async def recording(self, stored: StoredSession) -> Optional[Dict[str, Any]]:
+        """ProcessRecordingResponse fields (as JSON-ready dicts) for a stored session."""
+        return await self._run("recording", _recording_job, stored.ref)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[PreprocessPool] = None
+
+
+def get_preprocess_pool() -> Optional[PreprocessPool]:
+    """The shared pool, or None when PRODUCTAI_PREPROCESS_WORKERS is 0."""
+    global _pool
+    if _pool is None and PREPROCESS_WORKERS > 0:
+        _pool = PreprocessPool(PREPROCESS_WORKERS)
+    return _pool
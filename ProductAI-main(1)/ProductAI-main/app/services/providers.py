@@ -0,0 +1,102 @@
+"""
+Provider Registry - lazy, shared construction of external provider clients.
+
+`google.generativeai` is a heavy import (~1 s), so nothing touches it
+until the first Gemini call (or an explicit warm-up). Async callers use
+`get_gemini_model_async`, which does that first import in a worker thread
+instead of on the event loop. The SDK is configured once and
+GenerativeModel objects are shared per model name across all services.
+
+Settings:
+    GEMINI_API_ENDPOINT   alternative Gemini endpoint, e.g. http://127.0.0.1:8091
+                          for the load-test stand-in (benchmarks/fake_providers.py);
+                          served over the REST transport
+"""
+import asyncio
+import importlib
+import os
+import threading
+from typing import Any, Dict
+
+from app.services.structured_logging import get_logger
+
+logger = get_logger("providers")
+
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+_lock = threading.Lock()
+_genai = None
+_models: Dict[str, Any] = {}
+
+
+def get_genai():
+    """Import and configure google.generativeai on first use."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(
+                        api_key=os.getenv("GEMINI_API_KEY"),
+                        transport="rest",
+                        client_options={"api_endpoint": GEMINI_API_ENDPOINT},
+                    )
+                else:
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+                logger.info("Gemini SDK initialized")
+    return _genai
+
+
+class _RestModel:
+    """
+    GenerativeModel on the REST transport. The SDK's async client only speaks
+    gRPC, so async calls run the sync REST client in a worker thread.
+    """
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    async def generate_content_async(self, *args, **kwargs):
+        return await asyncio.to_thread(self._model.generate_content, *args, **kwargs)
+
+
+def get_gemini_model(model_name: str):
+    """Shared GenerativeModel instance per model name."""
+    model = _models.get(model_name)
+    if model is None:
+        genai = get_genai()
+        with _lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                if GEMINI_API_ENDPOINT:
+                    model = _RestModel(model)
+                _models[model_name] = model
+    return model
+
+
+async def get_gemini_model_async(model_name: str):
+    """get_gemini_model without blocking the event loop on the first (importing) call."""
+    model = _models.get(model_name)
+    if model is None:
+        model = await asyncio.to_thread(get_gemini_model, model_name)
+    return model
+
+
+def warm_up(model_names=()) -> None:
+    """
+    Pay provider start-up costs ahead of the first request: import and
+    configure the Gemini SDK and build the models we expect to use.
+    Blocking; call it from a worker thread when running inside the event loop.
+    """
+    get_genai()
+    for model_name in model_names:
+        get_gemini_model(model_name)
+    # requests is imported lazily by the Deepgram client path too
+    importlib.import_module("requests")
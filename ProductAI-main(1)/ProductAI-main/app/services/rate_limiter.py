@@ -0,0 +1,399 @@
+"""
+Rate Limiter - per-provider quota and concurrency control.
+
+Every call to an external provider (Gemini, Deepgram) goes through
+`call_with_rate_limit`, which combines:
+1. A token bucket for requests per minute
+2. A token bucket for units per minute (prompt tokens for Gemini, characters for Deepgram)
+3. An AIMD concurrency limit that grows while calls succeed quickly and
+   shrinks when the provider answers 429/503 or slows down
+4. Jittered exponential backoff that honours Retry-After
+
+Calls waiting for a concurrency slot are ordered by the scheduler
+(priority class, then per-tenant fairness) rather than first come, first
+served. The slot is taken before the token buckets, so the buckets' waits
+follow the same order.
+
+Limits are read from the environment (e.g. GEMINI_RPM,
+DEEPGRAM_UNITS_PER_MINUTE).
+A value of 0 disables that bucket.
+"""
+import asyncio
+import email.utils
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.services.metrics import counter, gauge
+from app.services.scheduler import QUEUE_WAIT, FairQueue, current_request_class
+from app.services.structured_logging import get_logger
+
+logger = get_logger("rate_limiter")
+
+T = TypeVar("T")
+
+# HTTP statuses that mean "slow down" rather than "this request is broken"
+OVERLOAD_STATUS_CODES = {429, 503}
+
+PROVIDER_CALLS = counter(
+    "provider_calls_total",
+    "Provider call attempts (retries and hedges included) by outcome",
+    ["provider", "outcome"],
+)
+PROVIDER_RETRIES = counter(
+    "provider_retries_total",
+    "Provider calls retried after an overload response",
+    ["provider"],
+)
+PROVIDER_UNITS = counter(
+    "provider_units_total",
+    "Quota units sent to providers (estimated prompt tokens for Gemini, characters for Deepgram)",
+    ["provider"],
+)
+PROVIDER_IN_FLIGHT = gauge(
+    "provider_in_flight",
+    "Provider calls currently running",
+    ["provider"],
+)
+
+
+class ProviderUnavailableError(Exception):
+    """Base error for a provider that cannot take calls right now; carries a retry hint."""
+
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class ProviderRateLimitError(ProviderUnavailableError):
+    """Raised when a provider keeps rejecting calls for quota or overload reasons."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) for quota accounting."""
+    return len(text) // 4 + 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Token bucket using reservations: callers take tokens up front (the balance
+    may go negative) and sleep until their share has refilled. This keeps
+    waiters in FIFO order without a lock.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if not self.enabled or amount <= 0:
+            return
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so that no new call starts for `seconds`."""
+        if not self.enabled or seconds <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit: additive increase on fast successes,
+    multiplicative decrease on overload signals (429/503 or latency above target).
+    Waiters are served in FairQueue order.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff_ratio: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        name: str = "",
+    ):
+        self.name = name
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = FairQueue(name)
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a slot (cancelled waiters leave the queue at once)."""
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self) -> None:
+        request = current_request_class()
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            QUEUE_WAIT.observe(0.0, provider=self.name, priority=request.priority)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        queued = time.monotonic()
+        self._waiters.push(waiter, request)
+        self._wake_waiters()  # a slot may be free while earlier waiters queue: serve in fair order
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed to us just before cancellation - give it back
+                self.release()
+            else:
+                # Dead waiters leave the queue so its depth only counts live calls
+                self._waiters.remove(waiter)
+            raise
+        QUEUE_WAIT.observe(time.monotonic() - queued, provider=self.name, priority=request.priority)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter, _ = self._waiters.pop()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if self.latency_target and latency > self.latency_target:
+            self.on_overload()
+            return
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake_waiters()
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+
+@dataclass
+class ProviderLimiter:
+    """All quota state for a single provider."""
+    name: str
+    requests: TokenBucket
+    units: TokenBucket
+    concurrency: AIMDLimiter
+    max_retries: int
+    base_delay: float
+    max_delay: float
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base_delay))
+        return delay
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _build_limiter(name: str) -> ProviderLimiter:
+    defaults = PROVIDER_DEFAULTS[name]
+
+    def setting(key: str) -> float:
+        return _env_float(f"{name.upper()}_{key}", defaults[key])
+
+    return ProviderLimiter(
+        name=name,
+        requests=TokenBucket(setting("RPM")),
+        units=TokenBucket(setting("UNITS_PER_MINUTE")),
+        concurrency=AIMDLimiter(
+            initial=int(setting("INITIAL_CONCURRENCY")),
+            min_limit=1,
+            max_limit=int(setting("MAX_CONCURRENCY")),
+            latency_target=setting("LATENCY_TARGET_S"),
+            name=name,
+        ),
+        max_retries=int(setting("MAX_RETRIES")),
+        base_delay=setting("BACKOFF_BASE_S"),
+        max_delay=setting("BACKOFF_MAX_S"),
+    )
+
+
+# Units: prompt tokens per minute for Gemini, synthesized characters per minute for Deepgram
+PROVIDER_DEFAULTS = {
+    "gemini": {
+        "RPM": 60,
+        "UNITS_PER_MINUTE": 1_000_000,
+        "INITIAL_CONCURRENCY": 4,
+        "MAX_CONCURRENCY": 16,
+        "LATENCY_TARGET_S": 30,
+        "MAX_RETRIES": 4,
+        "BACKOFF_BASE_S": 1.0,
+        "BACKOFF_MAX_S": 30.0,
+    },
+    "deepgram": {
+        "RPM": 600,
+        "UNITS_PER_MINUTE": 0,
+        "INITIAL_CONCURRENCY": 5,
+        "MAX_CONCURRENCY": 15,
+        "LATENCY_TARGET_S": 15,
+        "MAX_RETRIES": 4,
+        "BACKOFF_BASE_S": 0.5,
+        "BACKOFF_MAX_S": 20.0,
+    },
+}
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Return the shared limiter for a provider, creating it on first use."""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = _build_limiter(provider)
+        _limiters[provider] = limiter
+    return limiter
+
+
+def provider_backlog() -> Tuple[int, int]:
+    """(calls waiting for a concurrency slot, current concurrency limit), summed over providers."""
+    queued = sum(limiter.concurrency.queued for limiter in _limiters.values())
+    slots = sum(int(limiter.concurrency.limit) for limiter in _limiters.values())
+    return queued, slots
+
+
+def _overload_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Decide whether an exception is a quota/overload signal.
+
+    Returns the provider's suggested wait in seconds (0.0 when it gave none),
+    or None if the error is not an overload and should not be retried.
+    """
+    if isinstance(exc, ProviderRateLimitError):
+        return exc.retry_after or 0.0
+
+    # google.api_core errors carry the HTTP status in `.code`
+    code = getattr(exc, "code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return None
+    if code not in OVERLOAD_STATUS_CODES:
+        return None
+
+    for detail in getattr(exc, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+    return 0.0
+
+
+async def call_with_rate_limit(
+    provider: str,
+    call: Callable[[], Awaitable[T]],
+    units: float = 0,
+) -> T:
+    """
+    Run `call` under the provider's quota, retrying overload errors.
+
+    `call` must return a fresh awaitable each time it is invoked so that it can be retried.
+    Raises ProviderRateLimitError once retries are exhausted; other errors propagate as-is.
+    """
+    limiter = get_limiter(provider)
+    attempt = 0
+
+    while True:
+        await limiter.concurrency.acquire()
+
+        error: Optional[Exception] = None
+        try:
+            await limiter.requests.acquire(1)
+            await limiter.units.acquire(units)
+            started = time.monotonic()
+            PROVIDER_IN_FLIGHT.inc(provider=provider)
+            PROVIDER_UNITS.inc(units, provider=provider)
+            try:
+                result = await call()
+            finally:
+                PROVIDER_IN_FLIGHT.dec(provider=provider)
+        except Exception as exc:
+            error = exc
+        finally:
+            limiter.concurrency.release()
+
+        if error is None:
+            PROVIDER_CALLS.inc(provider=provider, outcome="success")
+            limiter.concurrency.on_success(time.monotonic() - started)
+            return result
+
+        retry_after = _overload_retry_after(error)
+        if retry_after is None:
+            PROVIDER_CALLS.inc(provider=provider, outcome="error")
+            raise error
+        PROVIDER_CALLS.inc(provider=provider, outcome="overload")
+
+        limiter.concurrency.on_overload()
+        if retry_after:
+            limiter.requests.pause(retry_after)
+
+        if attempt >= limiter.max_retries:
+            logger.error("%s: giving up after %d attempts: %s", provider, attempt + 1, error)
+            raise ProviderRateLimitError(
+                provider,
+                f"{provider} is rate limiting requests: {error}",
+                retry_after=retry_after or limiter.max_delay,
+            ) from error
+
+        delay = limiter.backoff_delay(attempt, retry_after or None)
+        attempt += 1
+        PROVIDER_RETRIES.inc(provider=provider)
+        logger.warning(
+            "%s overloaded (attempt %d), retrying in %.2fs (concurrency limit now %d)",
+            provider, attempt, delay, int(limiter.concurrency.limit),
+        )
+        await asyncio.sleep(delay)
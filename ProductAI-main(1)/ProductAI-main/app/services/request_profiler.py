@@ -0,0 +1,187 @@
+"""
+Request Profiler - on-demand sampling profiles of single requests.
+
+A request is profiled when it carries `X-Profile-Request: <token>` equal to
+PRODUCTAI_PROFILE_TOKEN (no token configured: the header is ignored), or
+when it is picked by PRODUCTAI_PROFILE_SAMPLE_RATE. While it runs:
+1. A sampler thread records the event-loop thread's stack every
+   PRODUCTAI_PROFILE_INTERVAL_MS
+2. tracemalloc tracks allocations, for the peak and the top allocation sites
+
+Two files are written per profile to PRODUCTAI_PROFILE_DIR:
+    <profile id>.collapsed   folded stacks ("frame;frame;frame count"), for
+                             flamegraph.pl, speedscope or inferno
+    <profile id>.json        duration, sample count, tracemalloc peak and
+                             top allocation sites
+
+The loop thread is shared, so samples also include other requests running
+concurrently; work sent to threads (asyncio.to_thread) is not sampled. Only
+one request per worker is profiled at a time.
+
+Settings:
+    PRODUCTAI_PROFILE_TOKEN         secret for the X-Profile-Request header
+    PRODUCTAI_PROFILE_SAMPLE_RATE   share of requests profiled (default 0)
+    PRODUCTAI_PROFILE_PATHS         comma-separated path prefixes that can be profiled
+    PRODUCTAI_PROFILE_INTERVAL_MS   sampling interval (default 5)
+    PRODUCTAI_PROFILE_DIR           output directory (default <tmp>/productai_profiles)
+"""
+import collections
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Counter, List, Optional
+
+from app.services.metrics import counter
+
+PROFILE_TOKEN = os.getenv("PRODUCTAI_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PRODUCTAI_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = tuple(
+    path.strip()
+    for path in os.getenv("PRODUCTAI_PROFILE_PATHS", "/audio-full-process,/process-recording").split(",")
+    if path.strip()
+)
+PROFILE_INTERVAL_MS = float(os.getenv("PRODUCTAI_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PRODUCTAI_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "productai_profiles"))
+
+# Allocation sites listed in the profile summary
+TOP_ALLOCATIONS = 25
+# Frames kept per traceback by tracemalloc
+TRACEMALLOC_FRAMES = 1
+
+PROFILES = counter(
+    "request_profiles_total",
+    "Request profiles by trigger and outcome",
+    ["trigger", "outcome"],
+)
+
+_busy = threading.Lock()
+
+
+def profile_trigger(path: str, header_token: Optional[str]) -> Optional[str]:
+    """Why this request is profiled ("header" or "sampled"), or None."""
+    if not path.startswith(PROFILE_PATHS):
+        return None
+    if header_token and PROFILE_TOKEN and hmac.compare_digest(header_token, PROFILE_TOKEN):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+@dataclass
+class RequestProfile:
+    """One profiled request: folded stack counts plus memory statistics."""
+    profile_id: str
+    route: str
+    trigger: str
+    interval: float
+    stacks: Counter[str] = field(default_factory=collections.Counter)
+    samples: int = 0
+    duration: float = 0.0
+    peak_bytes: int = 0
+    top_allocations: List[dict] = field(default_factory=list)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "profile_id": self.profile_id,
+            "route": self.route,
+            "trigger": self.trigger,
+            "duration_s": round(self.duration, 4),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "tracemalloc_peak_bytes": self.peak_bytes,
+            "top_allocations": self.top_allocations,
+        }
+
+    def write(self, directory: str = PROFILE_DIR) -> str:
+        """Write <id>.collapsed and <id>.json; returns the base path."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.profile_id)
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return base
+
+
+class RequestProfiler:
+    """Samples one thread's stack and traces allocations between start() and stop()."""
+
+    def __init__(self, profile: RequestProfile, thread_id: int):
+        self.profile = profile
+        self.thread_id = thread_id
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._started_tracemalloc = False
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._started_at = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self) -> RequestProfile:
+        self._stop.set()
+        self._sampler.join()
+        self.profile.duration = time.perf_counter() - self._started_at
+        _, self.profile.peak_bytes = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+        self.profile.top_allocations = [
+            {"site": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count} for stat in stats
+        ]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        return self.profile
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.profile.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.profile.stacks[";".join(reversed(names))] += 1
+            self.profile.samples += 1
+
+
+def try_start_profile(route: str, trigger: str, profile_id: str) -> Optional[RequestProfiler]:
+    """Start profiling the calling thread, or return None if another profile is running."""
+    if not _busy.acquire(blocking=False):
+        PROFILES.inc(trigger=trigger, outcome="busy")
+        return None
+    profile = RequestProfile(profile_id, route, trigger, PROFILE_INTERVAL_MS / 1000)
+    profiler = RequestProfiler(profile, threading.get_ident())
+    try:
+        profiler.start()
+    except Exception:
+        _busy.release()
+        raise
+    return profiler
+
+
+def finish_profile(profiler: RequestProfiler) -> RequestProfile:
+    try:
+        profile = profiler.stop()
+    finally:
+        _busy.release()
+    PROFILES.inc(trigger=profile.trigger, outcome="recorded")
+    return profile
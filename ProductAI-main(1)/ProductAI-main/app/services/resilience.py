@@ -0,0 +1,330 @@
+"""
+Resilience Service - hedged requests, timeouts and circuit breakers for provider calls.
+
+`call_provider` is the single entry point for Gemini and Deepgram calls:
+1. The endpoint's circuit breaker fails fast while the endpoint is unhealthy
+2. Each attempt runs under the provider rate limiter with a hard timeout
+3. If an attempt runs past the endpoint's p95 latency, a duplicate (hedge)
+   is fired and whichever answers first wins. A per-provider budget keeps
+   hedges to a small share of traffic.
+
+Settings come from the environment, e.g. GEMINI_TIMEOUT_S, GEMINI_HEDGE_BUDGET,
+DEEPGRAM_BREAKER_FAILURE_RATE.
+"""
+import asyncio
+import collections
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.services.rate_limiter import (
+    OVERLOAD_STATUS_CODES,
+    ProviderUnavailableError,
+    call_with_rate_limit,
+)
+from app.services.structured_logging import get_logger
+from app.services.tracing import KIND_CLIENT, span
+
+logger = get_logger("resilience")
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    """Raised without calling the provider while an endpoint's circuit is open."""
+
+
+def _setting(provider: str, key: str, default: float) -> float:
+    return float(os.getenv(f"{provider.upper()}_{key}", default))
+
+
+def _flag(provider: str, key: str, default: bool) -> bool:
+    return os.getenv(f"{provider.upper()}_{key}", str(default)).lower() in ("1", "true", "yes")
+
+
+PROVIDER_TIMEOUTS = {"gemini": 60.0, "deepgram": 30.0}
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one endpoint."""
+
+    def __init__(self, window: int = 200):
+        self._samples: collections.deque = collections.deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Every primary call earns `ratio` hedge credits and every hedge spends one,
+    so hedges stay at roughly `ratio` of traffic with a small burst allowance.
+    """
+
+    def __init__(self, ratio: float, burst: float = 3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+
+    def on_call(self) -> None:
+        self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credits >= 1.0:
+            self.credits -= 1.0
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker over a sliding time window.
+
+    closed    -> calls flow; opens when the failure rate crosses the threshold
+    open      -> calls fail fast with CircuitOpenError until `open_seconds` pass
+    half_open -> a single probe call decides whether to close or re-open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        provider: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.provider = provider
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._outcomes: collections.deque = collections.deque()
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            remaining = self.open_seconds - (now - self._opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    self.provider,
+                    f"Circuit open for {self.name}, failing fast",
+                    retry_after=remaining,
+                )
+            self.state = self.HALF_OPEN
+            logger.info("Circuit %s half-open, sending probe call", self.name)
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(
+                    self.provider,
+                    f"Circuit half-open for {self.name}, probe in flight",
+                    retry_after=1.0,
+                )
+            self._probe_in_flight = True
+
+    def record(self, success: bool) -> None:
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                logger.info("Circuit %s closed: probe succeeded", self.name)
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, success))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def release_probe(self) -> None:
+        """Forget an in-flight probe whose call was cancelled."""
+        self._probe_in_flight = False
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        logger.error("Circuit %s opened for %gs", self.name, self.open_seconds)
+
+
+class _EndpointState:
+    def __init__(self, provider: str, endpoint: str):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(
+            name=f"{provider}:{endpoint}",
+            provider=provider,
+            failure_rate=_setting(provider, "BREAKER_FAILURE_RATE", 0.5),
+            min_calls=int(_setting(provider, "BREAKER_MIN_CALLS", 10)),
+            window_seconds=_setting(provider, "BREAKER_WINDOW_S", 60),
+            open_seconds=_setting(provider, "BREAKER_OPEN_S", 30),
+        )
+
+
+_endpoints: Dict[Tuple[str, str], _EndpointState] = {}
+_hedge_budgets: Dict[str, HedgeBudget] = {}
+
+
+def _endpoint_state(provider: str, endpoint: str) -> _EndpointState:
+    key = (provider, endpoint)
+    state = _endpoints.get(key)
+    if state is None:
+        state = _endpoints[key] = _EndpointState(provider, endpoint)
+    return state
+
+
+def observed_latency(provider: str, endpoint: str, q: float = 0.5) -> Optional[float]:
+    """Latency percentile of recent successful calls to an endpoint (None before any)."""
+    return _endpoint_state(provider, endpoint).latency.percentile(q)
+
+
+def _hedge_budget(provider: str) -> HedgeBudget:
+    budget = _hedge_budgets.get(provider)
+    if budget is None:
+        budget = _hedge_budgets[provider] = HedgeBudget(_setting(provider, "HEDGE_BUDGET", 0.05))
+    return budget
+
+
+def _hedge_delay(provider: str, state: _EndpointState) -> Optional[float]:
+    """Latency after which a hedge is fired, or None when hedging is off or untrained."""
+    if not _flag(provider, "HEDGE_ENABLED", True):
+        return None
+    if len(state.latency) < int(_setting(provider, "HEDGE_MIN_SAMPLES", 20)):
+        return None
+    return state.latency.percentile(_setting(provider, "HEDGE_PERCENTILE", 0.95))
+
+
+def _counts_as_failure(exc: BaseException) -> bool:
+    """Client errors (4xx other than 429) say nothing about endpoint health."""
+    code = getattr(exc, "code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return True
+    return not (400 <= code < 500 and code not in OVERLOAD_STATUS_CODES)
+
+
+async def _run_attempt(
+    provider: str,
+    state: _EndpointState,
+    call: Callable[[], Awaitable[T]],
+    units: float,
+    timeout: float,
+    started: asyncio.Event,
+) -> T:
+    """One rate-limited attempt; `started` is set once quota has been granted."""
+
+    async def timed_call() -> T:
+        started.set()
+        began = time.monotonic()
+        try:
+            with span(f"{provider}.request", kind=KIND_CLIENT, endpoint=state.breaker.name):
+                result = await asyncio.wait_for(call(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{state.breaker.name} did not respond within {timeout:.0f}s")
+        state.latency.record(time.monotonic() - began)
+        return result
+
+    return await call_with_rate_limit(provider, timed_call, units=units)
+
+
+async def _hedged_call(
+    provider: str,
+    state: _EndpointState,
+    call: Callable[[], Awaitable[T]],
+    units: float,
+    timeout: float,
+) -> T:
+    budget = _hedge_budget(provider)
+    budget.on_call()
+    hedge_after = _hedge_delay(provider, state)
+
+    primary_started = asyncio.Event()
+    primary = asyncio.ensure_future(
+        _run_attempt(provider, state, call, units, timeout, primary_started)
+    )
+    if hedge_after is None:
+        return await primary
+
+    pending = {primary}
+    try:
+        # Only start the hedge clock once the primary is actually talking to the provider
+        started_wait = asyncio.ensure_future(primary_started.wait())
+        await asyncio.wait({primary, started_wait}, return_when=asyncio.FIRST_COMPLETED)
+        started_wait.cancel()
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        if budget.try_spend():
+            logger.debug("%s passed p95 (%.2fs), firing hedged request", state.breaker.name, hedge_after)
+            pending.add(asyncio.ensure_future(
+                _run_attempt(provider, state, call, units, timeout, asyncio.Event())
+            ))
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_provider(
+    provider: str,
+    endpoint: str,
+    call: Callable[[], Awaitable[T]],
+    units: float = 0,
+) -> T:
+    """
+    Call a provider endpoint with circuit breaking, timeout, hedging and rate limiting.
+
+    `call` must return a fresh awaitable each time it is invoked, since it may be
+    retried or hedged. Raises CircuitOpenError while the endpoint is failing.
+    """
+    state = _endpoint_state(provider, endpoint)
+    with span(f"provider.{provider}", endpoint=endpoint, units=units):
+        state.breaker.before_call()
+        timeout = _setting(provider, "TIMEOUT_S", PROVIDER_TIMEOUTS.get(provider, 60.0))
+
+        try:
+            result = await _hedged_call(provider, state, call, units, timeout)
+        except asyncio.CancelledError:
+            state.breaker.release_probe()
+            raise
+        except Exception as exc:
+            state.breaker.record(not _counts_as_failure(exc))
+            raise
+
+        state.breaker.record(True)
+        return result
@@ -0,0 +1,154 @@
+"""
+Scheduler - priority classes and per-tenant fairness for provider calls.
+
+Every request carries a RequestClass (priority class + tenant) in a context
+variable, set by SchedulingMiddleware from the route and headers. When a
+provider's concurrency limit is reached, waiting calls are queued in a
+FairQueue instead of FIFO order:
+1. Each (priority, tenant) pair is a flow, weighted by its priority class
+   (interactive >> standard >> bulk)
+2. Start-time fair queuing serves flows in proportion to their weights, so
+   bulk work keeps a small share but cannot starve interactive calls, and
+   one tenant's burst does not hold back other tenants in the same class
+
+Queue depth and time spent waiting are recorded per provider and priority.
+
+Settings:
+    SCHEDULER_WEIGHT_INTERACTIVE    flow weight (default 16)
+    SCHEDULER_WEIGHT_STANDARD       flow weight (default 4)
+    SCHEDULER_WEIGHT_BULK           flow weight (default 1)
+    SCHEDULER_ROUTE_PRIORITIES      comma-separated path-prefix=priority pairs
+"""
+import contextvars
+import heapq
+import itertools
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.metrics import gauge, histogram
+
+PRIORITY_WEIGHTS = {
+    name: float(os.getenv(f"SCHEDULER_WEIGHT_{name.upper()}", default))
+    for name, default in (("interactive", 16), ("standard", 4), ("bulk", 1))
+}
+DEFAULT_PRIORITY = "standard"
+DEFAULT_TENANT = "anonymous"
+
+# Longest matching prefix wins
+ROUTE_PRIORITIES: List[Tuple[str, str]] = sorted(
+    (
+        tuple(part.strip() for part in pair.split("=", 1))
+        for pair in os.getenv(
+            "SCHEDULER_ROUTE_PRIORITIES",
+            "/audio-full-process=interactive,"
+            "/process-recording=interactive,"
+            "/collaboration/ai-suggestions=standard,"
+            "/collaboration/ai-review=bulk,"
+            "/collaboration/translate-demo=bulk",
+        ).split(",")
+        if "=" in pair
+    ),
+    key=lambda pair: len(pair[0]),
+    reverse=True,
+)
+
+QUEUE_DEPTH = gauge(
+    "scheduler_queue_depth",
+    "Provider calls waiting for a concurrency slot",
+    ["provider", "priority"],
+)
+QUEUE_WAIT = histogram(
+    "scheduler_queue_wait_seconds",
+    "Time provider calls spent waiting for a concurrency slot",
+    ["provider", "priority"],
+)
+
+
+@dataclass(frozen=True)
+class RequestClass:
+    """Who a provider call is made for and how urgent it is."""
+    priority: str = DEFAULT_PRIORITY
+    tenant: str = DEFAULT_TENANT
+
+    @property
+    def weight(self) -> float:
+        return PRIORITY_WEIGHTS.get(self.priority, PRIORITY_WEIGHTS[DEFAULT_PRIORITY])
+
+
+_current: contextvars.ContextVar[RequestClass] = contextvars.ContextVar("request_class", default=RequestClass())
+
+
+def current_request_class() -> RequestClass:
+    return _current.get()
+
+
+def priority_for_path(path: str) -> str:
+    for prefix, priority in ROUTE_PRIORITIES:
+        if path.startswith(prefix):
+            return priority
+    return DEFAULT_PRIORITY
+
+
+@contextmanager
+def request_class(priority: Optional[str] = None, tenant: Optional[str] = None) -> Iterator[RequestClass]:
+    """Run the enclosed provider calls under the given priority and/or tenant."""
+    current = _current.get()
+    updated = replace(current, priority=priority or current.priority, tenant=tenant or current.tenant)
+    token = _current.set(updated)
+    try:
+        yield updated
+    finally:
+        _current.reset(token)
+
+
+def set_default_tenant(tenant: Optional[str]) -> None:
+    """Attribute the rest of this request to `tenant` unless a tenant header already did."""
+    current = _current.get()
+    if tenant and current.tenant == DEFAULT_TENANT:
+        _current.set(replace(current, tenant=tenant))
+
+
+class FairQueue:
+    """Start-time fair queue of waiters, one flow per (priority, tenant)."""
+
+    def __init__(self, provider: str = ""):
+        self.provider = provider
+        self._heap: List[Tuple[float, int, Any, RequestClass]] = []
+        self._finish: Dict[RequestClass, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any, request: RequestClass) -> None:
+        start = max(self._virtual_time, self._finish.get(request, 0.0))
+        self._finish[request] = start + 1.0 / request.weight
+        heapq.heappush(self._heap, (start, next(self._sequence), item, request))
+        QUEUE_DEPTH.inc(provider=self.provider, priority=request.priority)
+
+    def pop(self) -> Tuple[Any, RequestClass]:
+        start, _, item, request = heapq.heappop(self._heap)
+        self._virtual_time = start
+        QUEUE_DEPTH.dec(provider=self.provider, priority=request.priority)
+        self._reset_if_idle()
+        return item, request
+
+    def remove(self, item: Any) -> bool:
+        """Drop a waiter that gave up before being served; False if it is not queued."""
+        for index, entry in enumerate(self._heap):
+            if entry[2] is item:
+                del self._heap[index]
+                heapq.heapify(self._heap)
+                QUEUE_DEPTH.dec(provider=self.provider, priority=entry[3].priority)
+                self._reset_if_idle()
+                return True
+        return False
+
+    def _reset_if_idle(self) -> None:
+        if not self._heap:
+            # Idle: start the next busy period with a clean slate
+            self._finish.clear()
+            self._virtual_time = 0.0
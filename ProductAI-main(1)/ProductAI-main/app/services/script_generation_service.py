@@ -7,38 +7,65 @@ This service combines:
 3. DOM events (for understanding user actions)
 
 To generate a production-ready script that can be converted to audio.
+
+When the caller's deadline (app.services.deadline) leaves too little time
+for the quality model, the script degrades to an earlier script for the
+same prompt, then the fast model, then a local cleanup of the transcript.
+
+The timing analysis and DOM contexts of a stored session are memoized in
+the artifact cache under its sessionRef (stored_script_context). Inline
+words and events are analyzed on every request: hashing them costs more
+than the analysis itself.
 """
-import google.generativeai as genai
 from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+import asyncio
 import os
 import re
 from app.models.dom_event_models import RecordingSession
+from app.services.artifact_cache import get_artifact_cache
+from app.services.cache_backend import cache_key, get_cache
+from app.services.deadline import (
+    DEGRADATIONS,
+    DeadlineExceededError,
+    choose_script_tier,
+    remaining_time,
+    run_within_deadline,
+)
 from app.services.rag_service import (
     build_rag_context_from_events,
     build_timeline_context,
     extract_ui_elements_summary,
 )
+from app.services.model_router import FAST_MODEL, QUALITY_MODEL, expected_latency, generate_content
+from app.services.staged_pipeline import STAGE_LATENCY
+from app.services.rate_limiter import ProviderUnavailableError
+from app.services.session_store import StoredSession
+from app.services.structured_logging import get_logger, sampler
+from app.services.tracing import span
 
-load_dotenv()
+logger = get_logger("script_generation")
 
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+# Version of build_script_context for the artifact cache - bump when its output
+# changes, including changes in the timing analysis or the rag_service builders
+SCRIPT_CONTEXT_VERSION = 2
 
-model = genai.GenerativeModel("gemini-2.5-flash-lite")
+# Generated scripts, served instead of a new Gemini call when the deadline is tight
+SCRIPT_CACHE_TTL_S = float(os.getenv("SCRIPT_CACHE_TTL_S", str(7 * 24 * 3600)))
 
+# Fillers the local (no Gemini) cleanup removes; "like"/"so" are left alone as they are often meaningful
+LOCAL_FILLER_PATTERN = re.compile(r"\b(?:um+|uh+|erm+|hmm+|you know|i mean)\b[,.]?\s*", re.IGNORECASE)
 
 def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analyze word-level timing data from Deepgram to identify gaps, pauses, and speaking patterns.
     """
-    print(f"[Timing Analysis] Starting analysis of {len(words)} words...")
-
     if not words:
-        print(f"[Timing Analysis] ⚠️  No words provided, returning empty analysis")
+        logger.warning("Timing analysis: no words provided, returning empty analysis")
         return {
             "total_duration": 0,
+            "total_words": 0,
             "gaps": [],
+            "num_gaps": 0,
             "average_gap": 0,
             "speaking_segments": [],
             "low_confidence_words": [],
@@ -65,7 +92,8 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
         "basically",
     ]
 
-    print(f"[Timing Analysis] Analyzing gaps, fillers, and confidence...")
+    # Per-word diagnostics: DEBUG only, sampled (None when DEBUG is off)
+    diagnostics = sampler(logger)
 
     # Analyze gaps between words and detect issues
     for i in range(len(words) - 1):
@@ -88,10 +116,9 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
                     "start": current.get("start", 0),
                 }
             )
-            print(
-                f"[Timing Analysis]   ⚠️  Low confidence word detected: "
-                f"'{current.get('word')}' (confidence: {current.get('confidence', 0):.2f})"
-            )
+            if diagnostics:
+                diagnostics("Low confidence word %r (confidence %.2f)",
+                            current.get("word"), current.get("confidence", 0))
 
         # Detect filler words
         word_lower = current.get("word", "").lower()
@@ -103,10 +130,8 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
                     "start": current.get("start", 0),
                 }
             )
-            print(
-                f"[Timing Analysis]   🗑️  Filler word detected: "
-                f"'{current.get('word')}' at {current.get('start', 0):.2f}s"
-            )
+            if diagnostics:
+                diagnostics("Filler word %r at %.2fs", current.get("word"), current.get("start", 0))
 
         # Detect repetitions (e.g., "the the", "as as")
         if current.get("word", "") == next_word.get("word", ""):
@@ -118,10 +143,8 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
                     "type": "repetition",
                 }
             )
-            print(
-                f"[Timing Analysis]   🔁 Repetition detected: "
-                f"'{current.get('word')} {next_word.get('word')}' at {current.get('start', 0):.2f}s"
-            )
+            if diagnostics:
+                diagnostics("Repetition %r at %.2fs", current.get("word"), current.get("start", 0))
 
         # Identify significant gaps (> 0.3s indicates pause)
         if gap_duration > 0.3:
@@ -149,23 +172,15 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
                 }
             )
 
-            print(
-                f"[Timing Analysis]   ⏸️  {gap_type.upper()} gap detected: "
-                f"{gap_duration:.2f}s after "
-                f"'{current.get('punctuated_word', current.get('word'))}' "
-                f"at {current_end:.2f}s"
-            )
+            if diagnostics:
+                diagnostics("%s gap of %.2fs after %r at %.2fs", gap_type, gap_duration,
+                            current.get("punctuated_word", current.get("word")), current_end)
 
             # End current speaking segment
             if current_segment:
                 current_segment["end"] = current_end
                 current_segment["word_count"] = len(current_segment["words"])
                 speaking_segments.append(current_segment)
-                print(
-                    f"[Timing Analysis]   📊 Speaking segment ended: "
-                    f"{current_segment['word_count']} words, "
-                    f"{current_segment['end'] - current_segment['start']:.2f}s"
-                )
                 current_segment = None
         else:
             # Continue or start speaking segment
@@ -175,10 +190,6 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
                     "end": current_end,
                     "words": [],
                 }
-                print(
-                    f"[Timing Analysis]   ▶️  New speaking segment started "
-                    f"at {current.get('start', 0):.2f}s"
-                )
             current_segment["words"].append(current)
             current_segment["end"] = current_end
 
@@ -187,25 +198,18 @@ def analyze_word_timings(words: List[Dict[str, Any]]) -> Dict[str, Any]:
         current_segment["end"] = words[-1].get("end", 0)
         current_segment["word_count"] = len(current_segment["words"])
         speaking_segments.append(current_segment)
-        print(
-            f"[Timing Analysis]   📊 Final speaking segment: "
-            f"{current_segment['word_count']} words, "
-            f"{current_segment['end'] - current_segment['start']:.2f}s"
-        )
 
     # Calculate statistics
     total_duration = words[-1].get("end", 0) - words[0].get("start", 0)
     average_gap = sum(g["duration"] for g in gaps) / len(gaps) if gaps else 0
     speaking_rate = len(words) / total_duration if total_duration > 0 else 0
 
-    print(f"[Timing Analysis] --->Analysis complete:")
-    print(f"[Timing Analysis]   - Total duration: {total_duration:.2f}s")
-    print(f"[Timing Analysis]   - Total words: {len(words)}")
-    print(f"[Timing Analysis]   - Speaking rate: {speaking_rate:.2f} words/sec")
-    print(f"[Timing Analysis]   - Gaps detected: {len(gaps)}")
-    print(f"[Timing Analysis]   - Filler words: {len(filler_words)}")
-    print(f"[Timing Analysis]   - Low confidence: {len(low_confidence_words)}")
-    print(f"[Timing Analysis]   - Speaking segments: {len(speaking_segments)}")
+    logger.debug(
+        "Timing analysis: %d words over %.2fs (%.2f words/sec), %d gaps, %d fillers, "
+        "%d low confidence, %d speaking segments",
+        len(words), total_duration, speaking_rate, len(gaps), len(filler_words),
+        len(low_confidence_words), len(speaking_segments),
+    )
 
     return {
         "total_duration": total_duration,
@@ -278,50 +282,105 @@ def build_timing_context(timing_analysis: Dict[str, Any]) -> str:
     return "\n".join(context_parts)
 
 
-def generate_product_script(
+def build_script_context(word_timings: List[Dict[str, Any]], session: Optional[RecordingSession]) -> Dict[str, Any]:
+    """
+    Timing analysis and DOM contexts for the script prompt, uncached.
+
+    Runs in preprocess pool workers for large stored sessions; the in-process
+    path in generate_product_script builds the same fields from the artifact
+    cache.
+    """
+    timing_analysis = analyze_word_timings(word_timings)
+    context = {
+        "timing_analysis": timing_analysis,
+        "timing_context": build_timing_context(timing_analysis),
+        "dom_context": "",
+        "timeline_context": "",
+        "ui_elements": "",
+        "significant_events": 0,
+        "event_count": len(session.events) if session else 0,
+        "session_id": session.sessionId if session else None,
+    }
+    if session and session.events:
+        context["dom_context"] = build_rag_context_from_events(session)
+        timeline = build_timeline_context(session.events)
+        context["timeline_context"] = _format_timeline(timeline)
+        context["significant_events"] = timeline["significant_events"]
+        context["ui_elements"] = extract_ui_elements_summary(session.events)
+    return context
+
+
+async def stored_script_context(stored: StoredSession) -> Dict[str, Any]:
+    """
+    build_script_context for a stored session plus its "content_hash",
+    memoized under the sessionRef and built in a worker thread on a miss.
+    """
+    def compute():
+        return asyncio.to_thread(lambda: build_script_context(stored.words, stored.session))
+
+    context = await get_artifact_cache().get_or_compute_async(
+        "script_context", SCRIPT_CONTEXT_VERSION, stored.content_hash, compute
+    )
+    return {**context, "content_hash": stored.content_hash}
+
+
+async def generate_product_script(
     raw_text: str,
     word_timings: List[Dict[str, Any]],
     session: Optional[RecordingSession] = None,
+    quality: str = "final",
+    latency_budget: Optional[float] = None,
+    reserve: float = 0.0,
+    context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Generate production-ready script using RAG context from all three inputs.
-    """
-    print(f"\n[Script Generation] ===== STARTING SCRIPT GENERATION =====")
-    print(f"[Script Generation] Raw text length: {len(raw_text)} characters")
-    print(f"[Script Generation] Word timings: {len(word_timings)} words")
-    print(f"[Script Generation] Session provided: {session is not None}")
 
-    # 1. Analyze word timings
-    print(f"\n[Script Generation] Step 1/4: Analyzing word timings...")
-    timing_analysis = analyze_word_timings(word_timings)
-    timing_context = build_timing_context(timing_analysis)
-    print(f"[Script Generation] --->Timing analysis complete")
+    `quality` ("draft" or "final") and `latency_budget` (seconds) steer the
+    model router towards the fast or the quality Gemini tier. `reserve` is
+    time (seconds) to leave before the deadline for later stages; the
+    result's "degraded" field names the cheaper path taken, if any.
 
-    # 2. Build RAG context from DOM events (if available)
-    print(f"\n[Script Generation] Step 2/4: Building RAG context from DOM events...")
-    dom_context = ""
-    timeline_context = ""
-    ui_elements = ""
+    `context` is a build_script_context result computed elsewhere
+    (stored_script_context or the preprocess pool); steps 1 and 2 are then
+    skipped and `word_timings` / `session` are not needed.
+    """
+    logger.debug(
+        "Script generation started: %d chars, %d words, session provided: %s, precomputed context: %s",
+        len(raw_text), len(word_timings), session is not None, context is not None,
+    )
 
-    if session and session.events:
-        print(
-            f"[Script Generation]   - Building context from "
-            f"{len(session.events)} DOM events..."
-        )
-        dom_context = build_rag_context_from_events(session)
-        print(f"[Script Generation]   - Building timeline context...")
-        timeline = build_timeline_context(session.events)
-        timeline_context = _format_timeline(timeline)
-        print(f"[Script Generation]   - Extracting UI elements...")
-        ui_elements = extract_ui_elements_summary(session.events)
-        print(f"[Script Generation] --->RAG context built successfully")
+    if context is not None:
+        timing_analysis = context["timing_analysis"]
+        timing_context = context["timing_context"]
+        dom_context = context["dom_context"]
+        timeline_context = context["timeline_context"]
+        ui_elements = context["ui_elements"]
+        has_events = context["event_count"] > 0
+        session_id = context["session_id"]
     else:
-        print(
-            f"[Script Generation]   ⚠️  No DOM events available, skipping RAG context"
-        )
+        # 1. Analyze word timings
+        with span("stage.timing_analysis", words=len(word_timings)), STAGE_LATENCY.time(stage="timing_analysis"):
+            timing_analysis = analyze_word_timings(word_timings)
+            timing_context = build_timing_context(timing_analysis)
+
+        # 2. Build RAG context from DOM events (if available)
+        dom_context = ""
+        timeline_context = ""
+        ui_elements = ""
+
+        has_events = bool(session and session.events)
+        session_id = session.sessionId if session else None
+        if has_events:
+            with span("stage.context_build", events=len(session.events)), STAGE_LATENCY.time(stage="context_build"):
+                dom_context = build_rag_context_from_events(session)
+                timeline_context = _format_timeline(build_timeline_context(session.events))
+                ui_elements = extract_ui_elements_summary(session.events)
+            logger.debug("RAG context built from %d DOM events", len(session.events))
+        else:
+            logger.debug("No DOM events available, skipping RAG context")
 
     # 3. Build prompt-safe contextual text (never put logic inside an f-string!)
-    print(f"\n[Script Generation] Step 3/4: Building Gemini prompt...")
 
     # Convert everything to simple safe strings FOR the f-string below
     dom_text = str(dom_context or "No DOM events available").replace("\\", "\\\\")
@@ -379,26 +438,10 @@ OUTPUT RULES:
 PRODUCTION-READY SCRIPT:
 """.strip()
 
-    print(f"[Script Generation]   - Prompt length: {len(prompt)} characters")
-    print(f"[Script Generation] --->Prompt built")
-
-    # 4. Generate script with Gemini
-    print(f"\n[Script Generation] Step 4/4: Calling Gemini API...")
-    try:
-        print(f"[Script Generation]   - Sending request to Gemini...")
-        response = model.generate_content(prompt)
-        print(f"[Script Generation]   - Response received from Gemini")
-
-        script = _clean_script_output(response.text)
-        print(f"[Script Generation]   - Script cleaned and formatted")
-        print(f"[Script Generation]   - Final script length: {len(script)} characters")
-
-        print(f"\n[Script Generation] ===== SCRIPT GENERATION COMPLETE =====")
-        print(
-            f"[Script Generation] Generated script preview: "
-            f"{script[:100]}..."
-        )
+    logger.debug("Prompt built: %d chars", len(prompt))
 
+    # 4. Generate script with Gemini (or a cheaper path if the deadline is tight)
+    def result(script: str, model_used: Optional[str], degraded: Optional[str] = None) -> Dict[str, Any]:
         return {
             "script": script,
             "raw_text": raw_text,
@@ -416,18 +459,60 @@ PRODUCTION-READY SCRIPT:
                 ),
                 "has_timing_data": timing_analysis["has_timing_data"],
             },
-            "dom_context_used": bool(session and session.events),
-            "session_id": session.sessionId if session else None,
+            "dom_context_used": has_events,
+            "session_id": session_id,
+            "model_used": model_used,
+            "degraded": degraded,
             "success": True,
         }
 
-    except Exception as e:
-        print(
-            f"\n[Script Generation] ❌ ERROR during Gemini API call: {str(e)}"
-        )
-        import traceback
+    script_cache = get_cache("scripts", SCRIPT_CACHE_TTL_S)
+    # The prompt holds everything the script is generated from
+    script_key = cache_key("script", prompt)
+
+    remaining = remaining_time()
+    budget = remaining - reserve if remaining is not None else None
+    cached = None
+    if budget is not None and budget < expected_latency(QUALITY_MODEL):
+        cached = await script_cache.get_json_async(script_key)
+    tier = choose_script_tier(
+        budget, expected_latency(QUALITY_MODEL), expected_latency(FAST_MODEL), cached is not None
+    )
+    if tier != "full":
+        DEGRADATIONS.inc(stage="script_generation", outcome=tier)
+        logger.warning("%.1fs left for the script, using the '%s' path", budget, tier)
+    if tier == "cached":
+        return result(cached["script"], cached.get("model_used"), degraded="cached")
+    if tier == "local":
+        return result(local_script_cleanup(raw_text), None, degraded="local")
+    if tier == "fast":
+        quality = "draft"
+    if budget is not None:
+        latency_budget = min(latency_budget, budget) if latency_budget is not None else budget
+
+    try:
+        with span("stage.gemini", tier=tier), STAGE_LATENCY.time(stage="gemini"):
+            response, model_choice = await run_within_deadline(
+                "script_generation",
+                generate_content(
+                    prompt,
+                    task="script_generation",
+                    quality=quality,
+                    latency_budget=latency_budget,
+                ),
+            )
+        script = _clean_script_output(response.text)
+        logger.debug("Script from %s: %d chars, preview %.100r", model_choice.model_name, len(script), script)
+
+        if tier == "full" and script:
+            await script_cache.set_json_async(script_key, {"script": script, "model_used": model_choice.model_name})
+        return result(script, model_choice.model_name, degraded="fast" if tier == "fast" else None)
 
-        traceback.print_exc()
+    except (ProviderUnavailableError, DeadlineExceededError):
+        raise
+
+    except Exception as e:
+        logger.exception("Error during Gemini API call: %s", e)
 
         return {
             "script": f"Error generating script: {str(e)}",
@@ -437,6 +522,17 @@ PRODUCTION-READY SCRIPT:
         }
 
 
+def local_script_cleanup(raw_text: str) -> str:
+    """Script from the transcript alone: fillers removed, spacing and capitalization fixed."""
+    text = _clean_script_output(LOCAL_FILLER_PATTERN.sub("", raw_text))
+    if not text:
+        return ""
+    text = text[0].upper() + text[1:]
+    if text[-1] not in ".!?":
+        text += "."
+    return text
+
+
 def _clean_script_output(text: str) -> str:
     """Clean and normalize script output."""
     if not text:
@@ -0,0 +1,329 @@
+"""
+Session Store - server-side registry of uploaded recording sessions.
+
+Clients upload a session (transcript, Deepgram words, DOM events) once and
+get back a content-addressed `sessionRef`. Later calls reference the
+session by that ID instead of re-sending megabytes of JSON.
+
+Sessions are stored in a compact binary file per session:
+
+    b"PAIS" | version (u8) | header length (u32) | header (zlib JSON) | chunks...
+
+The header holds the session metadata, the transcript and an index of
+chunks (offsets relative to the end of the header). Words and events are split into chunks of CHUNK_SIZE items, each a
+zlib-compressed JSON array, so the file can be memory-mapped and decoded
+lazily, one chunk at a time.
+
+Session files are swept at most once per PRODUCTAI_SESSION_SWEEP_INTERVAL_S,
+from the thread saving a session: files not uploaded or loaded for
+PRODUCTAI_SESSION_TTL_S are removed, then the least recently used ones
+until the directory fits in PRODUCTAI_SESSION_MAX_BYTES. Loading a session
+refreshes its file's mtime. All store methods block (file I/O, header
+decoding); call them from a worker thread.
+
+Settings:
+    PRODUCTAI_SESSION_DIR               where session files live
+    PRODUCTAI_SESSION_CACHE_SIZE        open sessions kept in memory (default 32)
+    PRODUCTAI_SESSION_TTL_S             unused sessions expire after (default 7 days, 0: never)
+    PRODUCTAI_SESSION_MAX_BYTES         total size of session files (default 2 GB, 0: unbounded)
+    PRODUCTAI_SESSION_SWEEP_INTERVAL_S  minimum time between sweeps (default 300)
+"""
+import collections
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.models.dom_event_models import RecordingSession
+from app.services.structured_logging import get_logger
+
+logger = get_logger("session_store")
+
+SESSION_DIR = os.getenv(
+    "PRODUCTAI_SESSION_DIR",
+    os.path.join(tempfile.gettempdir(), "productai_sessions"),
+)
+CHUNK_SIZE = 1024
+LOADED_SESSION_CACHE_SIZE = int(os.getenv("PRODUCTAI_SESSION_CACHE_SIZE", "32"))
+SESSION_TTL_S = float(os.getenv("PRODUCTAI_SESSION_TTL_S", str(7 * 24 * 3600)))
+SESSION_MAX_BYTES = int(os.getenv("PRODUCTAI_SESSION_MAX_BYTES", str(2 * 1024 ** 3)))
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("PRODUCTAI_SESSION_SWEEP_INTERVAL_S", "300"))
+
+MAGIC = b"PAIS"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct(">4sBI")
+_REF_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a sessionRef is unknown or malformed."""
+
+
+def _compress(items: List[Any]) -> bytes:
+    return zlib.compress(json.dumps(items, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _decompress(data) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+def compute_session_ref(transcript: str, words: List[Dict[str, Any]], session_data: Optional[Dict[str, Any]]) -> str:
+    """Content hash of everything that is stored; identical uploads share one ref."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (transcript, words, session_data):
+        encoded = json.dumps(part, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class StoredSession:
+    """
+    Lazily decoded view over a memory-mapped session file.
+
+    `transcript` and the counts come from the header. Words, events and the
+    RecordingSession are decoded from the file on every access and never
+    kept: the store holds up to LOADED_SESSION_CACHE_SIZE open sessions, and
+    a decoded 100k-event session takes hundreds of MB. Read them once per
+    request and keep the result.
+
+    The file stays mapped for as long as the object is referenced, also
+    after the store has dropped it (LRU eviction or delete), so requests
+    holding a session can keep reading it.
+    """
+
+    def __init__(self, ref: str, path: str):
+        self.ref = ref
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session file format in {path}")
+        start = _PREAMBLE.size
+        self._header = _decompress(self._mmap[start:start + header_len])
+        self._data_start = start + header_len
+
+    @property
+    def content_hash(self) -> str:
+        return self.ref
+
+    @property
+    def transcript(self) -> str:
+        return self._header["transcript"]
+
+    @property
+    def word_count(self) -> int:
+        return sum(count for _, _, count in self._header["chunks"]["words"])
+
+    @property
+    def event_count(self) -> int:
+        return sum(count for _, _, count in self._header["chunks"]["events"])
+
+    @property
+    def has_session(self) -> bool:
+        return self._header["meta"] is not None
+
+    def _iter_chunks(self, name: str) -> Iterator[Dict[str, Any]]:
+        for offset, length, _ in self._header["chunks"][name]:
+            offset += self._data_start
+            yield from _decompress(self._mmap[offset:offset + length])
+
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Raw event dicts, decoded one chunk at a time."""
+        return self._iter_chunks("events")
+
+    @property
+    def words(self) -> List[Dict[str, Any]]:
+        """Deepgram words, decoded on every access."""
+        return list(self._iter_chunks("words"))
+
+    @property
+    def session(self) -> Optional[RecordingSession]:
+        """The RecordingSession, decoded and validated on every access."""
+        if not self.has_session:
+            return None
+        data = dict(self._header["meta"])
+        data["events"] = list(self.iter_events())
+        return RecordingSession.model_validate(data)
+
+    def summary(self) -> Dict[str, Any]:
+        meta = self._header["meta"] or {}
+        return {
+            "sessionRef": self.ref,
+            "sessionId": meta.get("sessionId"),
+            "transcriptLength": len(self.transcript),
+            "wordCount": self.word_count,
+            "eventCount": self.event_count,
+            "storedBytes": len(self._mmap),
+        }
+
+
+class SessionStore:
+    """
+    Directory of session files plus a small LRU of open sessions.
+
+    Sessions leaving the LRU are not closed, only dropped: requests may
+    still be reading them, and the mapping is released with the last
+    reference.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache_size: int = LOADED_SESSION_CACHE_SIZE,
+        ttl: float = SESSION_TTL_S,
+        max_bytes: int = SESSION_MAX_BYTES,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL_S,
+    ):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._loaded: "collections.OrderedDict[str, StoredSession]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep: Optional[float] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        if not _REF_PATTERN.match(ref or ""):
+            raise SessionNotFoundError(ref)
+        return os.path.join(self.directory, f"{ref}.pais")
+
+    def save(
+        self,
+        transcript: str = "",
+        words: Optional[List[Dict[str, Any]]] = None,
+        session: Optional[RecordingSession] = None,
+    ) -> Dict[str, Any]:
+        """Store a session (no-op if identical content already exists). Returns its summary."""
+        words = words or []
+        session_data = session.model_dump(mode="json") if session else None
+        ref = compute_session_ref(transcript, words, session_data)
+        path = self._path(ref)
+
+        deduplicated = os.path.exists(path)
+        if not deduplicated:
+            events = session_data.pop("events") if session_data else []
+            self._write(path, transcript, words, events, session_data)
+            logger.info("Stored session %s (%d words, %d events)", ref, len(words), len(events))
+
+        summary = self.load(ref).summary()
+        summary["deduplicated"] = deduplicated
+        self._maybe_sweep()
+        return summary
+
+    def _write(self, path, transcript, words, events, meta) -> None:
+        blobs: List[bytes] = []
+        index: Dict[str, List[List[int]]] = {}
+        offset = 0
+        for name, items in (("words", words), ("events", events)):
+            index[name] = []
+            for i in range(0, len(items), CHUNK_SIZE):
+                chunk = items[i:i + CHUNK_SIZE]
+                blob = _compress(chunk)
+                index[name].append([offset, len(blob), len(chunk)])
+                blobs.append(blob)
+                offset += len(blob)
+        header_bytes = _compress({"meta": meta, "transcript": transcript, "chunks": index})
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+                f.write(header_bytes)
+                for blob in blobs:
+                    f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self, ref: str) -> StoredSession:
+        path = self._path(ref)
+        with self._lock:
+            stored = self._loaded.get(ref)
+            if stored is not None:
+                self._loaded.move_to_end(ref)
+                return stored
+
+        try:
+            os.utime(path)  # recently used: kept by the sweep
+        except FileNotFoundError:
+            raise SessionNotFoundError(ref)
+        stored = StoredSession(ref, path)
+
+        with self._lock:
+            self._loaded[ref] = stored
+            while len(self._loaded) > self.cache_size:
+                self._loaded.popitem(last=False)
+        return stored
+
+    def delete(self, ref: str) -> bool:
+        path = self._path(ref)
+        with self._lock:
+            self._loaded.pop(ref, None)
+        # Open views keep the unlinked file mapped until they are released
+        if os.path.exists(path):
+            os.unlink(path)
+            return True
+        return False
+
+    def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._last_sweep is not None and now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+    def sweep(self) -> int:
+        """Remove expired sessions, then the least recently used over max_bytes; returns how many."""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pais"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.name[:-len(".pais")]))
+        files.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, ref in files:
+            expired = self.ttl > 0 and now - mtime > self.ttl
+            over_size = self.max_bytes > 0 and total > self.max_bytes
+            if not (expired or over_size):
+                continue
+            try:
+                if self.delete(ref):
+                    removed += 1
+                    total -= size
+            except (SessionNotFoundError, OSError) as e:
+                logger.warning("Could not remove session %s: %s", ref, e)
+        if removed:
+            logger.info("Swept %d stored sessions (%d bytes left)", removed, total)
+        return removed
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore(SESSION_DIR)
+    return _store
@@ -0,0 +1,301 @@
+"""
+Staged Pipeline - pipeline stages joined by bounded queues, each with its own workers.
+
+/audio-full-process runs as four stages (preprocess, script, tts, persist)
+instead of one coroutine per request. Each stage has a fixed number of
+worker tasks reading from a bounded queue in front of it:
+
+    request -> [preprocess queue] -> preprocess workers -> [script queue] -> script workers
+            -> [tts queue] -> tts workers -> [persist queue] -> persist workers -> response
+
+A worker that finishes a job waits for room in the next stage's queue before
+taking another, so a slow stage (typically TTS) fills its queue, then stalls
+the stage before it, and so on up to the first queue. AdmissionMiddleware
+sheds new requests while the first queue is full and none of its workers is
+free (`pipeline_backpressure`) instead of letting them wait behind the slow
+stage.
+
+Handlers run as tasks in the request's context (correlation ID, deadline,
+priority class, trace span), so logging, deadlines and the provider
+scheduler behave as they did inline; the loop watchdog attributes stalls
+in a handler to the request's route. A job whose caller went away (client
+disconnect, deadline) is dropped by the next worker that sees it, and its
+running handler is cancelled. A job whose deadline passed while it was
+queued fails with DeadlineExceededError without running the stage.
+
+Queues and workers belong to the event loop that sent the first job. A
+pipeline serves one loop at a time: when run() is called on a different
+loop (a new TestClient, a restarted server loop) it abandons the old
+workers and queues and starts fresh ones on the new loop.
+
+Settings (per stage, e.g. PIPELINE_TTS_WORKERS):
+    PIPELINE_<STAGE>_WORKERS   worker tasks for the stage
+    PIPELINE_<STAGE>_QUEUE     jobs that may wait in front of the stage
+"""
+import asyncio
+import contextvars
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.deadline import check_deadline
+from app.services.loop_watchdog import current_route, track_route, untrack_route
+from app.services.metrics import gauge, histogram, register_collector
+from app.services.structured_logging import get_logger
+
+logger = get_logger("staged_pipeline")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Script and TTS workers match the providers' maximum concurrency
+# (GEMINI_MAX_CONCURRENCY, DEEPGRAM_MAX_CONCURRENCY)
+STAGE_DEFAULTS = {
+    "preprocess": {"WORKERS": 4, "QUEUE": 16},
+    "script": {"WORKERS": 16, "QUEUE": 8},
+    "tts": {"WORKERS": 15, "QUEUE": 8},
+    "persist": {"WORKERS": 2, "QUEUE": 8},
+}
+DEFAULT_STAGE_SETTINGS = {"WORKERS": 4, "QUEUE": 8}
+
+LATENCY_EWMA_ALPHA = 0.2
+
+QUEUE_DEPTH = gauge(
+    "pipeline_queue_depth",
+    "Jobs waiting in front of a pipeline stage",
+    ["pipeline", "stage"],
+)
+QUEUE_CAPACITY = gauge(
+    "pipeline_queue_capacity",
+    "Size of the bounded queue in front of a pipeline stage",
+    ["pipeline", "stage"],
+)
+STAGE_WORKERS = gauge(
+    "pipeline_stage_workers",
+    "Pipeline stage workers by state: running a job (busy) or waiting for room downstream (blocked)",
+    ["pipeline", "stage", "state"],
+)
+STAGE_LATENCY = histogram(
+    "pipeline_stage_seconds",
+    "Duration of full-process pipeline stages and the steps inside them",
+    ["stage"],
+)
+QUEUE_WAIT = histogram(
+    "pipeline_queue_wait_seconds",
+    "Time a job waited in front of a pipeline stage before a worker picked it up",
+    ["pipeline", "stage"],
+)
+
+
+@dataclass
+class _Job:
+    """One request travelling through the stages."""
+    state: Dict[str, Any]
+    future: asyncio.Future
+    context: contextvars.Context
+    enqueued: float = 0.0
+
+
+@dataclass
+class Stage:
+    """A handler with its own worker count and bounded input queue."""
+    name: str
+    handler: Handler
+    workers: int
+    queue_size: int
+    queue: Optional[asyncio.Queue] = None
+    latency: Optional[float] = None
+    idle: int = 0
+    tasks: List[asyncio.Task] = field(default_factory=list)
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def saturated(self) -> bool:
+        # A full queue with an idle worker is a burst that will drain at once
+        return self.queue is not None and self.queue.full() and self.idle == 0
+
+    def record_latency(self, seconds: float) -> None:
+        previous = self.latency if self.latency is not None else seconds
+        self.latency = (1 - LATENCY_EWMA_ALPHA) * previous + LATENCY_EWMA_ALPHA * seconds
+
+
+def stage_from_env(name: str, handler: Handler) -> Stage:
+    """Stage `name` sized from PIPELINE_<NAME>_WORKERS / PIPELINE_<NAME>_QUEUE."""
+    defaults = STAGE_DEFAULTS.get(name, DEFAULT_STAGE_SETTINGS)
+
+    def setting(key: str) -> int:
+        return max(1, int(os.getenv(f"PIPELINE_{name.upper()}_{key}", str(defaults[key]))))
+
+    return Stage(name=name, handler=handler, workers=setting("WORKERS"), queue_size=setting("QUEUE"))
+
+
+class StagedPipeline:
+    """Stages joined by bounded queues; workers start on the first job."""
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages = stages
+        self._started = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for index, stage in enumerate(self.stages):
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+            QUEUE_CAPACITY.set(stage.queue_size, pipeline=self.name, stage=stage.name)
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            stage.tasks = [
+                asyncio.create_task(self._worker(stage, next_stage), name=f"{self.name}.{stage.name}.{i}")
+                for i in range(stage.workers)
+            ]
+        self._started = True
+        logger.info("Pipeline %s started: %s", self.name,
+                    ", ".join(f"{s.name} {s.workers} workers/{s.queue_size} queued" for s in self.stages))
+
+    async def stop(self) -> None:
+        if not self._started:
+            return
+        tasks = [task for stage in self.stages for task in stage.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for stage in self.stages:
+            while not stage.queue.empty():
+                stage.queue.get_nowait().future.cancel()
+        self._reset()
+
+    def _reset(self) -> None:
+        for stage in self.stages:
+            stage.tasks = []
+            stage.queue = None
+            stage.idle = 0
+        self._started = False
+        self._loop = None
+
+    async def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Send `state` through every stage; returns it once the last stage is done."""
+        loop = asyncio.get_running_loop()
+        if self._started and self._loop is not loop:
+            logger.warning("Pipeline %s moved to a new event loop; restarting its workers", self.name)
+            self._reset()
+        if not self._started:
+            self._start()
+        job = _Job(state, loop.create_future(), contextvars.copy_context())
+        try:
+            await self._put(self.stages[0], job)
+            return await job.future
+        finally:
+            # The caller gave up: workers drop the job and cancel its running handler
+            if not job.future.done():
+                job.future.cancel()
+
+    async def _put(self, stage: Stage, job: _Job) -> None:
+        await stage.queue.put(job)
+        job.enqueued = time.monotonic()
+        QUEUE_DEPTH.set(stage.depth(), pipeline=self.name, stage=stage.name)
+
+    async def _worker(self, stage: Stage, next_stage: Optional[Stage]) -> None:
+        labels = {"pipeline": self.name, "stage": stage.name}
+        while True:
+            stage.idle += 1
+            try:
+                job = await stage.queue.get()
+            finally:
+                stage.idle -= 1
+            QUEUE_DEPTH.set(stage.depth(), **labels)
+            if job.future.done():
+                continue
+            QUEUE_WAIT.observe(time.monotonic() - job.enqueued, **labels)
+
+            STAGE_WORKERS.inc(state="busy", **labels)
+            started = time.monotonic()
+            try:
+                if not await self._run_handler(stage, job):
+                    continue
+            finally:
+                STAGE_WORKERS.dec(state="busy", **labels)
+            stage.record_latency(time.monotonic() - started)
+
+            if next_stage is None:
+                job.future.set_result(job.state)
+                continue
+            # Blocking here is the backpressure: this worker takes no new job
+            # until the next stage has room
+            STAGE_WORKERS.inc(state="blocked", **labels)
+            try:
+                await self._put(next_stage, job)
+            finally:
+                STAGE_WORKERS.dec(state="blocked", **labels)
+
+    async def _run_handler(self, stage: Stage, job: _Job) -> bool:
+        """Run the stage on `job` in the request's context; False when the job ended here."""
+        async def handle():
+            check_deadline(stage.name)
+            await stage.handler(job.state)
+
+        task = job.context.run(asyncio.create_task, handle())
+        route = job.context.run(current_route)
+        if route is not None:
+            track_route(task, route)
+
+        def cancel_abandoned(future: asyncio.Future) -> None:
+            if future.cancelled():
+                task.cancel()
+
+        job.future.add_done_callback(cancel_abandoned)
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            job.future.remove_done_callback(cancel_abandoned)
+            untrack_route(task)
+
+        if task.cancelled() or job.future.done():
+            return False
+        if task.exception() is not None:
+            job.future.set_exception(task.exception())
+            return False
+        return True
+
+    def backpressure(self) -> Tuple[Optional[str], float]:
+        """
+        (name of the first stage while its queue is full and no worker is
+        free to take from it, else None;
+        estimated seconds until the queued work drains).
+        """
+        drain = sum(
+            (stage.latency or 0.0) * (stage.depth() + stage.workers) / stage.workers
+            for stage in self.stages
+        )
+        entry = self.stages[0]
+        return (entry.name if entry.saturated() else None), drain
+
+    def _collect(self) -> None:
+        for stage in self.stages:
+            QUEUE_DEPTH.set(stage.depth(), pipeline=self.name, stage=stage.name)
+
+
+_pipelines: Dict[str, StagedPipeline] = {}
+
+
+def register_pipeline(route: str, pipeline: StagedPipeline) -> StagedPipeline:
+    """Make `pipeline`'s backpressure visible to admission for requests to `route`."""
+    _pipelines[route] = pipeline
+    register_collector(pipeline._collect)
+    return pipeline
+
+
+def pipeline_backpressure(route: str) -> Tuple[Optional[str], float]:
+    """(saturated entry stage or None, estimated drain seconds) for the pipeline serving `route`."""
+    pipeline = _pipelines.get(route)
+    if pipeline is None:
+        return None, 0.0
+    return pipeline.backpressure()
+
+
+async def stop_pipelines() -> None:
+    for pipeline in _pipelines.values():
+        await pipeline.stop()
@@ -0,0 +1,168 @@
+"""
+Structured Logging - leveled, lazily formatted logs with correlation IDs.
+
+Modules log through `get_logger()` with %-style arguments, so a message
+filtered out by its level is never formatted:
+
+    logger = get_logger("script_generation")
+    logger.info("Script generated with %s (%d chars)", model, len(script))
+
+1. Every record carries the request's correlation ID (CorrelationIdMiddleware
+   takes X-Request-Id or generates one, and echoes it back)
+2. Records go through a queue to a writer thread, so the event loop never
+   blocks on stdout
+3. Output is one JSON object per line, or human-readable text
+4. High-volume diagnostics (per word, per event) use `sampler()`: DEBUG
+   only, and only PRODUCTAI_LOG_SAMPLE_RATE of them
+
+Settings:
+    PRODUCTAI_LOG_LEVEL        DEBUG, INFO (default), WARNING or ERROR
+    PRODUCTAI_LOG_FORMAT       json (default) or text
+    PRODUCTAI_LOG_SAMPLE_RATE  share of sampled diagnostics emitted (default 0.01)
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Iterator, Optional
+
+LOG_LEVEL = os.getenv("PRODUCTAI_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("PRODUCTAI_LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATE = float(os.getenv("PRODUCTAI_LOG_SAMPLE_RATE", "0.01"))
+
+ROOT_LOGGER = "productai"
+
+_correlation_id: contextvars.ContextVar[str] = contextvars.ContextVar("correlation_id", default="-")
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+
+
+def get_correlation_id() -> str:
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation_scope(correlation_id: str) -> Iterator[None]:
+    """Tag every record logged in the enclosed code with `correlation_id`."""
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield
+    finally:
+        _correlation_id.reset(token)
+
+
+class _CorrelationFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; `extra=` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            **_extras(record),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """`time LEVEL [correlation id] logger: message key=value ...`"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(correlation_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = _extras(record)
+        if extras:
+            line += " " + " ".join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Hands records to the writer thread with only the message merged (no formatting here)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Install the queue handler and writer thread on the "productai" logger (once)."""
+    global _configured, _listener
+    with _configure_lock:
+        if _configured:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _DeferredQueueHandler(records)
+        handler.addFilter(_CorrelationFilter())
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level)
+        root.addHandler(handler)
+        root.propagate = False
+
+        _listener = QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def sampler(logger: logging.Logger, rate: float = LOG_SAMPLE_RATE) -> Optional[Callable[..., None]]:
+    """
+    DEBUG logging function that emits about `rate` of its calls, or None when
+    DEBUG is disabled. Call it once outside a hot loop:
+
+        diagnostics = sampler(logger)
+        for word in words:
+            if diagnostics:
+                diagnostics("Filler word %r at %.2fs", word, start)
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or rate <= 0:
+        return None
+
+    def log(msg: str, *args) -> None:
+        if rate >= 1 or random.random() < rate:
+            logger.debug(msg, *args, stacklevel=2)
+
+    return log
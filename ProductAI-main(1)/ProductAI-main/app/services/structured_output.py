@@ -0,0 +1,178 @@
+"""
+Structured Output - schema-constrained JSON generation with Gemini.
+
+Instead of asking for JSON in prose and digging it out of the reply:
+1. The Pydantic output model is converted to a Gemini response schema and
+   sent with response_mime_type="application/json"
+2. The reply is validated against the same model. Gemini's schema has no
+   numeric bounds, so ranges from Field(ge=, le=) are stated in the field
+   description and out-of-range numbers are clamped before validation
+   rather than costing a retry
+3. An invalid reply is retried (bounded by STRUCTURED_OUTPUT_MAX_ATTEMPTS)
+   with the validation error appended to the prompt; invalid replies are
+   never cached
+
+Settings:
+    STRUCTURED_OUTPUT_MAX_ATTEMPTS   total attempts per call (default 2)
+"""
+import json
+import os
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from app.services.metrics import counter
+from app.services.model_router import ModelChoice, generate_content
+from app.services.structured_logging import get_logger
+
+logger = get_logger("structured_output")
+
+STRUCTURED_OUTPUT_MAX_ATTEMPTS = int(os.getenv("STRUCTURED_OUTPUT_MAX_ATTEMPTS", "2"))
+
+# Fields of the Gemini (OpenAPI subset) schema we pass through
+_SCHEMA_FIELDS = ("type", "description", "enum", "required")
+
+STRUCTURED_ATTEMPTS = counter(
+    "structured_output_attempts_total",
+    "Schema-constrained Gemini calls by task and validation outcome",
+    ["task", "outcome"],
+)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StructuredOutputError(Exception):
+    """Gemini did not produce a reply matching the schema within the allowed attempts."""
+
+
+def _bounds_text(node: Dict[str, Any]) -> Optional[str]:
+    if "minimum" in node and "maximum" in node:
+        return f"Between {node['minimum']:g} and {node['maximum']:g}"
+    if "minimum" in node:
+        return f"At least {node['minimum']:g}"
+    if "maximum" in node:
+        return f"At most {node['maximum']:g}"
+    return None
+
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        return _convert(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        if len(options) != 1:
+            raise ValueError(f"Unsupported union in response schema: {node}")
+        schema = _convert(options[0], defs)
+        if len(options) < len(node["anyOf"]):
+            schema["nullable"] = True
+        return schema
+
+    if "const" in node:
+        return {"type": "string", "enum": [node["const"]]}
+
+    schema = {key: node[key] for key in _SCHEMA_FIELDS if key in node}
+    bounds = _bounds_text(node)
+    if bounds:
+        schema["description"] = f"{schema['description']} ({bounds})" if "description" in schema else bounds
+    if node.get("type") == "object":
+        schema.pop("description", None)  # model docstrings are for readers, not the prompt
+        if not node.get("properties"):
+            raise ValueError("Free-form objects are not supported in response schemas")
+        schema["properties"] = {name: _convert(prop, defs) for name, prop in node["properties"].items()}
+    if node.get("type") == "array":
+        schema["items"] = _convert(node["items"], defs)
+    return schema
+
+
+def response_schema_for(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Gemini response_schema (OpenAPI subset) for a Pydantic model."""
+    json_schema = model.model_json_schema()
+    return _convert(json_schema, json_schema.get("$defs", {}))
+
+
+def _clamp(value: Any, node: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """`value` with numbers outside the JSON schema's minimum/maximum pulled back into range."""
+    if "$ref" in node:
+        return _clamp(value, defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        return _clamp(value, options[0], defs) if value is not None and len(options) == 1 else value
+    if isinstance(value, dict) and "properties" in node:
+        properties = node["properties"]
+        return {key: _clamp(item, properties[key], defs) if key in properties else item
+                for key, item in value.items()}
+    if isinstance(value, list) and "items" in node:
+        return [_clamp(item, node["items"], defs) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in node and value < node["minimum"]:
+            return node["minimum"]
+        if "maximum" in node and value > node["maximum"]:
+            return node["maximum"]
+    return value
+
+
+def _parse(text: str, output_model: Type[T], json_schema: Dict[str, Any]) -> T:
+    """Validate a reply, clamping out-of-range numbers first; raises ValidationError."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return output_model.model_validate_json(text)  # reports the malformed JSON as a ValidationError
+    return output_model.model_validate(_clamp(data, json_schema, json_schema.get("$defs", {})))
+
+
+# output model -> (its JSON schema, the Gemini response schema built from it)
+_schemas: Dict[type, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+
+async def generate_structured(
+    prompt: str,
+    output_model: Type[T],
+    task: str,
+    quality: str = "final",
+    latency_budget: Optional[float] = None,
+    max_attempts: int = STRUCTURED_OUTPUT_MAX_ATTEMPTS,
+) -> Tuple[T, ModelChoice]:
+    """
+    Generate JSON matching `output_model` and return it validated.
+
+    Raises StructuredOutputError when every attempt produced an invalid reply.
+    """
+    schemas = _schemas.get(output_model)
+    if schemas is None:
+        json_schema = output_model.model_json_schema()
+        schemas = _schemas[output_model] = (json_schema, _convert(json_schema, json_schema.get("$defs", {})))
+    json_schema, schema = schemas
+
+    generation_config = {"response_mime_type": "application/json", "response_schema": schema}
+    attempt_prompt = prompt
+    last_error: Optional[ValidationError] = None
+
+    for attempt in range(1, max_attempts + 1):
+        validated = []
+        try:
+            response, choice = await generate_content(
+                attempt_prompt,
+                task=task,
+                quality=quality,
+                latency_budget=latency_budget,
+                validate=lambda text: validated.append(_parse(text, output_model, json_schema)),
+                generation_config=generation_config,
+            )
+        except ValidationError as e:
+            last_error = e
+            STRUCTURED_ATTEMPTS.inc(task=task, outcome="invalid")
+            logger.warning("%s: reply failed validation (attempt %d/%d): %d errors",
+                           task, attempt, max_attempts, e.error_count())
+            attempt_prompt = (
+                f"{prompt}\n\nYour previous reply did not match the required JSON schema:\n"
+                f"{e}\nReply again with JSON that matches the schema exactly."
+            )
+            continue
+
+        STRUCTURED_ATTEMPTS.inc(task=task, outcome="valid")
+        # Cache hits skip the validate hook (only valid replies are cached)
+        result = validated[0] if validated else _parse(response.text, output_model, json_schema)
+        return result, choice
+
+    raise StructuredOutputError(f"{task}: no valid reply after {max_attempts} attempts: {last_error}")
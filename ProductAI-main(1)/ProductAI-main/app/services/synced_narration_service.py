@@ -2,21 +2,18 @@
 Service to generate synced narration using RAG context from DOM events
 and raw user transcript. Uses Gemini to create narration that matches
 the timing and actions from screen recordings.
+
+For a stored session, pass its stored_script_context as `context`: the DOM,
+timeline and UI contexts are then read from the artifact memoized under the
+sessionRef (shared with script generation) instead of being rebuilt from
+the events on every call.
 """
-import google.generativeai as genai
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
-import os
+from typing import Any, List, Dict, Optional
 import re
 from app.models.dom_event_models import RecordingSession
 from app.services.rag_service import build_rag_context_from_events, build_timeline_context, extract_ui_elements_summary
-
-load_dotenv()
-
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
-
-model = genai.GenerativeModel("gemini-2.5-flash")
+from app.services.model_router import generate_content
+from app.services.rate_limiter import ProviderUnavailableError
 
 
 def clean_output(text: str) -> str:
@@ -31,24 +28,42 @@ def clean_output(text: str) -> str:
     return text.strip()
 
 
-def generate_synced_narration(
+def _session_context(session: RecordingSession, ui_elements: bool) -> Dict[str, Any]:
+    """The build_script_context fields the narration prompts use, built from the events."""
+    timeline = build_timeline_context(session.events)
+    return {
+        "dom_context": build_rag_context_from_events(session),
+        "timeline_context": _format_timeline(timeline),
+        "ui_elements": extract_ui_elements_summary(session.events) if ui_elements else "",
+        "significant_events": timeline["significant_events"],
+        "event_count": len(session.events),
+        "session_id": session.sessionId,
+    }
+
+
+async def generate_synced_narration(
     raw_text: str,
-    session: RecordingSession
+    session: Optional[RecordingSession] = None,
+    quality: str = "final",
+    context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, any]:
     """
     Generate synced product demo narration using RAG context from DOM events.
     
     Args:
         raw_text: Raw user transcript/narration
-        session: RecordingSession with DOM events for context
+        session: RecordingSession with DOM events for context (not needed with `context`)
+        quality: "draft" or "final", passed to the model router
+        context: build_script_context result, e.g. stored_script_context of a stored session
         
     Returns:
         Dictionary with synced narration and metadata
     """
-    # Build RAG context from DOM events
-    rag_context = build_rag_context_from_events(session)
-    timeline = build_timeline_context(session.events)
-    ui_summary = extract_ui_elements_summary(session.events)
+    if context is None:
+        context = _session_context(session, ui_elements=True)
+    rag_context = context["dom_context"]
+    timeline_context = context["timeline_context"] or "No significant actions recorded."
+    ui_summary = context["ui_elements"]
     
     # Create comprehensive prompt with context
     prompt = f"""
@@ -61,7 +76,7 @@ UI ELEMENTS INTERACTED WITH:
 {ui_summary}
 
 TIMELINE OF ACTIONS:
-{_format_timeline(timeline)}
+{timeline_context}
 
 RAW USER TRANSCRIPT:
 {raw_text}
@@ -89,18 +104,21 @@ SYNCED NARRATION:
 """
     
     try:
-        response = model.generate_content(prompt)
+        response, _ = await generate_content(prompt, task="synced_narration", quality=quality)
         synced_narration = clean_output(response.text)
         
         return {
             "synced_narration": synced_narration,
             "raw_text": raw_text,
             "rag_context_used": True,
-            "timeline_events": timeline["significant_events"],
-            "total_dom_events": len(session.events),
-            "session_id": session.sessionId
+            "timeline_events": context["significant_events"],
+            "total_dom_events": context["event_count"],
+            "session_id": context["session_id"]
         }
         
+    except ProviderUnavailableError:
+        raise
+
     except Exception as e:
         return {
             "synced_narration": f"Error generating synced narration: {str(e)}",
@@ -122,9 +140,11 @@ def _format_timeline(timeline: Dict) -> str:
     return "\n".join(lines)
 
 
-def generate_step_by_step_narration(
+async def generate_step_by_step_narration(
     raw_text: str,
-    session: RecordingSession
+    session: Optional[RecordingSession] = None,
+    quality: str = "final",
+    context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, any]:
     """
     Generate narration broken down by steps, synced with DOM events.
@@ -132,13 +152,17 @@ def generate_step_by_step_narration(
     
     Args:
         raw_text: Raw user transcript
-        session: RecordingSession with DOM events
+        session: RecordingSession with DOM events (not needed with `context`)
+        quality: "draft" or "final", passed to the model router
+        context: build_script_context result, e.g. stored_script_context of a stored session
         
     Returns:
         Dictionary with step-by-step narration
     """
-    rag_context = build_rag_context_from_events(session)
-    timeline = build_timeline_context(session.events)
+    if context is None:
+        context = _session_context(session, ui_elements=False)
+    rag_context = context["dom_context"]
+    timeline_context = context["timeline_context"] or "No significant actions recorded."
     
     prompt = f"""
 You are an AI that creates step-by-step product demo narration synchronized with screen recordings.
@@ -147,7 +171,7 @@ CONTEXT FROM SCREEN RECORDING:
 {rag_context}
 
 TIMELINE OF ACTIONS:
-{_format_timeline(timeline)}
+{timeline_context}
 
 RAW USER TRANSCRIPT:
 {raw_text}
@@ -169,7 +193,7 @@ Each step should be a single sentence or short paragraph describing what happens
 """
     
     try:
-        response = model.generate_content(prompt)
+        response, _ = await generate_content(prompt, task="step_narration", quality=quality)
         step_narration = response.text.strip()
         
         # Parse steps if possible
@@ -180,9 +204,12 @@ Each step should be a single sentence or short paragraph describing what happens
             "parsed_steps": steps,
             "raw_text": raw_text,
             "rag_context_used": True,
-            "session_id": session.sessionId
+            "session_id": context["session_id"]
         }
         
+    except ProviderUnavailableError:
+        raise
+
     except Exception as e:
         return {
             "step_by_step": f"Error: {str(e)}",
@@ -0,0 +1,261 @@
+"""
+Tracing - W3C trace context and spans for pipeline stages and provider calls.
+
+TracingMiddleware continues the caller's trace from its `traceparent`
+header (or starts one) and opens a server span per request. Code inside
+the request opens child spans:
+
+    with span("stage.tts", chars=len(script)):
+        audio = await synthesize_voice(script)
+
+The current span lives in a context variable, so spans nest across awaits
+and tasks. The response carries a `traceparent` for the server span, and
+`current_trace_id()` lets handlers return the trace ID in their body.
+
+Finished spans are batched and exported by a background thread:
+1. "file": one JSON object per span, appended to PRODUCTAI_TRACE_FILE
+2. "otlp": OTLP/HTTP JSON posted to PRODUCTAI_OTLP_ENDPOINT (an
+   OpenTelemetry collector, or any local stand-in that accepts the format)
+3. "off" (default): trace IDs are still propagated and returned, but no
+   spans are kept
+
+Settings:
+    PRODUCTAI_TRACE_EXPORTER       off (default), file or otlp
+    PRODUCTAI_TRACE_FILE           JSON-lines file (default <tmp>/productai_traces.jsonl)
+    PRODUCTAI_OTLP_ENDPOINT        default http://localhost:4318/v1/traces
+    PRODUCTAI_TRACE_SERVICE_NAME   service.name resource attribute (default productai-python)
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import re
+import secrets
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.metrics import counter
+from app.services.structured_logging import get_logger
+
+TRACE_EXPORTER = os.getenv("PRODUCTAI_TRACE_EXPORTER", "off").lower()
+TRACE_FILE = os.getenv("PRODUCTAI_TRACE_FILE", os.path.join(tempfile.gettempdir(), "productai_traces.jsonl"))
+OTLP_ENDPOINT = os.getenv("PRODUCTAI_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("PRODUCTAI_TRACE_SERVICE_NAME", "productai-python")
+
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_S = 2.0
+EXPORT_QUEUE_SIZE = 10000
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+SPANS_EXPORTED = counter(
+    "trace_spans_exported_total",
+    "Finished spans by export outcome",
+    ["outcome"],
+)
+
+logger = get_logger("tracing")
+
+
+@dataclass
+class Span:
+    """One timed operation in a trace."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    kind: int = KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace ID, parent span ID) from a W3C traceparent header, or None if invalid."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current.get()
+    return active.trace_id if active else None
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: int = KIND_INTERNAL,
+    traceparent: Optional[str] = None,
+    **attributes: Any,
+) -> Iterator[Span]:
+    """
+    Run the enclosed code as a span: a child of the current span, of the
+    remote parent in `traceparent`, or the root of a new trace.
+    """
+    parent = _current.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote:
+        trace_id, parent_id = remote
+    elif parent:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    active = Span(name, trace_id, secrets.token_hex(8), parent_id, kind, attributes=dict(attributes))
+    token = _current.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        active.end_ns = time.time_ns()
+        _exporter.submit(active)
+
+
+class SpanExporter:
+    """Batches finished spans and writes them from a background thread."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, finished: Span) -> None:
+        if self.mode not in ("file", "otlp"):
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            SPANS_EXPORTED.inc(outcome="dropped")
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=EXPORT_INTERVAL_S)
+            except queue.Empty:
+                continue
+            self._export([first] + self._drain())
+
+    def flush(self) -> None:
+        """Export whatever is queued (called at exit)."""
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            if self.mode == "file":
+                with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(s.to_dict(), default=str) + "\n" for s in batch))
+            else:
+                self._post_otlp(batch)
+            SPANS_EXPORTED.inc(len(batch), outcome="exported")
+        except Exception as e:
+            SPANS_EXPORTED.inc(len(batch), outcome="failed")
+            logger.warning("Exporting %d spans failed: %s", len(batch), e)
+
+    def _post_otlp(self, batch: List[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "productai"}, "spans": [s.to_otlp() for s in batch]}],
+            }]
+        }
+        request = urllib.request.Request(
+            OTLP_ENDPOINT,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+_exporter = SpanExporter(TRACE_EXPORTER)
@@ -0,0 +1,183 @@
+"""
+Local stand-ins for the Gemini and Deepgram APIs, for load tests that must
+not spend real quota.
+
+Gemini: POST /v1beta/models/<model>:generateContent (REST wire format).
+Plain prompts get a text reply of --reply-chars; prompts with a
+responseSchema get JSON generated from that schema, so structured-output
+routes (suggestions, review, translation) validate.
+
+Deepgram: POST /v1/speak returns fake MP3 bytes proportional to the text.
+
+Each request draws a latency from a log-normal distribution (median and
+sigma per provider, plus a per-character cost), then fails with 429
+(with Retry-After) or 500 at the configured rates.
+
+Point the app at them with:
+    GEMINI_API_ENDPOINT=http://127.0.0.1:<gemini port>
+    DEEPGRAM_SPEAK_URL=http://127.0.0.1:<deepgram port>/v1/speak
+
+Usage (from the project root):
+    python -m benchmarks.fake_providers [--gemini-port 8091] [--deepgram-port 8092]
+        [--gemini-latency-ms 800] [--deepgram-latency-ms 400] [--latency-sigma 0.4]
+        [--rate-429 0.0] [--error-rate 0.0]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# google.ai.generativelanguage Type enum, as the REST client serializes it
+SCHEMA_TYPES = {1: "STRING", 2: "NUMBER", 3: "INTEGER", 4: "BOOLEAN", 5: "ARRAY", 6: "OBJECT"}
+
+REPLY_SENTENCE = "Click the highlighted button to open the settings panel and review the changes. "
+
+
+@dataclass
+class FaultProfile:
+    """Latency distribution and failure rates of one fake provider."""
+    median_ms: float
+    sigma: float = 0.4
+    ms_per_1k_chars: float = 0.0
+    rate_429: float = 0.0
+    error_rate: float = 0.0
+    retry_after_s: float = 1.0
+
+    def latency(self, chars: int) -> float:
+        drawn = self.median_ms * math.exp(random.gauss(0.0, self.sigma)) if self.sigma > 0 else self.median_ms
+        return (drawn + self.ms_per_1k_chars * chars / 1000) / 1000
+
+    def fault(self) -> int:
+        """HTTP status of an injected failure, or 0 for none."""
+        roll = random.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.error_rate:
+            return 500
+        return 0
+
+
+def example_from_schema(schema: Dict[str, Any], depth: int = 0) -> Any:
+    """A value that validates against a Gemini (OpenAPI subset) response schema."""
+    kind = schema.get("type", "STRING")
+    kind = SCHEMA_TYPES.get(kind, "STRING") if isinstance(kind, int) else str(kind).upper()
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if kind == "OBJECT":
+        return {name: example_from_schema(sub, depth + 1) for name, sub in (schema.get("properties") or {}).items()}
+    if kind == "ARRAY":
+        return [example_from_schema(schema.get("items") or {}, depth + 1) for _ in range(2 if depth < 3 else 0)]
+    if kind == "INTEGER":
+        return 7
+    if kind == "NUMBER":
+        return 0.5  # inside the 0-1 range of scores and confidences
+    if kind == "BOOLEAN":
+        return True
+    return "Suggested improvement for this part of the demo."
+
+
+def _google_error(status: int, retry_after_s: float) -> Response:
+    names = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL"}
+    headers = {"Retry-After": str(int(math.ceil(retry_after_s)))} if status == 429 else {}
+    return JSONResponse(
+        {"error": {"code": status, "message": f"Injected {status} from fake provider", "status": names[status]}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def gemini_app(profile: FaultProfile, reply_chars: int = 600) -> Starlette:
+    async def generate_content(request: Request) -> Response:
+        body = await request.json()
+        prompt_chars = sum(
+            len(part.get("text", ""))
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        await asyncio.sleep(profile.latency(prompt_chars))
+        status = profile.fault()
+        if status:
+            return _google_error(status, profile.retry_after_s)
+
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        schema = config.get("responseSchema") or config.get("response_schema")
+        if schema:
+            text = json.dumps(example_from_schema(schema))
+        else:
+            text = (REPLY_SENTENCE * (reply_chars // len(REPLY_SENTENCE) + 1))[:reply_chars].strip()
+        return JSONResponse({
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_chars // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": (prompt_chars + len(text)) // 4,
+            },
+        })
+
+    return Starlette(routes=[Route("/v1beta/models/{model}:generateContent", generate_content, methods=["POST"])])
+
+
+def deepgram_app(profile: FaultProfile) -> Starlette:
+    async def speak(request: Request) -> Response:
+        text = (await request.json()).get("text", "")
+        await asyncio.sleep(profile.latency(len(text)))
+        status = profile.fault()
+        if status:
+            headers = {"Retry-After": str(int(math.ceil(profile.retry_after_s)))} if status == 429 else {}
+            return JSONResponse({"err_msg": f"Injected {status}"}, status_code=status, headers=headers)
+        # ~32 kbit/s MP3 at ~15 characters per second of speech
+        return Response(b"\xff\xfb" * (len(text) * 130), media_type="audio/mpeg")
+
+    return Starlette(routes=[Route("/v1/speak", speak, methods=["POST"])])
+
+
+async def serve(gemini: Starlette, gemini_port: int, deepgram: Starlette, deepgram_port: int, host: str) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(gemini, host=host, port=gemini_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(deepgram, host=host, port=deepgram_port, log_level="warning")),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--gemini-port", type=int, default=8091)
+    parser.add_argument("--deepgram-port", type=int, default=8092)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--gemini-ms-per-1k-chars", type=float, default=5)
+    parser.add_argument("--deepgram-latency-ms", type=float, default=400)
+    parser.add_argument("--deepgram-ms-per-1k-chars", type=float, default=200)
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="log-normal sigma (0: fixed latency)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of calls answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered 500")
+    parser.add_argument("--retry-after-s", type=float, default=1.0)
+    parser.add_argument("--reply-chars", type=int, default=600)
+    args = parser.parse_args()
+
+    shared = dict(sigma=args.latency_sigma, rate_429=args.rate_429, error_rate=args.error_rate,
+                  retry_after_s=args.retry_after_s)
+    gemini = gemini_app(FaultProfile(args.gemini_latency_ms, ms_per_1k_chars=args.gemini_ms_per_1k_chars, **shared),
+                        reply_chars=args.reply_chars)
+    deepgram = deepgram_app(FaultProfile(args.deepgram_latency_ms, ms_per_1k_chars=args.deepgram_ms_per_1k_chars,
+                                         **shared))
+    print(f"[Fake Providers] Gemini on http://{args.host}:{args.gemini_port}, "
+          f"Deepgram on http://{args.host}:{args.deepgram_port}/v1/speak", flush=True)
+    asyncio.run(serve(gemini, args.gemini_port, deepgram, args.deepgram_port, args.host))
+
+
+if __name__ == "__main__":
+    main()
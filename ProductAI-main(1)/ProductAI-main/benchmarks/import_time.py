@@ -0,0 +1,93 @@
+"""
+Import-time budget check for app.main (cold start of a new worker).
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter,
+reports the cumulative import time and the heaviest modules, and fails when
+the total exceeds the budget or when a provider SDK that should load lazily
+was imported eagerly.
+
+Usage (from the project root):
+    python -m benchmarks.import_time [--budget-ms 800] [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "800"))
+
+# Modules that must only load on first use, never while importing app.main
+LAZY_MODULES = ("google.generativeai", "requests", "pydub")
+
+_PROBE = (
+    "import sys, app.main; "
+    "print(','.join(m for m in {lazy!r} if m in sys.modules))"
+)
+
+
+def measure_once() -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """Return (total ms for app.main, per-module cumulative ms, eagerly loaded lazy modules)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(lazy=LAZY_MODULES)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, module = line.split("|", 2)
+        try:
+            cumulative[module.strip()] = int(cumulative_us) / 1000.0
+        except ValueError:
+            continue  # header line
+
+    total_ms = cumulative.get("app.main", 0.0)
+    heaviest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+    eager = [m for m in result.stdout.strip().split(",") if m]
+    return total_ms, heaviest, eager
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    heaviest: List[Tuple[str, float]] = []
+    eager: List[str] = []
+    for _ in range(args.runs):
+        total_ms, heaviest, eager = measure_once()
+        totals.append(total_ms)
+
+    median_ms = statistics.median(totals)
+    print(f"[Import Time] app.main: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}), budget {args.budget_ms:.0f} ms")
+    print("[Import Time] Heaviest modules (cumulative, last run):")
+    for module, ms in heaviest[:args.top]:
+        print(f"  {ms:8.1f} ms  {module}")
+
+    failed = False
+    if eager:
+        print(f"[Import Time] ❌ Modules expected to load lazily were imported: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"[Import Time] ❌ Over budget by {median_ms - args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("[Import Time] ✅ Within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
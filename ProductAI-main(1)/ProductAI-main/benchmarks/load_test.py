@@ -0,0 +1,361 @@
+"""
+Load test for the FastAPI app against local fake Gemini and Deepgram servers.
+
+Starts benchmarks.fake_providers and `uvicorn app.main:app --workers N`
+(pointed at the fakes through GEMINI_API_ENDPOINT and DEEPGRAM_SPEAK_URL),
+then drives one scenario at each concurrency level for --duration seconds
+and reports per level:
+1. Throughput (completed requests per second) and status counts
+2. Latency p50 / p90 / p99 / max
+3. Resident memory per worker process (current RSS and peak HWM, from /proc)
+
+Scenarios:
+    full          POST /audio-full-process (script generation + TTS + file write)
+    suggestions   POST /collaboration/ai-suggestions
+    review        POST /collaboration/ai-review
+    translate     POST /collaboration/translate-demo
+    mix           all of the above, round-robin
+
+Every request carries a unique transcript so the artifact cache never turns
+a load test into a cache benchmark (pass --cache to measure that instead).
+Fake-provider options (latency, 429 and error rates) are passed through;
+see `python -m benchmarks.fake_providers --help`.
+
+Usage (from the project root):
+    python -m benchmarks.load_test [--scenario full] [--concurrency 1,4,16,64]
+        [--duration 20] [--workers 2] [--gemini-latency-ms 800] [--rate-429 0.02]
+        [--json results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+EVENTS_FILE = PROJECT_ROOT / "test_events.json"
+
+READY_TIMEOUT_S = 30.0
+REQUEST_TIMEOUT_S = 120.0
+
+TRANSCRIPT_WORDS = (
+    "so first we open the usage page then switch to the rate limit tab "
+    "and here you can see the requests per minute for each model"
+).split()
+
+
+# ----------------------------------------------------------------------
+# Request payloads
+# ----------------------------------------------------------------------
+def _transcript(unique: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Transcript text plus Deepgram-style word timings; `unique` defeats caching."""
+    words = TRANSCRIPT_WORDS + [unique]
+    timings = []
+    t = 0.0
+    for word in words:
+        timings.append({"word": word, "start": round(t, 2), "end": round(t + 0.3, 2), "confidence": 0.95})
+        t += 0.45 if word != "then" else 1.8  # one long pause for the timing analysis
+    return " ".join(words), timings
+
+
+class PayloadFactory:
+    """Builds one request (path, JSON body) per call for a scenario."""
+
+    def __init__(self, scenario: str, recordings_path: str, cache: bool):
+        with open(EVENTS_FILE, encoding="utf-8") as f:
+            self.session = json.load(f)
+        self.recordings_path = recordings_path
+        self.cache = cache
+        builders = {
+            "full": self.full,
+            "suggestions": self.suggestions,
+            "review": self.review,
+            "translate": self.translate,
+        }
+        self._next: Callable[[], Tuple[str, Dict[str, Any]]] = (
+            itertools.cycle(builders.values()).__next__ if scenario == "mix" else lambda: builders[scenario]
+        )
+        self._counter = itertools.count()
+
+    def __call__(self) -> Tuple[str, Dict[str, Any]]:
+        return self._next()()
+
+    def _unique(self) -> str:
+        return "demo" if self.cache else f"demo{next(self._counter)}x{uuid.uuid4().hex[:8]}"
+
+    def full(self) -> Tuple[str, Dict[str, Any]]:
+        text, words = _transcript(self._unique())
+        return "/audio-full-process", {
+            "text": text,
+            "deepgramData": {"words": words},
+            "session": self.session,
+            "recordingsPath": self.recordings_path,
+            "metadata": {"sessionId": "loadtest"},
+        }
+
+    def suggestions(self) -> Tuple[str, Dict[str, Any]]:
+        text, _ = _transcript(self._unique())
+        return "/collaboration/ai-suggestions", {
+            "demoId": "loadtest",
+            "transcript": text,
+            "pauseDurations": [0.2, 1.8, 0.1, 0.4],
+            "replayFrequency": [0, 3, 1, 0],
+            "binSeconds": 5,
+        }
+
+    def review(self) -> Tuple[str, Dict[str, Any]]:
+        unique = self._unique()
+        comments = [
+            {"comment": f"The intro is too long {unique}", "status": "open", "timestamp": 2.0},
+            {"comment": "Intro is too long, trim it", "status": "open", "timestamp": 2.5},
+            {"comment": "Great walkthrough of the rate limit tab", "status": "resolved", "timestamp": 12.0},
+        ]
+        languages = [{"language": "es", "translationQuality": 0.9}, {"language": "fr", "translationQuality": 0.8}]
+        return "/collaboration/ai-review", {"demoId": "loadtest", "comments": comments, "languages": languages}
+
+    def translate(self) -> Tuple[str, Dict[str, Any]]:
+        text, _ = _transcript(self._unique())
+        return "/collaboration/translate-demo", {"demoId": "loadtest", "targetLanguage": "es", "originalTranscript": text}
+
+
+# ----------------------------------------------------------------------
+# Processes
+# ----------------------------------------------------------------------
+def _start(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **(env or {})},
+        start_new_session=True,
+    )
+
+
+def _stop(process: subprocess.Popen) -> None:
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        process.kill()
+
+
+def _children(pid: int) -> List[int]:
+    """Child processes of `pid`, except multiprocessing's resource tracker."""
+    children = []
+    for task in Path(f"/proc/{pid}/task").glob("*/children"):
+        children += [int(child) for child in task.read_text().split()]
+    return [child for child in children if b"resource_tracker" not in Path(f"/proc/{child}/cmdline").read_bytes()]
+
+
+def _memory_kb(pid: int) -> Tuple[int, int]:
+    """(VmRSS, VmHWM) of a process in kB."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            fields[key] = int(value.split()[0])
+    return fields.get("VmRSS", 0), fields.get("VmHWM", 0)
+
+
+def worker_memory(master_pid: int) -> Dict[int, Tuple[int, int]]:
+    """Memory of each uvicorn worker; a single-process server is its own worker."""
+    try:
+        pids = _children(master_pid) or [master_pid]
+        return {pid: _memory_kb(pid) for pid in pids}
+    except (FileNotFoundError, ProcessLookupError):
+        return {}  # not Linux, or the process exited
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = READY_TIMEOUT_S) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"App exited during startup with code {process.returncode}")
+            try:
+                if (await client.get("/collaboration/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"App not ready at {base_url} after {timeout:.0f}s")
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+@dataclass
+class LevelResult:
+    concurrency: int
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    memory_kb: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "requests": len(self.latencies),
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(self.throughput, 3),
+            "latency_s": {
+                "mean": round(statistics.fmean(self.latencies), 4) if self.latencies else 0.0,
+                "p50": round(self.percentile(0.50), 4),
+                "p90": round(self.percentile(0.90), 4),
+                "p99": round(self.percentile(0.99), 4),
+                "max": round(max(self.latencies, default=0.0), 4),
+            },
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "worker_memory_kb": {str(pid): {"rss": rss, "hwm": hwm} for pid, (rss, hwm) in self.memory_kb.items()},
+        }
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    next_request: PayloadFactory,
+    concurrency: int,
+    duration: float,
+    master_pid: int,
+) -> LevelResult:
+    """Keep `concurrency` requests in flight for `duration` seconds (closed loop)."""
+    result = LevelResult(concurrency)
+    stop_at = time.monotonic() + duration
+
+    async def user() -> None:
+        while time.monotonic() < stop_at:
+            path, body = next_request()
+            started = time.perf_counter()
+            try:
+                status: Any = (await client.post(path, json=body)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    result.memory_kb = worker_memory(master_pid)
+    return result
+
+
+def print_level(result: LevelResult) -> None:
+    summary = result.to_dict()
+    latency = summary["latency_s"]
+    statuses = ", ".join(f"{status}: {count}" for status, count in summary["statuses"].items())
+    print(f"[Load Test] c={result.concurrency:<4} {summary['requests']:>6} req  "
+          f"{result.throughput:8.2f} req/s  p50 {latency['p50']:.3f}s  p90 {latency['p90']:.3f}s  "
+          f"p99 {latency['p99']:.3f}s  max {latency['max']:.3f}s  [{statuses}]")
+    for pid, (rss, hwm) in sorted(result.memory_kb.items()):
+        print(f"              worker {pid}: RSS {rss / 1024:7.1f} MB  peak {hwm / 1024:7.1f} MB")
+
+
+def fake_provider_args(args: argparse.Namespace) -> List[str]:
+    return [
+        "-m", "benchmarks.fake_providers",
+        "--gemini-port", str(args.gemini_port),
+        "--deepgram-port", str(args.deepgram_port),
+        "--gemini-latency-ms", str(args.gemini_latency_ms),
+        "--deepgram-latency-ms", str(args.deepgram_latency_ms),
+        "--latency-sigma", str(args.latency_sigma),
+        "--rate-429", str(args.rate_429),
+        "--error-rate", str(args.error_rate),
+    ]
+
+
+async def run(args: argparse.Namespace) -> List[LevelResult]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    app_env = {
+        "GEMINI_API_KEY": "fake",
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{args.gemini_port}",
+        "DEEPGRAM_API_KEY": "fake",
+        "DEEPGRAM_SPEAK_URL": f"http://127.0.0.1:{args.deepgram_port}/v1/speak",
+        "PRODUCTAI_LOG_LEVEL": "WARNING",
+    }
+    if not args.cache:
+        app_env["PRODUCTAI_CACHE_BACKEND"] = "off"
+
+    fakes = _start(fake_provider_args(args))
+    app = _start(
+        ["-m", "uvicorn", "app.main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning", "--no-access-log"],
+        app_env,
+    )
+    results = []
+    try:
+        await wait_ready(base_url, app)
+        print(f"[Load Test] {args.scenario} against {base_url} ({args.workers} workers), "
+              f"{args.duration:.0f}s per level")
+        with tempfile.TemporaryDirectory(prefix="productai_loadtest_") as recordings:
+            next_request = PayloadFactory(args.scenario, recordings, args.cache)
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+                for concurrency in args.concurrency:
+                    result = await run_level(client, next_request, concurrency, args.duration, app.pid)
+                    print_level(result)
+                    results.append(result)
+    finally:
+        _stop(app)
+        _stop(fakes)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("full", "suggestions", "review", "translate", "mix"), default="full")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16, 64],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--gemini-port", type=int, default=8091)
+    parser.add_argument("--deepgram-port", type=int, default=8092)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--deepgram-latency-ms", type=float, default=400)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the artifact cache on and repeat one transcript")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+    except RuntimeError as e:
+        print(f"[Load Test] ❌ {e}")
+        return 1
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"scenario": args.scenario, "workers": args.workers,
+                       "levels": [result.to_dict() for result in results]}, f, indent=2)
+        print(f"[Load Test] Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
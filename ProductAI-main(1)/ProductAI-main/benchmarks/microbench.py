@@ -0,0 +1,211 @@
+"""
+Microbenchmarks for the pure-Python stages of the pipeline, with stored
+baselines and a regression threshold.
+
+Each case runs on synthetic sessions (benchmarks/synthetic_sessions.py) of
+every size in --sizes events, with the matching Deepgram word list for
+analyze_word_timings:
+    session_parse        RecordingSession.model_validate on the session dict
+    session_parse_json   RecordingSession.model_validate_json on the raw body
+    process_dom_events   instruction generation
+    rag_context          build_rag_context_from_events
+    group_steps          group_events_by_step
+    word_timings         analyze_word_timings (~2.6 words per event)
+
+The best of --repeat runs (garbage collector off while timing, as in
+timeit) is compared with benchmarks/baselines/microbench.json;
+a case fails when it is more than --threshold slower (default 25%) and at
+least MIN_REGRESSION_MS slower in absolute terms. The scaling exponent
+between the smallest and largest size (1.0 = linear) is reported per case.
+
+Baselines are machine-specific: record them with --update-baseline on the
+machine that runs the comparison.
+
+Usage (from the project root):
+    python -m benchmarks.microbench [--sizes 1000,10000,100000] [--repeat 5]
+        [--cases process_dom_events,rag_context] [--threshold 0.25] [--update-baseline]
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.synthetic_sessions import generate_session, generate_words
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_FILE = PROJECT_ROOT / "benchmarks" / "baselines" / "microbench.json"
+
+DEFAULT_THRESHOLD = float(os.getenv("MICROBENCH_THRESHOLD", "0.25"))
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.5
+
+CASES = ("session_parse", "session_parse_json", "process_dom_events", "rag_context", "group_steps", "word_timings")
+
+
+def prepare(size: int) -> Dict[str, Any]:
+    """Inputs for every case at one session size (not timed)."""
+    from app.models.dom_event_models import RecordingSession
+
+    raw = generate_session(size)
+    session = RecordingSession.model_validate(raw)
+    return {
+        "raw": raw,
+        "body": json.dumps(raw).encode("utf-8"),
+        "session": session,
+        "words": generate_words((raw["endTime"] - raw["startTime"]) / 1000),
+    }
+
+
+def case_functions(inputs: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    from app.models.dom_event_models import RecordingSession
+    from app.services.dom_event_service import group_events_by_step, process_dom_events
+    from app.services.rag_service import build_rag_context_from_events
+    from app.services.script_generation_service import analyze_word_timings
+
+    session = inputs["session"]
+    return {
+        "session_parse": lambda: RecordingSession.model_validate(inputs["raw"]),
+        "session_parse_json": lambda: RecordingSession.model_validate_json(inputs["body"]),
+        "process_dom_events": lambda: process_dom_events(session),
+        "rag_context": lambda: build_rag_context_from_events(session),
+        "group_steps": lambda: group_events_by_step(session.events),
+        "word_timings": lambda: analyze_word_timings(inputs["words"]),
+    }
+
+
+def time_case(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    """(best, median) wall time in seconds over `repeat` runs, with GC off as in timeit."""
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return min(runs), statistics.median(runs)
+
+
+def run_suite(sizes: List[int], cases: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {case: {} for case in cases}
+    for size in sizes:
+        inputs = prepare(size)
+        functions = case_functions(inputs)
+        for case in cases:
+            best, median = time_case(functions[case], repeat)
+            results[case][str(size)] = best
+            print(f"  {case:<20} {size:>8} events  best {best * 1000:10.2f} ms  "
+                  f"median {median * 1000:10.2f} ms  {best / size * 1e6:8.2f} us/event")
+        del inputs, functions
+    return results
+
+
+def scaling_exponent(timings: Dict[str, float]) -> float:
+    """Slope of log(time) over log(size) between the smallest and largest size."""
+    sizes = sorted(int(size) for size in timings)
+    if len(sizes) < 2 or timings[str(sizes[0])] <= 0:
+        return float("nan")
+    small, large = sizes[0], sizes[-1]
+    return math.log(timings[str(large)] / timings[str(small)]) / math.log(large / small)
+
+
+def load_baseline() -> Dict[str, Any]:
+    if not BASELINE_FILE.exists():
+        return {}
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Dict[str, float]]) -> None:
+    baseline = load_baseline()
+    stored = baseline.get("results", {})
+    for case, timings in results.items():
+        stored.setdefault(case, {}).update({size: round(seconds, 6) for size, seconds in timings.items()})
+    BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "recorded": time.strftime("%Y-%m-%d"),
+            "results": stored,
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regression messages for results slower than the baseline by more than `threshold`."""
+    regressions = []
+    stored = baseline.get("results", {})
+    for case, timings in results.items():
+        for size, seconds in timings.items():
+            reference = stored.get(case, {}).get(size)
+            if reference is None:
+                print(f"  {case:<20} {size:>8} events  no baseline")
+                continue
+            change = seconds / reference - 1 if reference else 0.0
+            marker = ""
+            if change > threshold and (seconds - reference) * 1000 >= MIN_REGRESSION_MS:
+                marker = "  ❌ regression"
+                regressions.append(f"{case} @ {size} events: {reference * 1000:.2f} -> {seconds * 1000:.2f} ms "
+                                   f"({change:+.0%})")
+            print(f"  {case:<20} {size:>8} events  {reference * 1000:10.2f} -> {seconds * 1000:10.2f} ms  "
+                  f"{change:+7.1%}{marker}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=DEFAULT_SIZES)
+    parser.add_argument("--cases", type=lambda s: s.split(","), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+
+    unknown = [case for case in args.cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    print(f"[Microbench] {len(args.cases)} cases at {args.sizes} events, best of {args.repeat}")
+    results = run_suite(args.sizes, args.cases, args.repeat)
+
+    if len(args.sizes) > 1:
+        print("[Microbench] Scaling exponent (1.0 = linear in events):")
+        for case, timings in results.items():
+            print(f"  {case:<20} {scaling_exponent(timings):5.2f}")
+
+    if args.update_baseline:
+        save_baseline(results)
+        print(f"[Microbench] Baseline written to {BASELINE_FILE.relative_to(PROJECT_ROOT)}")
+        return 0
+
+    baseline = load_baseline()
+    if not baseline:
+        print(f"[Microbench] No baseline at {BASELINE_FILE.relative_to(PROJECT_ROOT)}; run with --update-baseline")
+        return 0
+
+    print(f"[Microbench] Against baseline ({baseline.get('machine')}, Python {baseline.get('python')}, "
+          f"{baseline.get('recorded')}), threshold {args.threshold:.0%}:")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"[Microbench] ❌ {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("[Microbench] ✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Synthetic recording sessions and Deepgram word lists for benchmarks.
+
+Sessions grow from the test_events.json seed: event targets, URLs and
+viewport come from the seed, and the event mix covers every type the
+pipeline handles (the seed itself only has clicks and scrolls):
+    click 30%, scroll 25%, focus 12%, type 15%, blur 12%, step_change 6%
+Gaps between events are log-normal (median ~700 ms) so that roughly one gap
+in ten exceeds the 2 s step threshold, as in real recordings.
+
+Word lists match the session's duration at ~2.5 words per second, with
+pauses, low-confidence words, fillers and repeated words at fixed rates, so
+analyze_word_timings exercises every branch.
+
+Generation is deterministic for a given size and seed. Events are produced
+lazily; write_session streams them, so 1M-event files can be written without
+holding the session in memory.
+
+Usage (from the project root):
+    python -m benchmarks.synthetic_sessions --events 100000 --out session.json
+        [--words-out words.json] [--seed 0]
+"""
+import argparse
+import copy
+import json
+import math
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SEED_FILE = PROJECT_ROOT / "test_events.json"
+
+EVENT_MIX: Tuple[Tuple[str, float], ...] = (
+    ("click", 0.30),
+    ("scroll", 0.25),
+    ("focus", 0.12),
+    ("type", 0.15),
+    ("blur", 0.12),
+    ("step_change", 0.06),
+)
+GAP_MEDIAN_MS = 700
+GAP_SIGMA = 0.9
+
+WORDS_PER_SECOND = 2.5
+PAUSE_RATE = 0.05         # share of words followed by a 0.8-3 s pause
+LOW_CONFIDENCE_RATE = 0.04
+FILLER_RATE = 0.03
+REPEAT_RATE = 0.01
+
+VOCABULARY = (
+    "so first we open the usage page then switch to the rate limit tab and here you can "
+    "see the requests per minute for each model now click on billing to check the plan "
+    "details before saving the new settings for the project"
+).split()
+FILLERS = ("um", "uh", "like", "so", "well", "actually", "basically")
+TYPED_VALUES = ("hello@example.com", "Quarterly report", "gen-lang-client", "42", "rate limit increase request")
+INPUT_TYPES = ("text", "email", "search", "number")
+
+
+def load_seed() -> Dict[str, Any]:
+    with open(SEED_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SessionGenerator:
+    """Deterministic synthetic session of `n_events` events grown from the seed."""
+
+    def __init__(self, n_events: int, seed: int = 0, seed_session: Dict[str, Any] = None):
+        self.n_events = n_events
+        self.seed = seed
+        self.seed_session = seed_session or load_seed()
+        seed_events = self.seed_session["events"]
+        self._targets = [e["target"] for e in seed_events if e.get("target")]
+        self._urls = sorted({e["metadata"]["url"] for e in seed_events}) or [self.seed_session["url"]]
+        self._viewport = self.seed_session["viewport"]
+        self._types = [name for name, _ in EVENT_MIX]
+        self._weights = [weight for _, weight in EVENT_MIX]
+
+    def header(self) -> Dict[str, Any]:
+        """Session fields other than events (endTime follows the generated events)."""
+        start = self.seed_session["startTime"]
+        return {
+            "sessionId": f"synthetic_{self.n_events}_{self.seed}",
+            "startTime": start,
+            "endTime": start + self.duration_ms(),
+            "url": self.seed_session["url"],
+            "viewport": self._viewport,
+        }
+
+    def duration_ms(self) -> int:
+        last = 0
+        for last in self._timestamps():
+            pass
+        return last + 1000
+
+    def _timestamps(self) -> Iterator[int]:
+        # Own random stream, so the duration is known without generating events
+        rng = random.Random(self.seed)
+        timestamp = self.seed_session["events"][0]["timestamp"] if self.seed_session["events"] else 1000
+        for _ in range(self.n_events):
+            yield timestamp
+            timestamp += max(1, int(GAP_MEDIAN_MS * math.exp(rng.gauss(0.0, GAP_SIGMA))))
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        rng = random.Random(self.seed + 1)
+        url_index = 0
+        for timestamp in self._timestamps():
+            kind = rng.choices(self._types, self._weights)[0]
+            if kind == "step_change":
+                url_index = (url_index + 1) % len(self._urls)
+            event: Dict[str, Any] = {
+                "timestamp": timestamp,
+                "type": kind,
+                "metadata": {"url": self._urls[url_index], "viewport": self._viewport},
+            }
+            if kind == "scroll":
+                moved = rng.random() < 0.8
+                event["metadata"]["scrollPosition"] = {"x": 0, "y": rng.randint(1, 4000) if moved else 0}
+            elif kind != "step_change":
+                target = copy.deepcopy(rng.choice(self._targets))
+                if kind in ("focus", "type", "blur"):
+                    target.update(tag="INPUT", type=rng.choice(INPUT_TYPES), name=f"field{rng.randint(1, 20)}")
+                    if rng.random() < 0.5:
+                        target.setdefault("attributes", {})["data-testid"] = f"{target['name']}-input"
+                if kind == "type":
+                    event["value"] = rng.choice(TYPED_VALUES) * rng.randint(1, 3)
+                event["target"] = target
+            yield event
+
+    def session(self) -> Dict[str, Any]:
+        """The whole session as one dict (RecordingSession JSON shape)."""
+        return {**self.header(), "events": list(self.events())}
+
+
+def generate_session(n_events: int, seed: int = 0) -> Dict[str, Any]:
+    return SessionGenerator(n_events, seed).session()
+
+
+def generate_words(duration_s: float, seed: int = 0) -> List[Dict[str, Any]]:
+    """Deepgram-style word timings covering `duration_s` seconds of speech."""
+    rng = random.Random(seed + 2)
+    words = []
+    t = 0.0
+    previous = None
+    for _ in range(int(duration_s * WORDS_PER_SECOND)):
+        roll = rng.random()
+        if previous and roll < REPEAT_RATE:
+            word = previous
+        elif roll < REPEAT_RATE + FILLER_RATE:
+            word = rng.choice(FILLERS)
+        else:
+            word = rng.choice(VOCABULARY)
+        length = 0.12 + 0.05 * len(word)
+        confidence = rng.uniform(0.4, 0.79) if rng.random() < LOW_CONFIDENCE_RATE else rng.uniform(0.85, 1.0)
+        words.append({
+            "word": word,
+            "start": round(t, 3),
+            "end": round(t + length, 3),
+            "confidence": round(confidence, 3),
+            "punctuated_word": word.capitalize() if not words else word,
+        })
+        t += length + (rng.uniform(0.8, 3.0) if rng.random() < PAUSE_RATE else rng.uniform(0.02, 0.2))
+        previous = word
+    return words
+
+
+def write_session(path: str, n_events: int, seed: int = 0) -> Dict[str, Any]:
+    """Stream a session to a JSON file; returns its header."""
+    generator = SessionGenerator(n_events, seed)
+    header = generator.header()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header)[:-1] + ', "events": [')
+        for i, event in enumerate(generator.events()):
+            f.write((", " if i else "") + json.dumps(event))
+        f.write("]}")
+    return header
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="session JSON file")
+    parser.add_argument("--words-out", help="also write matching Deepgram words to this file")
+    args = parser.parse_args()
+
+    header = write_session(args.out, args.events, args.seed)
+    duration_s = (header["endTime"] - header["startTime"]) / 1000
+    print(f"[Synthetic] {args.events} events over {duration_s:.0f}s -> {args.out}")
+    if args.words_out:
+        words = generate_words(duration_s, args.seed)
+        with open(args.words_out, "w", encoding="utf-8") as f:
+            json.dump({"words": words}, f)
+        print(f"[Synthetic] {len(words)} words -> {args.words_out}")
+
+
+if __name__ == "__main__":
+    main()
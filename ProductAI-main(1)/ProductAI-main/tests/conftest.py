@@ -0,0 +1,14 @@
+"""
+Settings for the test run, applied before any app module reads them:
+in-process caches, a throwaway session directory and quiet logs.
+
+Run from the project root:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import tempfile
+
+os.environ.setdefault("PRODUCTAI_CACHE_BACKEND", "memory")
+os.environ.setdefault("PRODUCTAI_SESSION_DIR", tempfile.mkdtemp(prefix="productai_sessions_"))
+os.environ.setdefault("PRODUCTAI_LOG_LEVEL", "WARNING")
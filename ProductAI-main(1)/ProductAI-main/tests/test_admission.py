@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.middleware import admission
+from app.middleware.admission import AdmissionController, AdmissionMiddleware
+
+
+@pytest.fixture
+def load(monkeypatch):
+    """Provider backlog and pipeline backpressure the controller sees."""
+    state = {"queued": 0, "slots": 10, "stage": None, "drain": 0.0}
+    monkeypatch.setattr(admission, "provider_backlog", lambda: (state["queued"], state["slots"]))
+    monkeypatch.setattr(admission, "pipeline_backpressure", lambda route: (state["stage"], state["drain"]))
+    return state
+
+
+def make_controller():
+    controller = AdmissionController(max_in_flight=4, bulk_share=0.5, max_queue_depth=20)
+    controller.record_latency("/route", 2.0)
+    return controller
+
+
+def test_admits_when_idle(load):
+    assert make_controller().decide("/route", "standard", None) == (None, 0.0)
+
+
+def test_bulk_only_gets_its_share_of_the_in_flight_limit(load):
+    controller = make_controller()
+    controller.in_flight = 2
+    assert controller.decide("/route", "bulk", None) == ("rejected_in_flight", 2.0)
+    assert controller.decide("/route", "interactive", None)[0] is None
+    controller.in_flight = 4
+    assert controller.decide("/route", "interactive", None) == ("rejected_in_flight", 2.0)
+
+
+def test_provider_queue_depth_sheds_with_a_scaled_retry_after(load):
+    load["queued"] = 20
+    # Latency 2 s x 20 queued calls over 10 slots
+    assert make_controller().decide("/route", "standard", None) == ("rejected_queue", 4.0)
+
+
+def test_pipeline_backpressure_uses_the_drain_estimate(load):
+    load["stage"], load["drain"] = "preprocess", 7.5
+    assert make_controller().decide("/route", "standard", None) == ("rejected_pipeline", 7.5)
+    load["drain"] = 0.2
+    assert make_controller().decide("/route", "standard", None) == ("rejected_pipeline", 1.0)
+
+
+def test_deadline_must_fit_the_backlog_stretched_latency(load):
+    controller = make_controller()
+    assert controller.decide("/route", "standard", 3.0)[0] is None
+    load["queued"] = 10  # expected latency doubles to 4 s
+    assert controller.expected_latency("/route") == 4.0
+    reason, retry_after = controller.decide("/route", "standard", 3.0)
+    assert reason == "rejected_deadline"
+    assert retry_after == 2.0
+    assert controller.decide("/route", "standard", 0.0)[0] == "rejected_deadline"
+
+
+def test_unobserved_route_is_only_shed_for_an_expired_deadline(load):
+    controller = AdmissionController(max_in_flight=4)
+    assert controller.decide("/new", "standard", 0.5) == (None, 0.0)
+    assert controller.decide("/new", "standard", -1.0) == ("rejected_deadline", 1.0)
+
+
+def test_shed_response_carries_a_rounded_retry_after(load, monkeypatch):
+    controller = make_controller()
+    monkeypatch.setattr(admission, "_controller", controller)
+    load["stage"], load["drain"] = "preprocess", 7.4
+    messages = []
+
+    async def app(scope, receive, send):
+        raise AssertionError("shed requests must not reach the app")
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/route/x", "headers": []}
+    asyncio.run(AdmissionMiddleware(app, paths=("/route",))(scope, None, send))
+    assert messages[0]["status"] == 503
+    assert (b"retry-after", b"7") in messages[0]["headers"]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.services.artifact_cache import ARTIFACT_INVALIDATIONS, ArtifactCache
+from app.services.cache_backend import Cache, MemoryCacheBackend
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    shared = Cache("artifacts", MemoryCacheBackend(10_000_000))
+    monkeypatch.setattr(ArtifactCache, "_shared", property(lambda self: shared))
+    return ArtifactCache(lru_size=2)
+
+
+def counting(value):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return value
+
+    return compute, calls
+
+
+def test_computes_once_per_content_hash(cache):
+    compute, calls = counting({"words": [1, 2, 3]})
+
+    async def main():
+        first = await cache.get_or_compute_async("ctx", 1, "ref", compute)
+        second = await cache.get_or_compute_async("ctx", 1, "ref", compute)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second == {"words": [1, 2, 3]}
+    assert len(calls) == 1
+
+
+def test_shared_cache_serves_after_lru_eviction(cache):
+    compute, calls = counting("value")
+
+    async def main():
+        await cache.get_or_compute_async("ctx", 1, "a", compute)
+        for ref in ("b", "c"):  # lru_size=2 pushes "a" out of memory
+            await cache.get_or_compute_async("ctx", 1, ref, counting(ref)[0])
+        return await cache.get_or_compute_async("ctx", 1, "a", compute)
+
+    assert asyncio.run(main()) == "value"
+    assert len(calls) == 1
+
+
+def test_new_version_recomputes_and_invalidates_old_entry(cache):
+    before = ARTIFACT_INVALIDATIONS.value(artifact="ctx", reason="version")
+    old, old_calls = counting("v1")
+    new, new_calls = counting("v2")
+
+    async def main():
+        await cache.get_or_compute_async("ctx", 1, "ref", old)
+        return await cache.get_or_compute_async("ctx", 2, "ref", new)
+
+    assert asyncio.run(main()) == "v2"
+    assert len(old_calls) == len(new_calls) == 1
+    assert ARTIFACT_INVALIDATIONS.value(artifact="ctx", reason="version") == before + 1
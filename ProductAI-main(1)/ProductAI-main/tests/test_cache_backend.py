@@ -0,0 +1,163 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services import cache_backend
+from app.services.cache_backend import Cache, MemoryCacheBackend, SQLiteCacheBackend, cache_key
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=1000, evict_every=5)
+
+
+def test_cache_key_is_stable_and_separates_parts():
+    assert cache_key("a", {"x": 1, "y": 2}) == cache_key("a", {"y": 2, "x": 1})
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+def test_sqlite_round_trip_and_ttl(sqlite_backend):
+    sqlite_backend.set("k", b"value")
+    assert sqlite_backend.get("k") == b"value"
+
+    sqlite_backend.set("short", b"value", ttl=0.01)
+    time.sleep(0.02)
+    assert sqlite_backend.get("short") is None
+
+
+def test_sqlite_evicts_least_recently_used(sqlite_backend):
+    for i in range(4):
+        sqlite_backend.set(f"k{i}", b"x" * 300)
+        time.sleep(0.01)
+    sqlite_backend.evict()
+    # 1200 bytes against a 1000 byte limit: the oldest entries go until under 90%
+    assert sqlite_backend.get("k0") is None
+    assert sqlite_backend.get("k3") == b"x" * 300
+
+
+def test_sqlite_eviction_runs_in_background_thread(sqlite_backend, monkeypatch):
+    evicted_on = []
+    done = threading.Event()
+
+    def evict():
+        evicted_on.append(threading.get_ident())
+        done.set()
+
+    monkeypatch.setattr(sqlite_backend, "evict", evict)
+    for i in range(5):
+        sqlite_backend.set(f"k{i}", b"x")
+    assert done.wait(2)
+    assert evicted_on[0] != threading.get_ident()
+
+
+def test_async_methods_use_a_thread_for_sqlite(sqlite_backend, monkeypatch):
+    cache = Cache("test", sqlite_backend)
+    called_on = []
+    original_get = sqlite_backend.get
+
+    def get(key):
+        called_on.append(threading.get_ident())
+        return original_get(key)
+
+    monkeypatch.setattr(sqlite_backend, "get", get)
+
+    async def main():
+        await cache.set_json_async("k", {"a": 1})
+        return await cache.get_json_async("k")
+
+    assert asyncio.run(main()) == {"a": 1}
+    assert called_on and called_on[0] != threading.get_ident()
+
+
+def test_async_methods_run_inline_for_memory_backend():
+    cache = Cache("test", MemoryCacheBackend(1000))
+
+    async def main():
+        await cache.set_bytes_async("k", b"v")
+        return await cache.get_bytes_async("k")
+
+    assert asyncio.run(main()) == b"v"
+
+
+def test_memory_backend_evicts_by_size():
+    backend = MemoryCacheBackend(10)
+    backend.set("a", b"12345")
+    backend.set("b", b"12345")
+    backend.set("c", b"1")
+    assert backend.get("a") is None
+    assert backend.get("b") == b"12345"
+
+
+def test_backend_errors_are_logged_not_raised():
+    class Broken:
+        blocking = False
+
+        def get(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+        set = delete = get
+
+    cache = Cache("test", Broken())
+    assert cache.get_bytes("k") is None
+    cache.set_bytes("k", b"v")
+    cache.delete("k")
+
+
+def test_disabled_cache_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(cache_backend, "CACHE_BACKEND", "off")
+    monkeypatch.setattr(cache_backend, "_backend", None)
+    cache = Cache("test")
+    cache.set_json("k", 1)
+    assert cache.get_json("k") is None
+    cache.delete("k")
+
+
+def test_shared_backend_is_opened_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_backend, "CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(cache_backend, "CACHE_PATH", str(tmp_path / "shared.sqlite3"))
+    monkeypatch.setattr(cache_backend, "_backend", None)
+    monkeypatch.setattr(cache_backend, "_caches", {})
+    opened_on = []
+    original_init = SQLiteCacheBackend.__init__
+
+    def init(self, *args, **kwargs):
+        opened_on.append(threading.get_ident())
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLiteCacheBackend, "__init__", init)
+
+    async def main():
+        cache = cache_backend.get_cache("test")
+        assert not opened_on  # creating the view does no I/O
+        await cache.set_json_async("k", [1])
+        return await cache.get_json_async("k")
+
+    assert asyncio.run(main()) == [1]
+    assert len(opened_on) == 1 and opened_on[0] != threading.get_ident()
+
+
+def test_concurrent_writes_are_all_counted(sqlite_backend, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "_request_eviction", lambda: None)
+
+    def write(n):
+        for i in range(50):
+            sqlite_backend.set(f"{n}-{i}", b"x")
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sqlite_backend._writes == 200
+
+
+def test_hit_ratio_comes_from_the_request_counter():
+    cache = Cache("ratio-test", MemoryCacheBackend(1000))
+    cache.set_bytes("k", b"v")
+    cache.get_bytes("k")
+    cache.get_bytes("missing")
+    cache_backend._update_hit_ratios()
+    assert cache_backend.CACHE_HIT_RATIO.value(cache="ratio-test") == 0.5
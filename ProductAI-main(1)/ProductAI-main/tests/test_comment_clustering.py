@@ -0,0 +1,102 @@
+import pytest
+
+from app.services import comment_clustering
+from app.services.comment_clustering import (
+    TIMESTAMP_BUCKET_S,
+    cluster_comments,
+    estimated_similarity,
+    minhash_signature,
+    summarize_comments,
+)
+
+
+def comment(text, status="open", timestamp=None, **extra):
+    return {"comment": text, "status": status, "timestamp": timestamp, **extra}
+
+
+def test_near_duplicates_merge_and_unrelated_comments_do_not():
+    clusters = cluster_comments([
+        comment("The intro is way too long, please trim it"),
+        comment("the intro is way too long please trim it down"),
+        comment("Audio is out of sync with the video at the end"),
+    ])
+    assert sorted(cluster.count for cluster in clusters) == [1, 2]
+
+
+def test_similar_to_any_member_joins_the_cluster(monkeypatch):
+    # B ~ A (0.625), C ~ B (0.5), C !~ A (0.125); D shares C's later bands but resembles nobody.
+    # Every bucket C shares with B was opened by A or D, so comparing only to a
+    # bucket's first member would leave C out
+    signatures = {
+        "a": [0] * 64,
+        "d": [3] * 40 + [1] * 24,
+        "b": [0] * 40 + [1] * 24,
+        "c": [0] * 8 + [2] * 32 + [1] * 24,
+    }
+    monkeypatch.setattr(comment_clustering, "minhash_signature", lambda text: signatures[text])
+    assert estimated_similarity(signatures["c"], signatures["b"]) == 0.5
+    clusters = cluster_comments([comment(text) for text in "adbc"])
+    assert sorted(cluster.count for cluster in clusters) == [1, 3]
+
+
+def test_empty_and_very_short_comments():
+    assert minhash_signature("") is None
+    assert minhash_signature("!!") is None
+    clusters = cluster_comments([comment(""), comment(None), comment("?"), comment("ok"), comment("Ok")])
+    assert sorted(cluster.count for cluster in clusters) == [2, 3]
+    assert cluster_comments([]) == []
+
+
+def test_open_comments_weigh_more_in_the_ranking():
+    clusters = cluster_comments([
+        comment("fix the typo in the title", status="resolved"),
+        comment("fix the typo in the title", status="resolved"),
+        comment("fix the typo in the title", status="resolved"),
+        comment("add captions for the demo", status="open"),
+        comment("add captions for the demo", status="open"),
+    ])
+    # 2 + 2 open beats 3 resolved
+    assert clusters[0].representative["comment"] == "add captions for the demo"
+    assert (clusters[1].count, clusters[1].resolved_count, clusters[1].open_count) == (3, 3, 0)
+
+
+def test_representative_is_the_most_central_open_member():
+    clusters = cluster_comments([
+        comment("the voiceover is too fast in the middle section", status="resolved"),
+        comment("the voiceover is too fast in the middle section", status="open"),
+        comment("voiceover is too fast in the middle section honestly"),
+        comment("the voiceover is too fast in the middle section"),
+    ])
+    assert len(clusters) == 1
+    representative = clusters[0].representative
+    assert representative["comment"] == "the voiceover is too fast in the middle section"
+    assert representative["status"] == "open"
+
+
+def test_timestamp_buckets():
+    clusters = cluster_comments([
+        comment("slow start", timestamp=5),
+        comment("slow start", timestamp=29.9),
+        comment("slow start", timestamp=TIMESTAMP_BUCKET_S),
+        comment("slow start", timestamp=95),
+        comment("slow start", timestamp="n/a"),
+    ])
+    assert clusters[0].timestamp_buckets == {0: 2, 30: 1, 90: 1}
+    assert clusters[0].describe_buckets(limit=2) == "0:00-0:30 (2), 0:30-1:00 (1)"
+
+
+def test_summary_counts_and_separates_ai_suggestions_by_type():
+    summary = summarize_comments([
+        comment("trim the intro"),
+        comment("trim the intro", status="resolved"),
+        comment("Consider trimming", aiGenerated=True, suggestionType="trim"),
+        comment("Consider trimming", aiGenerated=True, suggestionType="pace"),
+    ])
+    assert (summary.total, summary.human, summary.ai, summary.open, summary.resolved) == (4, 2, 2, 3, 1)
+    assert [cluster.count for cluster in summary.human_clusters] == [2]
+    assert len(summary.ai_clusters) == 2
+
+
+@pytest.mark.parametrize("text", ["Intro too long", "a b c d e f g"])
+def test_signatures_are_deterministic(text):
+    assert minhash_signature(text) == minhash_signature(text)
@@ -0,0 +1,97 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware
+
+LIMIT = 64 * 1024
+
+
+def make_client(**kwargs):
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body)}
+
+    @app.get("/collaboration/big")
+    async def big():
+        return {"items": ["x" * 10] * 500}
+
+    app.add_middleware(CompressionMiddleware, max_body_bytes=LIMIT, **kwargs)
+    return TestClient(app)
+
+
+def post(client, body: bytes, encoding: str):
+    return client.post("/echo", content=body, headers={"Content-Encoding": encoding,
+                                                      "Content-Type": "application/octet-stream"})
+
+
+def test_gzip_body_is_inflated():
+    response = post(make_client(), gzip.compress(b"a" * 1000), "gzip")
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+def test_gzip_body_over_limit_is_rejected():
+    response = post(make_client(), gzip.compress(b"\0" * (LIMIT + 1)), "gzip")
+    assert response.status_code == 413
+
+
+def test_body_at_limit_is_accepted():
+    response = post(make_client(), gzip.compress(b"\0" * LIMIT), "gzip")
+    assert response.json() == {"size": LIMIT}
+
+
+def test_corrupt_and_unsupported_bodies():
+    client = make_client()
+    assert post(client, b"not gzip at all", "gzip").status_code == 400
+    assert post(client, b"data", "br").status_code == 415
+
+
+def test_zstd_body_is_inflated():
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(b"b" * 5000)
+    response = post(make_client(), body, "zstd")
+    assert response.json() == {"size": 5000}
+
+
+def test_zstd_bomb_stops_at_the_limit(monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    # ~32 KB on the wire, 1 GB decompressed
+    bomb = zstandard.ZstdCompressor(level=19).compress(b"\0" * (1 << 30))
+    produced = []
+    original_write = compression._ZstdInflater.write
+
+    def write(self, data):
+        produced.append(len(data))
+        return original_write(self, data)
+
+    monkeypatch.setattr(compression._ZstdInflater, "write", write)
+    response = post(make_client(), bomb, "zstd")
+    assert response.status_code == 413
+    assert sum(produced) <= LIMIT + compression.ZSTD_WRITE_SIZE
+
+
+def test_zstd_limit_applies_across_chunks():
+    zstandard = pytest.importorskip("zstandard")
+    inflater = compression._ZstdInflater()
+    frame = zstandard.ZstdCompressor().compress(b"c" * 3000)
+    body = b"".join(inflater.decompress(frame[i:i + 10], 3000) for i in range(0, len(frame), 10))
+    assert body == b"c" * 3000
+    with pytest.raises(compression._BodyTooLarge):
+        compression._ZstdInflater().decompress(frame, 2999)
+
+
+def test_large_responses_are_compressed_when_accepted():
+    client = make_client(paths=("/collaboration",), minimum_size=100)
+    response = client.get("/collaboration/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(response.content)["items"][0] == "x" * 10
+    plain = client.get("/collaboration/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.middleware.deadline import DeadlineMiddleware
+from app.services.deadline import (
+    DEGRADATIONS,
+    DeadlineExceededError,
+    check_deadline,
+    choose_script_tier,
+    deadline_after,
+    parse_deadline_ms,
+    remaining_time,
+    run_within_deadline,
+)
+
+
+def test_parse_deadline_header():
+    assert parse_deadline_ms(b"1500") == 1.5
+    assert parse_deadline_ms(b"0") is None
+    assert parse_deadline_ms(b"-5") is None
+    assert parse_deadline_ms(b"soon") is None
+    assert parse_deadline_ms(None) is None
+
+
+def test_deadline_scope_nests_and_resets():
+    assert remaining_time() is None
+    with deadline_after(10):
+        assert 9 < remaining_time() <= 10
+        with deadline_after(None):
+            assert remaining_time() is None
+    assert remaining_time() is None
+
+
+def test_check_deadline_raises_once_expired():
+    check_deadline("test")
+    before = DEGRADATIONS.value(stage="test", outcome="expired")
+    with deadline_after(-1):
+        with pytest.raises(DeadlineExceededError) as error:
+            check_deadline("test")
+    assert error.value.stage == "test"
+    assert DEGRADATIONS.value(stage="test", outcome="expired") == before + 1
+
+
+def test_run_within_deadline_cancels_slow_work():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        assert await run_within_deadline("fast", asyncio.sleep(0, result="done")) == "done"
+        with deadline_after(0.02):
+            await run_within_deadline("slow", slow())
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(scenario())
+    assert cancelled == [True]
+
+
+def test_expired_deadline_does_not_start_the_work():
+    started = []
+
+    async def work():
+        started.append(True)
+
+    async def scenario():
+        with deadline_after(-1):
+            await run_within_deadline("late", work())
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(scenario())
+    assert not started
+
+
+@pytest.mark.parametrize("budget, cached, tier", [
+    (None, False, "full"),
+    (30, False, "full"),
+    (10, True, "cached"),
+    (10, False, "fast"),
+    (1, False, "local"),
+])
+def test_script_tier_degrades_with_the_budget(budget, cached, tier):
+    assert choose_script_tier(budget, quality_latency=20, fast_latency=5, has_cached_script=cached) == tier
+
+
+def test_middleware_sets_the_deadline_from_the_header():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining_time()
+
+    scope = {"type": "http", "headers": [(b"x-deadline-ms", b"2000")]}
+    asyncio.run(DeadlineMiddleware(app)(scope, None, None))
+    assert 1.5 < seen["remaining"] <= 2
+
+
+def test_deadline_middleware_is_outermost():
+    from app.main import app
+
+    assert app.user_middleware[0].cls is DeadlineMiddleware
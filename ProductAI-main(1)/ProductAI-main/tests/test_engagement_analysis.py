@@ -0,0 +1,96 @@
+import pytest
+
+from app.services.engagement_analysis import (
+    HOTSPOT_Z,
+    MAX_WINDOW_CHARS,
+    SMOOTHING_WINDOW_S,
+    WINDOW_PADDING_S,
+    Hotspot,
+    detect_hotspots,
+    transcript_windows,
+)
+
+
+def of_kind(hotspots, kind):
+    return [h for h in hotspots if h.kind == kind]
+
+
+def test_replay_burst_is_one_run_above_the_threshold():
+    replays = [0.0] * 60
+    replays[20:25] = [5.0] * 5
+    (replay,) = of_kind(detect_hotspots([0.0] * 60, replays), "replay")
+    # Smoothing widens the 20-25s burst by about half a window on each side
+    assert replay.start < 20 < 25 < replay.end <= 25 + SMOOTHING_WINDOW_S
+    assert replay.peak_time == 22
+    assert replay.score > HOTSPOT_Z
+
+
+def test_hotspots_come_back_ordered_by_time():
+    pauses = [0.0] * 60
+    pauses[40:44] = [3.0] * 4
+    replays = [0.0] * 60
+    replays[10:14] = [4.0] * 4
+    hotspots = detect_hotspots(pauses, replays)
+    assert [h.start for h in hotspots] == sorted(h.start for h in hotspots)
+    assert {"pause", "replay"} <= {h.kind for h in hotspots}
+
+
+def test_drop_offs_are_spaced_by_the_smoothing_window():
+    # One step down is steep over several smoothed bins but counts once
+    (step,) = of_kind(detect_hotspots([], [10.0] * 30 + [0.0] * 30), "drop_off")
+    assert 25 <= step.start <= 32
+
+    stairs = of_kind(detect_hotspots([], [10.0] * 20 + [5.0] * 20 + [0.0] * 20), "drop_off")
+    assert len(stairs) == 2
+    assert abs(stairs[0].start - stairs[1].start) >= SMOOTHING_WINDOW_S
+
+
+def test_bins_wider_than_the_smoothing_window_are_not_smoothed():
+    (pause,) = detect_hotspots([0, 0, 0, 9, 0, 0, 0], [1] * 7, bin_seconds=10.0)
+    assert (pause.kind, pause.start, pause.end, pause.peak_time) == ("pause", 30, 40, 30)
+
+
+@pytest.mark.parametrize("pauses, replays", [
+    ([], []),
+    ([1.0, 2.0], [3.0]),
+    ([2.0] * 30, [1.0] * 30),
+])
+def test_flat_short_and_empty_series_have_no_hotspots(pauses, replays):
+    assert detect_hotspots(pauses, replays) == []
+
+
+def test_windows_are_cut_from_word_timings():
+    words = [
+        {"word": "w%d" % second, "punctuated_word": "W%d." % second, "start": second}
+        for second in range(0, 100, 5)
+    ]
+    hotspots = [
+        Hotspot("replay", 28, 32, 30.0, 2.0),
+        Hotspot("pause", 33, 36, 35.0, 1.5),  # peaks inside the first window
+        Hotspot("drop_off", 70, 71, 71.0, 2.5),
+    ]
+    first, second = transcript_windows(hotspots, "ignored", 100.0, words)
+    assert (first.start, first.end, first.kinds) == (20.0, 40.0, ["replay", "pause"])
+    assert first.text == "W20. W25. W30. W35."
+    assert (second.start, second.end) == (71.0 - WINDOW_PADDING_S, 71.0 + WINDOW_PADDING_S)
+    assert second.text == "W65. W70. W75. W80."
+
+
+def test_windows_fall_back_to_an_even_speaking_rate():
+    transcript = "".join(str(i % 10) for i in range(100))
+    (window,) = transcript_windows([Hotspot("replay", 45, 55, 50.0, 2.0)], transcript, 100.0)
+    assert (window.start, window.end) == (40.0, 60.0)
+    assert window.text == transcript[40:60]
+
+    (clipped,) = transcript_windows([Hotspot("replay", 0, 2, 1.0, 2.0)], transcript, 100.0)
+    assert clipped.start == 0.0 and clipped.text == transcript[:11]
+
+    (empty,) = transcript_windows([Hotspot("replay", 0, 2, 1.0, 2.0)], transcript, 0.0)
+    assert empty.text == ""
+
+
+def test_long_windows_are_truncated_at_a_word():
+    transcript = "word " * 1000
+    (window,) = transcript_windows([Hotspot("replay", 45, 55, 50.0, 2.0)], transcript, 100.0)
+    assert window.text.endswith(" ...")
+    assert len(window.text) <= MAX_WINDOW_CHARS + 4
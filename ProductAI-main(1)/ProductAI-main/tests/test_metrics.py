@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.metrics import counter, gauge, histogram, render_prometheus
+
+
+def test_reregistering_with_the_same_shape_returns_the_metric():
+    first = counter("test_reregistered_total", "Test counter", ["kind"])
+    assert counter("test_reregistered_total", "Test counter", ["kind"]) is first
+
+
+def test_reregistering_with_another_shape_raises():
+    counter("test_shape_total", "Test counter", ["kind"])
+    with pytest.raises(ValueError, match="registered as counter"):
+        gauge("test_shape_total", "Test gauge", ["kind"])
+    with pytest.raises(ValueError, match="labels"):
+        counter("test_shape_total", "Test counter", ["kind", "outcome"])
+    histogram("test_shape_seconds", "Test histogram", buckets=(1, 2))
+    with pytest.raises(ValueError, match="buckets"):
+        histogram("test_shape_seconds", "Test histogram", buckets=(1, 5))
+
+
+def test_labels_must_match_the_declaration():
+    metric = counter("test_labels_total", "Test counter", ["kind"])
+    with pytest.raises(ValueError):
+        metric.inc(other="x")
+
+
+def test_histogram_exposition_is_cumulative():
+    metric = histogram("test_render_seconds", "Test histogram", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        metric.observe(value, stage="tts")
+    text = render_prometheus()
+    assert 'test_render_seconds_bucket{stage="tts",le="0.1"} 1' in text
+    assert 'test_render_seconds_bucket{stage="tts",le="1.0"} 2' in text
+    assert 'test_render_seconds_bucket{stage="tts",le="+Inf"} 3' in text
+    assert 'test_render_seconds_count{stage="tts"} 3' in text
+    assert metric.mean(stage="tts") == pytest.approx(5.55 / 3)
+
+
+def test_stage_latency_is_declared_once():
+    from app.services import script_generation_service, staged_pipeline
+
+    assert script_generation_service.STAGE_LATENCY is staged_pipeline.STAGE_LATENCY
@@ -0,0 +1,105 @@
+import asyncio
+import re
+
+import pytest
+
+from app.services import micro_batcher
+from app.services.deadline import DeadlineExceededError, deadline_after, remaining_time
+from app.services.micro_batcher import MicroBatcher
+from app.services.model_router import ModelChoice
+from app.services.scheduler import current_request_class, request_class
+
+CHOICE = ModelChoice("fake-model", "fast", "test")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Fake Gemini: answers every request in a combined prompt except those containing 'skip'."""
+    calls = []
+
+    async def generate_structured(prompt, output_model, task, quality="final"):
+        calls.append({"task": task, "priority": current_request_class().priority, "remaining": remaining_time()})
+        if "hang" in prompt:
+            await asyncio.sleep(10)
+        requests = re.findall(r"=== \w+ REQUEST (\d+) ===\n(.*?)\n", prompt)
+        results = [{"id": int(i), "output": f"answer: {text}"} for i, text in requests if "skip" not in text]
+        return output_model.model_validate({"results": results}), CHOICE
+
+    async def generate_content(prompt, task, quality="final"):
+        calls.append({"task": task, "priority": current_request_class().priority, "remaining": remaining_time()})
+
+        class Response:
+            text = f"single: {prompt}"
+
+        return Response(), CHOICE
+
+    monkeypatch.setattr(micro_batcher, "LLM_MICRO_BATCH_ENABLED", True)
+    monkeypatch.setattr(micro_batcher, "generate_structured", generate_structured)
+    monkeypatch.setattr(micro_batcher, "generate_content", generate_content)
+    return calls
+
+
+async def submit_as(batcher, prompt, priority, deadline=None):
+    with request_class(priority=priority), deadline_after(deadline):
+        text, _ = await batcher.submit(prompt, task="t")
+    return text
+
+
+def test_batch_runs_with_earliest_deadline_and_highest_priority(calls):
+    async def scenario():
+        batcher = MicroBatcher(window_ms=10, max_items=8)
+        results = await asyncio.gather(
+            submit_as(batcher, "a1", "bulk", deadline=30),
+            submit_as(batcher, "a2", "interactive"),
+            submit_as(batcher, "a3", "standard", deadline=5),
+        )
+        return results, batcher
+
+    results, batcher = asyncio.run(scenario())
+    assert results == ["answer: a1", "answer: a2", "answer: a3"]
+    assert len(calls) == 1
+    assert calls[0]["task"] == "t_batch"
+    assert calls[0]["priority"] == "interactive"
+    assert calls[0]["remaining"] <= 5
+    assert not batcher._tasks
+
+
+def test_missing_items_retry_in_their_own_context(calls):
+    async def scenario():
+        batcher = MicroBatcher(window_ms=10, max_items=8)
+        return await asyncio.gather(
+            submit_as(batcher, "b1", "interactive", deadline=5),
+            submit_as(batcher, "b2 skip", "bulk"),
+        )
+
+    results = asyncio.run(scenario())
+    assert results == ["answer: b1", "single: b2 skip"]
+    retry = calls[-1]
+    assert retry["task"] == "t"
+    assert retry["priority"] == "bulk"
+    assert retry["remaining"] is None
+
+
+def test_full_batch_flushes_without_waiting_for_the_window(calls):
+    async def scenario():
+        batcher = MicroBatcher(window_ms=60_000, max_items=2)
+        return await asyncio.wait_for(
+            asyncio.gather(submit_as(batcher, "c1", "standard"), submit_as(batcher, "c2", "standard")), 5
+        )
+
+    assert asyncio.run(scenario()) == ["answer: c1", "answer: c2"]
+
+
+def test_combined_call_is_cut_at_the_earliest_deadline(calls):
+    async def scenario():
+        batcher = MicroBatcher(window_ms=10, max_items=8)
+        return await asyncio.wait_for(asyncio.gather(
+            submit_as(batcher, "d1 hang", "standard", deadline=0.1),
+            submit_as(batcher, "d2", "standard"),
+            return_exceptions=True,
+        ), 5)
+
+    urgent, relaxed = asyncio.run(scenario())
+    # The urgent item's own retry finds its deadline gone; the other is answered on its own
+    assert isinstance(urgent, DeadlineExceededError)
+    assert relaxed == "single: d2"
@@ -0,0 +1,79 @@
+import importlib
+
+import pytest
+
+from app.services import model_router
+from app.services.model_router import FAST_MODEL, QUALITY_MODEL, SMALL_PROMPT_CHARS, choose_model
+
+
+@pytest.fixture
+def quality_latency(monkeypatch):
+    def set_latency(seconds):
+        monkeypatch.setitem(model_router._latency_ewma, QUALITY_MODEL, seconds)
+    set_latency(8.0)
+    return set_latency
+
+
+@pytest.mark.parametrize("prompt_chars, quality, budget, latency, expected", [
+    # Draft always goes fast, whatever the size or budget
+    (100, "draft", None, 8.0, ("fast", "draft quality")),
+    (50_000, "draft", 60.0, 8.0, ("fast", "draft quality")),
+    # The small-prompt threshold is exclusive
+    (SMALL_PROMPT_CHARS - 1, "final", None, 8.0, ("fast", f"small prompt ({SMALL_PROMPT_CHARS - 1} chars)")),
+    (SMALL_PROMPT_CHARS, "final", None, 8.0, ("quality", "final quality, large prompt")),
+    # Large prompts fall back to fast only when the quality model would overrun the budget
+    (50_000, "final", 5.0, 8.0, ("fast", "latency budget 5.0s below expected 8.0s")),
+    (50_000, "final", 8.0, 8.0, ("quality", "final quality, large prompt")),
+    (50_000, "final", 30.0, 8.0, ("quality", "final quality, large prompt")),
+    # Observed latency, not the prior, decides
+    (50_000, "final", 30.0, 40.0, ("fast", "latency budget 30.0s below expected 40.0s")),
+    (50_000, "final", 5.0, 2.0, ("quality", "final quality, large prompt")),
+])
+def test_choose_model(quality_latency, prompt_chars, quality, budget, latency, expected):
+    quality_latency(latency)
+    choice = choose_model(prompt_chars, quality=quality, latency_budget=budget)
+    assert (choice.tier, choice.reason) == expected
+    assert choice.model_name == (FAST_MODEL if expected[0] == "fast" else QUALITY_MODEL)
+
+
+def test_unknown_quality_tier_is_rejected():
+    with pytest.raises(ValueError, match="Unknown quality tier"):
+        choose_model(100, quality="best")
+
+
+def test_latency_feeds_back_into_the_estimate(quality_latency):
+    model_router._record_latency(QUALITY_MODEL, 18.0)
+    assert model_router.expected_latency(QUALITY_MODEL) == pytest.approx(10.0)
+    assert model_router.expected_latency("unknown-model") == model_router.LATENCY_PRIORS[QUALITY_MODEL]
+
+
+DEFAULT_ENV = {
+    "GEMINI_FAST_MODEL": "gemini-2.5-flash-lite",
+    "GEMINI_QUALITY_MODEL": "gemini-2.5-flash",
+    "MODEL_ROUTER_SMALL_PROMPT_CHARS": "4000",
+}
+
+
+@pytest.fixture
+def reloaded_router(monkeypatch):
+    def reload(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(model_router)
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(model_router)
+
+
+@pytest.mark.parametrize("env, prompt_chars, budget, expected", [
+    ({"GEMINI_FAST_MODEL": "tiny", "GEMINI_QUALITY_MODEL": "huge"}, 100, None, ("tiny", "fast")),
+    ({"GEMINI_FAST_MODEL": "tiny", "GEMINI_QUALITY_MODEL": "huge"}, 10_000, None, ("huge", "quality")),
+    ({"MODEL_ROUTER_SMALL_PROMPT_CHARS": "200"}, 500, None, ("gemini-2.5-flash", "quality")),
+    ({"MODEL_ROUTER_SMALL_PROMPT_CHARS": "20000"}, 10_000, None, ("gemini-2.5-flash-lite", "fast")),
+    # The latency prior follows the renamed quality model
+    ({"GEMINI_QUALITY_MODEL": "huge"}, 10_000, 5.0, ("gemini-2.5-flash-lite", "fast")),
+])
+def test_env_overrides(reloaded_router, env, prompt_chars, budget, expected):
+    router = reloaded_router(**{**DEFAULT_ENV, **env})
+    choice = router.choose_model(prompt_chars, latency_budget=budget)
+    assert (choice.model_name, choice.tier) == expected
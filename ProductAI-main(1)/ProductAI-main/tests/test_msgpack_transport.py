@@ -0,0 +1,99 @@
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.middleware import msgpack_transport
+from app.middleware.msgpack_transport import MsgPackRoute, NegotiatedResponse, accepts_msgpack
+
+msgpack = pytest.importorskip("msgpack")
+
+MSGPACK = {"Content-Type": "application/msgpack"}
+
+
+class Word(BaseModel):
+    word: str
+    start: float
+
+
+class Transcript(BaseModel):
+    name: str
+    words: List[Word]
+
+
+BODY = {"name": "demo", "words": [{"word": "hello", "start": 0.5}, {"word": "world", "start": 1.25}]}
+
+
+def make_client():
+    app = FastAPI(default_response_class=NegotiatedResponse)
+    app.router.route_class = MsgPackRoute
+
+    @app.post("/echo")
+    async def echo(transcript: Transcript):
+        return transcript.model_dump()
+
+    return TestClient(app)
+
+
+def test_msgpack_body_round_trips_as_json():
+    response = make_client().post("/echo", content=msgpack.packb(BODY), headers=MSGPACK)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == BODY
+
+
+@pytest.mark.parametrize("accept", [
+    "application/msgpack",
+    "application/json;q=0.5, application/x-msgpack",
+    "application/vnd.msgpack; q=0.8",
+])
+def test_msgpack_response_when_accepted(accept):
+    response = make_client().post("/echo", content=msgpack.packb(BODY), headers={**MSGPACK, "Accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content, raw=False) == BODY
+
+
+def test_json_body_with_msgpack_response():
+    response = make_client().post("/echo", json=BODY, headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(response.content, raw=False) == BODY
+
+
+def test_refused_msgpack_stays_json():
+    response = make_client().post("/echo", json=BODY, headers={"Accept": "application/msgpack;q=0, */*"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == BODY
+
+
+@pytest.mark.parametrize("body", [b"\xc1", b"\x93\x01", msgpack.packb(BODY) + b"\x01"])
+def test_malformed_msgpack_is_a_400(body):
+    response = make_client().post("/echo", content=body, headers=MSGPACK)
+    assert response.status_code == 400
+
+
+def test_invalid_payload_is_a_422():
+    response = make_client().post("/echo", content=msgpack.packb({"name": 1}), headers=MSGPACK)
+    assert response.status_code == 422
+    assert {tuple(error["loc"]) for error in response.json()["detail"]} == {("body", "name"), ("body", "words")}
+
+
+def test_without_msgpack_installed(monkeypatch):
+    monkeypatch.setattr(msgpack_transport, "msgpack", None)
+    client = make_client()
+    assert client.post("/echo", content=b"\x80", headers=MSGPACK).status_code == 415
+    response = client.post("/echo", json=BODY, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("Application/MsgPack", True),
+    ("application/msgpack; q=0.0", False),
+    ("text/html, application/x-msgpack;q=0.2", True),
+])
+def test_accepts_msgpack(accept, expected):
+    assert accepts_msgpack(accept) is expected
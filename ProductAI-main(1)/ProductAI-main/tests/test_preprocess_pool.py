@@ -0,0 +1,52 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from app.models.dom_event_models import RecordingSession
+from app.services import preprocess_pool
+from app.services.preprocess_pool import PREPROCESS_JOBS, PreprocessPool
+from app.services.script_generation_service import build_script_context
+from app.services.session_store import get_session_store
+
+SEED_SESSION = json.loads((Path(__file__).resolve().parent.parent / "test_events.json").read_text())
+WORDS = [{"word": f"w{i}", "start": i * 0.5, "end": i * 0.5 + 0.3, "confidence": 0.9} for i in range(50)]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = PreprocessPool(workers=1, min_items=0)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def stored():
+    store = get_session_store()
+    ref = store.save("pool test", WORDS, RecordingSession.model_validate(SEED_SESSION))["sessionRef"]
+    return store.load(ref)
+
+
+def test_script_context_matches_in_process(pool, stored):
+    before = PREPROCESS_JOBS.value(job="script_context", outcome="pool")
+    context = asyncio.run(pool.script_context(stored))
+    assert PREPROCESS_JOBS.value(job="script_context", outcome="pool") == before + 1
+    expected = json.loads(json.dumps(build_script_context(stored.words, stored.session)))
+    assert context == {**expected, "content_hash": stored.content_hash}
+
+
+def test_recording_job_returns_json_ready_fields(pool, stored):
+    result = asyncio.run(pool.recording(stored))
+    assert result["metadata"]["groupedSteps"] is not None
+    assert "instructions" in result
+
+
+def test_worker_errors_fall_back_in_process(pool):
+    before = PREPROCESS_JOBS.value(job="recording", outcome="fallback")
+    # The worker cannot find the session and raises
+    assert asyncio.run(pool._run("recording", preprocess_pool._recording_job, "0" * 32)) is None
+    assert PREPROCESS_JOBS.value(job="recording", outcome="fallback") == before + 1
+    # The pool stays usable
+    assert asyncio.run(pool._run("recording", preprocess_pool._recording_job, "1" * 32)) is None
+    assert pool._executor is not None
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    AIMDLimiter,
+    ProviderLimiter,
+    ProviderRateLimitError,
+    TokenBucket,
+    call_with_rate_limit,
+    parse_retry_after,
+)
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    async def scenario():
+        bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 tokens/s
+        started = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        burst = time.monotonic() - started
+        await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.05
+    assert total >= 0.09
+
+
+def test_token_bucket_pause_and_disabled_bucket():
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.pause(5)
+    assert bucket.tokens <= -5
+    disabled = TokenBucket(rate_per_minute=0)
+    asyncio.run(disabled.acquire(1000))
+    assert not disabled.enabled
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 0 <= parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_aimd_grows_additively_and_backs_off_multiplicatively():
+    limiter = AIMDLimiter(initial=4, min_limit=1, max_limit=8, latency_target=1.0, decrease_cooldown=60)
+    limiter.on_success(0.1)
+    assert limiter.limit == pytest.approx(4.25)
+    limiter.on_overload()
+    assert limiter.limit == pytest.approx(2.125)
+    # Within the cooldown further overload signals are ignored
+    limiter.on_overload()
+    assert limiter.limit == pytest.approx(2.125)
+
+
+def test_aimd_slow_success_counts_as_overload():
+    limiter = AIMDLimiter(initial=4, min_limit=1, max_limit=8, latency_target=1.0, decrease_cooldown=0)
+    limiter.on_success(5.0)
+    assert limiter.limit == 2
+    for _ in range(5):
+        limiter.on_overload()
+    assert limiter.limit == 1
+
+
+def test_aimd_queues_calls_over_the_limit():
+    async def scenario():
+        limiter = AIMDLimiter(initial=1, min_limit=1, max_limit=1, latency_target=0, name="test")
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        queued = not waiter.done()
+        limiter.release()
+        await asyncio.wait_for(waiter, 1)
+        return queued, limiter.in_flight
+
+    assert asyncio.run(scenario()) == (True, 1)
+
+
+class Overloaded(Exception):
+    code = 429
+    details = ()
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = ProviderLimiter(
+        name="test",
+        requests=TokenBucket(0),
+        units=TokenBucket(0),
+        concurrency=AIMDLimiter(initial=2, min_limit=1, max_limit=4, latency_target=0, name="test"),
+        max_retries=2,
+        base_delay=0.001,
+        max_delay=0.01,
+    )
+    monkeypatch.setitem(rate_limiter._limiters, "test", limiter)
+    return limiter
+
+
+def test_overload_is_retried_with_backoff(limiter):
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Overloaded()
+        return "ok"
+
+    retries = rate_limiter.PROVIDER_RETRIES.value(provider="test")
+    assert asyncio.run(call_with_rate_limit("test", call)) == "ok"
+    assert len(attempts) == 3
+    assert rate_limiter.PROVIDER_RETRIES.value(provider="test") == retries + 2
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_gives_up_after_max_retries(limiter):
+    async def call():
+        raise Overloaded()
+
+    with pytest.raises(ProviderRateLimitError):
+        asyncio.run(call_with_rate_limit("test", call))
+
+
+def test_other_errors_are_not_retried(limiter):
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_rate_limit("test", call))
+    assert len(attempts) == 1
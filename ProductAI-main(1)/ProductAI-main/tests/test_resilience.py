@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from app.services import rate_limiter, resilience
+from app.services.rate_limiter import AIMDLimiter, ProviderLimiter, TokenBucket
+from app.services.resilience import CircuitBreaker, CircuitOpenError, HedgeBudget, call_provider
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+def make_breaker():
+    return CircuitBreaker("test:endpoint", "test", failure_rate=0.5, min_calls=4,
+                          window_seconds=60, open_seconds=30)
+
+
+def test_breaker_opens_at_the_failure_rate(clock):
+    breaker = make_breaker()
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED  # below min_calls
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == pytest.approx(30)
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 61
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 31
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # one probe at a time
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 31
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_cancelled_probe_is_released(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 31
+    breaker.before_call()
+    breaker.release_probe()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_hedge_budget_limits_hedges_to_a_share_of_calls():
+    budget = HedgeBudget(ratio=0.1, burst=1.0)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(11):
+        budget.on_call()
+    assert budget.try_spend()
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setitem(rate_limiter._limiters, "testp", ProviderLimiter(
+        name="testp",
+        requests=TokenBucket(0),
+        units=TokenBucket(0),
+        concurrency=AIMDLimiter(initial=4, min_limit=1, max_limit=4, latency_target=0, name="testp"),
+        max_retries=0,
+        base_delay=0.001,
+        max_delay=0.01,
+    ))
+    monkeypatch.setenv("TESTP_BREAKER_MIN_CALLS", "2")
+    monkeypatch.setenv("TESTP_HEDGE_MIN_SAMPLES", "1")
+    monkeypatch.setattr(resilience, "_endpoints", {})
+    monkeypatch.setattr(resilience, "_hedge_budgets", {})
+    return "testp"
+
+
+class ClientError(Exception):
+    code = 400
+
+
+def test_client_errors_do_not_open_the_circuit(provider):
+    async def call():
+        raise ClientError()
+
+    for _ in range(3):
+        with pytest.raises(ClientError):
+            asyncio.run(call_provider(provider, "ep", call))
+    assert resilience._endpoint_state(provider, "ep").breaker.state == CircuitBreaker.CLOSED
+
+
+def test_server_errors_open_the_circuit(provider):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(call_provider(provider, "ep", call))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_provider(provider, "ep", call))
+    assert len(calls) == 2
+
+
+def test_slow_primary_is_hedged(provider):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        # The first call trains the latency window; the second hangs; its hedge answers
+        if len(calls) == 2:
+            await asyncio.sleep(10)
+        return len(calls)
+
+    async def scenario():
+        await call_provider(provider, "ep", call)
+        return await asyncio.wait_for(call_provider(provider, "ep", call), 2)
+
+    assert asyncio.run(scenario()) == 3
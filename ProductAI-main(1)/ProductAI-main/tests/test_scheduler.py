@@ -0,0 +1,102 @@
+import asyncio
+from collections import Counter
+
+from app.middleware.scheduling import SchedulingMiddleware
+from app.services.rate_limiter import AIMDLimiter
+from app.services.scheduler import (
+    QUEUE_DEPTH,
+    FairQueue,
+    RequestClass,
+    current_request_class,
+    priority_for_path,
+    request_class,
+    set_default_tenant,
+)
+
+INTERACTIVE = RequestClass("interactive", "a")
+BULK = RequestClass("bulk", "a")
+
+
+def drain(queue, count):
+    return [queue.pop()[1] for _ in range(count)]
+
+
+def test_flows_are_served_in_proportion_to_their_weights():
+    queue = FairQueue("test")
+    for i in range(40):
+        queue.push(f"bulk{i}", BULK)
+        queue.push(f"interactive{i}", INTERACTIVE)
+    served = Counter(request.priority for request in drain(queue, 17))
+    assert served == {"interactive": 16, "bulk": 1}
+
+
+def test_bulk_is_not_starved():
+    queue = FairQueue("test")
+    for i in range(100):
+        queue.push(i, INTERACTIVE)
+    queue.push("bulk", BULK)
+    assert "bulk" in [queue.pop()[0] for _ in range(20)]
+
+
+def test_tenants_in_one_class_share_fairly():
+    queue = FairQueue("test")
+    noisy, quiet = RequestClass("standard", "noisy"), RequestClass("standard", "quiet")
+    for i in range(20):
+        queue.push(i, noisy)
+    queue.push("quiet", quiet)
+    assert "quiet" in [queue.pop()[0] for _ in range(2)]
+
+
+def test_fifo_within_a_flow_and_reset_when_idle():
+    queue = FairQueue("test")
+    for i in range(3):
+        queue.push(i, BULK)
+    assert [queue.pop()[0] for _ in range(3)] == [0, 1, 2]
+    assert queue._virtual_time == 0.0 and not queue._finish
+
+
+def test_request_class_nesting_and_default_tenant():
+    assert priority_for_path("/audio-full-process") == "interactive"
+    assert priority_for_path("/unknown") == "standard"
+    with request_class(priority="bulk"):
+        set_default_tenant("owner")
+        assert current_request_class() == RequestClass("bulk", "owner")
+        with request_class(tenant="header-tenant"):
+            set_default_tenant("owner")  # an explicit tenant wins
+            assert current_request_class() == RequestClass("bulk", "header-tenant")
+    assert current_request_class() == RequestClass()
+
+
+def run_middleware(path, headers):
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["class"] = current_request_class()
+
+    scope = {"type": "http", "path": path, "headers": headers}
+    asyncio.run(SchedulingMiddleware(app)(scope, None, None))
+    return seen["class"]
+
+
+def test_priority_header_can_lower_but_not_raise():
+    assert run_middleware("/audio-full-process", [(b"x-request-priority", b"bulk")]).priority == "bulk"
+    assert run_middleware("/collaboration/ai-review", [(b"x-request-priority", b"interactive")]).priority == "bulk"
+    assert run_middleware("/", [(b"x-workspace-id", b"ws1")]).tenant == "ws1"
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        limiter = AIMDLimiter(initial=1, min_limit=1, max_limit=1, latency_target=0, name="cancel-test")
+        await limiter.acquire()
+        waiters = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        depth = len(limiter._waiters), QUEUE_DEPTH.value(provider="cancel-test", priority="standard")
+        waiters[0].cancel()
+        waiters[2].cancel()
+        await asyncio.gather(*waiters[::2], return_exceptions=True)
+        after = len(limiter._waiters), QUEUE_DEPTH.value(provider="cancel-test", priority="standard")
+        limiter.release()
+        await asyncio.wait_for(waiters[1], 1)
+        return depth, after, limiter.in_flight
+
+    assert asyncio.run(scenario()) == ((3, 3.0), (1, 1.0), 1)
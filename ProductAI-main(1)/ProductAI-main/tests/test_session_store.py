@@ -0,0 +1,105 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.models.dom_event_models import RecordingSession
+from app.services.session_store import CHUNK_SIZE, SessionNotFoundError, SessionStore
+
+SEED_SESSION = json.loads((Path(__file__).resolve().parent.parent / "test_events.json").read_text())
+WORDS = [{"word": f"w{i}", "start": i * 0.5, "end": i * 0.5 + 0.3, "confidence": 0.9} for i in range(CHUNK_SIZE + 10)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path), cache_size=1)
+
+
+def save(store, transcript="hello"):
+    return store.save(transcript, WORDS, RecordingSession.model_validate(SEED_SESSION))["sessionRef"]
+
+
+def test_round_trip_across_chunks(store):
+    ref = save(store)
+    stored = store.load(ref)
+    assert stored.transcript == "hello"
+    assert stored.words == WORDS
+    assert stored.word_count == len(WORDS)
+    assert stored.event_count == len(SEED_SESSION["events"])
+    assert stored.session.sessionId == SEED_SESSION["sessionId"]
+    assert stored.content_hash == ref
+
+
+def test_identical_uploads_share_a_ref(store):
+    first = store.save("hello", WORDS, None)
+    second = store.save("hello", WORDS, None)
+    assert first["sessionRef"] == second["sessionRef"]
+    assert second["deduplicated"] is True
+    assert store.load(first["sessionRef"]).session is None
+
+
+def test_unknown_and_malformed_refs(store):
+    with pytest.raises(SessionNotFoundError):
+        store.load("0" * 32)
+    with pytest.raises(SessionNotFoundError):
+        store.load("../etc/passwd")
+
+
+def test_session_evicted_from_lru_stays_readable(store):
+    held = store.load(save(store, "first"))
+    store.load(save(store, "second"))  # cache_size=1: evicts "first"
+    assert held.ref not in store._loaded
+    assert held.words == WORDS
+    assert len(list(held.iter_events())) == len(SEED_SESSION["events"])
+    assert held.session is not None
+
+
+def test_deleted_session_stays_readable_while_held(store):
+    ref = save(store)
+    held = store.load(ref)
+    assert store.delete(ref) is True
+    assert held.session is not None
+    with pytest.raises(SessionNotFoundError):
+        store.load(ref)
+    assert store.delete(ref) is False
+
+
+def test_decoded_session_is_not_kept(store):
+    stored = store.load(save(store))
+    assert stored.session is not stored.session
+
+
+def test_sweep_removes_expired_then_least_recently_used(tmp_path):
+    store = SessionStore(str(tmp_path), ttl=3600, max_bytes=0, sweep_interval=3600)
+    old, fresh = save(store, "old"), save(store, "fresh")
+    held = store.load(old)
+    expired = time.time() - 7200
+    os.utime(tmp_path / f"{old}.pais", (expired, expired))
+    assert store.sweep() == 1
+    with pytest.raises(SessionNotFoundError):
+        store.load(old)
+    assert held.transcript == "old"  # views still open keep reading
+    assert store.load(fresh).transcript == "fresh"
+
+    size = (tmp_path / f"{fresh}.pais").stat().st_size
+    newer = save(store, "newer")
+    store.max_bytes = size + 1
+    stale = time.time() - 60
+    os.utime(tmp_path / f"{fresh}.pais", (stale, stale))
+    assert store.sweep() == 1
+    assert sorted(p.stem for p in tmp_path.glob("*.pais")) == [newer]
+
+
+def test_loading_refreshes_and_saving_triggers_the_sweep(tmp_path):
+    store = SessionStore(str(tmp_path), cache_size=0, ttl=3600, max_bytes=0, sweep_interval=0)
+    ref = save(store, "used")
+    expired = time.time() - 7200
+    os.utime(tmp_path / f"{ref}.pais", (expired, expired))
+    store.load(ref)  # used again: no longer expired
+    save(store, "another")
+    assert store.load(ref).transcript == "used"
+    os.utime(tmp_path / f"{ref}.pais", (expired, expired))
+    save(store, "third")
+    assert not (tmp_path / f"{ref}.pais").exists()
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from app.services import loop_watchdog
+from app.services.deadline import DeadlineExceededError, deadline_after
+from app.services.staged_pipeline import Stage, StagedPipeline
+
+
+def make_pipeline(first, second, queue_size=1):
+    return StagedPipeline("test", [
+        Stage(name="first", handler=first, workers=1, queue_size=queue_size),
+        Stage(name="second", handler=second, workers=1, queue_size=queue_size),
+    ])
+
+
+async def append(name, state):
+    state.setdefault("stages", []).append(name)
+
+
+def test_job_runs_through_every_stage():
+    async def scenario():
+        pipeline = make_pipeline(lambda s: append("first", s), lambda s: append("second", s))
+        try:
+            return await pipeline.run({})
+        finally:
+            await pipeline.stop()
+
+    assert asyncio.run(scenario()) == {"stages": ["first", "second"]}
+
+
+def test_slow_stage_backs_up_to_the_entry_queue():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow(state):
+            await release.wait()
+
+        pipeline = make_pipeline(lambda s: append("first", s), slow)
+        jobs = [asyncio.create_task(pipeline.run({"n": n})) for n in range(4)]
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # second: 1 running + 1 queued; first: 1 blocked on the full queue + 1 queued
+        stalled = pipeline.backpressure()[0]
+        release.set()
+        results = await asyncio.gather(*jobs)
+        await pipeline.stop()
+        return stalled, results
+
+    stalled, results = asyncio.run(scenario())
+    assert stalled == "first"
+    assert [r["n"] for r in results] == [0, 1, 2, 3]
+
+
+def test_handler_errors_reach_the_caller():
+    async def fail(state):
+        if not state.get("ok"):
+            raise ValueError("bad input")
+
+    async def scenario():
+        pipeline = make_pipeline(fail, lambda s: append("second", s))
+        try:
+            with pytest.raises(ValueError, match="bad input"):
+                await pipeline.run({})
+            # The worker survives the error
+            return await pipeline.run({"ok": True})
+        finally:
+            await pipeline.stop()
+
+    assert asyncio.run(scenario())["ok"] is True
+
+
+def test_abandoned_job_cancels_its_running_handler():
+    async def scenario():
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def hang(state):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pipeline = make_pipeline(hang, lambda s: append("second", s))
+        caller = asyncio.create_task(pipeline.run({}))
+        await started.wait()
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+
+
+def test_deadline_passed_in_queue_skips_the_stage():
+    async def scenario():
+        release = asyncio.Event()
+        ran = []
+
+        async def first(state):
+            ran.append(state["n"])
+            await release.wait()
+
+        pipeline = make_pipeline(first, lambda s: append("second", s), queue_size=4)
+        blocker = asyncio.create_task(pipeline.run({"n": 0}))
+        with deadline_after(0.01):
+            late = asyncio.create_task(pipeline.run({"n": 1}))
+        await asyncio.sleep(0.05)
+        release.set()
+        await blocker
+        with pytest.raises(DeadlineExceededError):
+            await late
+        await pipeline.stop()
+        return ran
+
+    assert asyncio.run(scenario()) == [0]
+
+
+def test_handler_tasks_are_attributed_to_the_request_route():
+    async def scenario():
+        seen = []
+
+        async def record(state):
+            seen.append(loop_watchdog._active_routes.get(asyncio.current_task()))
+
+        pipeline = make_pipeline(record, record)
+        loop_watchdog.track_route(asyncio.current_task(), "POST /audio-full-process")
+        try:
+            await pipeline.run({})
+        finally:
+            loop_watchdog.untrack_route(asyncio.current_task())
+            await pipeline.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == ["POST /audio-full-process"] * 2
+
+
+def test_pipeline_restarts_on_a_new_loop():
+    pipeline = make_pipeline(lambda s: append("first", s), lambda s: append("second", s))
+    # The first loop is closed without stopping the pipeline
+    assert asyncio.run(pipeline.run({}))["stages"] == ["first", "second"]
+
+    async def second_loop():
+        try:
+            return await pipeline.run({})
+        finally:
+            await pipeline.stop()
+
+    assert asyncio.run(second_loop())["stages"] == ["first", "second"]
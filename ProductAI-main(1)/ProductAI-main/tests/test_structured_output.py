@@ -0,0 +1,113 @@
+import asyncio
+import json
+from typing import List, Literal, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.models.collaboration_models import AISuggestionList
+from app.services import structured_output
+from app.services.model_router import ModelChoice
+from app.services.structured_output import StructuredOutputError, generate_structured, response_schema_for
+
+CHOICE = ModelChoice("fake-model", "fast", "test")
+
+
+class Inner(BaseModel):
+    """Docstrings stay out of the schema"""
+    label: Literal["a", "b"]
+    score: float = Field(ge=0.0, le=1.0, description="How sure")
+
+
+class Outer(BaseModel):
+    kind: Literal["fixed"]
+    items: List[Inner]
+    note: Optional[str] = None
+    best: Optional[Inner] = None
+
+
+def test_schema_conversion():
+    schema = response_schema_for(Outer)
+    assert schema["type"] == "object"
+    assert "description" not in schema
+    assert schema["properties"]["kind"] == {"type": "string", "enum": ["fixed"]}
+    inner = schema["properties"]["items"]["items"]
+    assert inner["properties"]["label"] == {"type": "string", "enum": ["a", "b"]}
+    assert inner["properties"]["score"] == {"type": "number", "description": "How sure (Between 0 and 1)"}
+    assert schema["properties"]["note"] == {"type": "string", "nullable": True}
+    assert schema["properties"]["best"]["nullable"] is True
+    assert schema["properties"]["best"]["properties"]["label"]["enum"] == ["a", "b"]
+    assert schema["required"] == ["kind", "items"]
+
+
+def test_unsupported_schemas_are_rejected():
+    class Union(BaseModel):
+        value: int | str
+
+    class FreeForm(BaseModel):
+        data: dict
+
+    with pytest.raises(ValueError):
+        response_schema_for(Union)
+    with pytest.raises(ValueError):
+        response_schema_for(FreeForm)
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Fake Gemini serving queued replies; "cached" replies skip the validate hook like LLM cache hits."""
+    queue, prompts = [], []
+
+    async def generate_content(prompt, task, quality, latency_budget, validate, generation_config):
+        prompts.append(prompt)
+        text, cached = queue.pop(0)
+        if not cached:
+            validate(text)
+
+        class Response:
+            pass
+
+        response = Response()
+        response.text = text
+        return response, CHOICE
+
+    monkeypatch.setattr(structured_output, "generate_content", generate_content)
+    return queue, prompts
+
+
+def suggestion(confidence):
+    return {"timestamp": 1.0, "type": "trim", "suggestion": "Cut", "confidence": confidence, "reasoning": "Slow"}
+
+
+def test_out_of_range_numbers_are_clamped_without_a_retry(replies):
+    queue, prompts = replies
+    queue.append((json.dumps({"suggestions": [suggestion(1.7), suggestion(-0.2), suggestion(0.4)]}), False))
+    result, _ = asyncio.run(generate_structured("p", AISuggestionList, task="t"))
+    assert [s.confidence for s in result.suggestions] == [1.0, 0.0, 0.4]
+    assert len(prompts) == 1
+
+
+def test_invalid_reply_is_retried_with_the_error(replies):
+    queue, prompts = replies
+    queue.append((json.dumps({"suggestions": [{"timestamp": 1.0}]}), False))
+    queue.append((json.dumps({"suggestions": [suggestion(0.5)]}), False))
+    result, _ = asyncio.run(generate_structured("p", AISuggestionList, task="t"))
+    assert result.suggestions[0].confidence == 0.5
+    assert prompts[0] == "p"
+    assert prompts[1].startswith("p\n\nYour previous reply did not match")
+    assert "suggestions.0.type" in prompts[1]
+
+
+def test_gives_up_after_max_attempts(replies):
+    queue, _ = replies
+    queue.extend([("not json", False), ("{}", False)])
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(generate_structured("p", AISuggestionList, task="t", max_attempts=2))
+
+
+def test_cache_hit_is_parsed_and_clamped(replies):
+    queue, prompts = replies
+    queue.append((json.dumps({"suggestions": [suggestion(3)]}), True))
+    result, choice = asyncio.run(generate_structured("p", AISuggestionList, task="t"))
+    assert result.suggestions[0].confidence == 1.0
+    assert choice is CHOICE
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from app.models.dom_event_models import RecordingSession
+from app.services import artifact_cache, rag_service, script_generation_service, synced_narration_service
+from app.services.artifact_cache import ArtifactCache
+from app.services.cache_backend import Cache, MemoryCacheBackend
+from app.services.script_generation_service import stored_script_context
+from app.services.session_store import SessionStore
+from app.services.synced_narration_service import generate_step_by_step_narration, generate_synced_narration
+
+SEED_SESSION = json.loads((Path(__file__).resolve().parent.parent / "test_events.json").read_text())
+WORDS = [{"word": f"w{i}", "start": i * 0.5, "end": i * 0.5 + 0.3, "confidence": 0.9} for i in range(20)]
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    sent = []
+
+    async def fake_generate_content(prompt, task, quality="final", **kwargs):
+        sent.append(prompt)
+        return Reply("Step 1: Open the page." if task == "step_narration" else "Open the page."), None
+
+    monkeypatch.setattr(synced_narration_service, "generate_content", fake_generate_content)
+    return sent
+
+
+@pytest.fixture
+def builder_calls(monkeypatch):
+    """Counts rag_service builder calls made by both services."""
+    calls = []
+    for module in (script_generation_service, synced_narration_service):
+        for name in ("build_rag_context_from_events", "build_timeline_context", "extract_ui_elements_summary"):
+            original = getattr(rag_service, name)
+
+            def counted(*args, _original=original, _name=name, **kwargs):
+                calls.append(_name)
+                return _original(*args, **kwargs)
+
+            monkeypatch.setattr(module, name, counted)
+    return calls
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    shared = Cache("artifacts", MemoryCacheBackend(10_000_000))
+    monkeypatch.setattr(ArtifactCache, "_shared", property(lambda self: shared))
+    monkeypatch.setattr(artifact_cache, "_artifact_cache", ArtifactCache(lru_size=4))
+    store = SessionStore(str(tmp_path))
+    ref = store.save("open the page", WORDS, RecordingSession.model_validate(SEED_SESSION))["sessionRef"]
+    return store.load(ref)
+
+
+def test_stored_session_contexts_are_built_once(stored, prompts, builder_calls):
+    async def main():
+        synced = await generate_synced_narration("open the page", context=await stored_script_context(stored))
+        steps = await generate_step_by_step_narration("open the page", context=await stored_script_context(stored))
+        return synced, steps
+
+    synced, steps = asyncio.run(main())
+    assert sorted(builder_calls) == [
+        "build_rag_context_from_events", "build_timeline_context", "extract_ui_elements_summary",
+    ]
+    assert synced["session_id"] == steps["session_id"] == SEED_SESSION["sessionId"]
+    assert synced["total_dom_events"] == len(SEED_SESSION["events"])
+    assert steps["parsed_steps"] == [{"step_number": 1, "narration": "Open the page."}]
+
+
+def test_inline_and_stored_prompts_match(stored, prompts):
+    session = RecordingSession.model_validate(SEED_SESSION)
+
+    async def main():
+        inline = await generate_synced_narration("open the page", session)
+        from_context = await generate_synced_narration("open the page", context=await stored_script_context(stored))
+        await generate_step_by_step_narration("open the page", session)
+        await generate_step_by_step_narration("open the page", context=await stored_script_context(stored))
+        return inline, from_context
+
+    inline, from_context = asyncio.run(main())
+    assert prompts[0] == prompts[1]
+    assert prompts[2] == prompts[3]
+    assert inline["timeline_events"] == from_context["timeline_events"]
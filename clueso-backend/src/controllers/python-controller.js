@@ -14,9 +14,10 @@ const fs = require("fs");
  * @param {object} deepgramResponse - Full Deepgram JSON response (optional)
  * @param {string} sessionId - Session ID for broadcasting
  * @param {string} audioPath - Path to raw audio file (optional)
+ * @param {string} traceparent - traceparent header of the request that triggered this (optional)
  * @returns {Promise<object|null>} Python response or null if failed
  */
-exports.processWithAI = async (text, events = [], metadata = {}, deepgramResponse = null, sessionId = null, audioPath = null) => {
+exports.processWithAI = async (text, events = [], metadata = {}, deepgramResponse = null, sessionId = null, audioPath = null, traceparent = null) => {
     try {
         // 🛡️ INPUT VALIDATION (CRITICAL)
         if (!text || typeof text !== 'string' || text.trim().length === 0) {
@@ -43,7 +44,8 @@ exports.processWithAI = async (text, events = [], metadata = {}, deepgramRespons
             text,
             events,
             metadata,
-            deepgramResponse // Pass full Deepgram JSON response (can be null for chat)
+            deepgramResponse, // Pass full Deepgram JSON response (can be null for chat)
+            traceparent
         );
 
         Logger.info(`[Python Controller] Successfully received response from Python layer`);
@@ -172,7 +174,8 @@ exports.processChatMessage = async (req, res) => {
             metadata,
             null, // No Deepgram response for chat
             sessionId,
-            null  // No audio for chat
+            null, // No audio for chat
+            req.headers.traceparent
         );
 
         if (result) {